@@ -0,0 +1,165 @@
+#Barrido de varios codigos postales: cada codigo se resuelve a su almacen (con cache en disco y caducidad),
+#cada almacen se consulta una sola vez y sus tablas se reparten a todos los codigos que lo comparten.
+#Uso: python barrido.py codigos_postales.txt [http|selenium]
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from http_backend import URL_API, URL_BUSQUEDA, buscar_terminos_http, crear_sesion_http, resolver_almacen
+from snapshot_store import DB_PRODUCTOS, abrir_store, guardar_snapshots, nuevo_run_ts
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+
+# Codigo postal -> almacen; la asignacion cambia poco, se vuelve a preguntar pasada una semana
+ALMACENES_CACHE = os.path.join(CARPETA, ".almacenes_cache.json")
+ALMACENES_TTL_S = 7 * 24 * 3600
+
+
+def _leer_cache(cache):
+    if not os.path.exists(cache):
+        return {}
+    try:
+        with open(cache, encoding='utf-8') as f:
+            return json.load(f)
+    except ValueError:
+        print(f"Cache de almacenes '{cache}' ilegible; se vuelve a crear.")
+        return {}
+
+
+def almacenes_por_codigo(codigos_postales, session=None, cache=ALMACENES_CACHE, ttl_s=ALMACENES_TTL_S,
+                         url_api=URL_API, max_workers=8):
+    """
+    Warehouse of every postal code. Entries younger than ttl_s are read from the disk cache;
+    the rest are asked to the store concurrently and written back to the cache.
+    Args:
+        codigos_postales: Postal codes.
+        session: Session from crear_sesion_http. A new one if None.
+        cache: JSON file with postal code -> {'almacen', 'ts'}.
+        ttl_s: Age in seconds after which a cached entry is asked again.
+        url_api: Base URL of the store API.
+        max_workers: Requests in flight.
+    Returns:
+        Dict postal code -> warehouse. Postal codes the store rejected are left out and printed.
+    """
+    entradas = _leer_cache(cache)
+    ahora = time.time()
+    vigentes = {cp: e['almacen'] for cp, e in entradas.items() if ahora - e['ts'] < ttl_s}
+    pendientes = sorted({str(cp) for cp in codigos_postales} - vigentes.keys())
+
+    if pendientes:
+        session = session or crear_sesion_http(pool_size=max_workers)
+
+        def resolver(codigo_postal):
+            try:
+                return codigo_postal, resolver_almacen(session, codigo_postal, url_api)
+            except Exception as e:
+                print(f"No se pudo resolver el almacén de '{codigo_postal}': {e}")
+                return codigo_postal, None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for codigo_postal, almacen in executor.map(resolver, pendientes):
+                if almacen:
+                    vigentes[codigo_postal] = almacen
+                    entradas[codigo_postal] = {'almacen': almacen, 'ts': ahora}
+
+        with open(cache, 'w', encoding='utf-8') as f:
+            json.dump(entradas, f, indent=1, sort_keys=True)
+
+    print(f"{len(pendientes)} códigos postales resueltos en la tienda, "
+          f"{len(set(map(str, codigos_postales))) - len(pendientes)} desde la cache.")
+    return {str(cp): vigentes[str(cp)] for cp in codigos_postales if str(cp) in vigentes}
+
+
+def agrupar_por_almacen(almacenes):
+    """Dict warehouse -> list of postal codes it serves, in input order"""
+    grupos = {}
+    for codigo_postal, almacen in almacenes.items():
+        grupos.setdefault(almacen, []).append(codigo_postal)
+    return grupos
+
+
+def extraer_almacen_http(session, almacen, terms, url_busqueda=URL_BUSQUEDA):
+    """Tables of every term in one warehouse through the HTTP backend"""
+    return buscar_terminos_http(session, terms, almacen, url_busqueda)
+
+
+def extraer_almacen_selenium(codigo_postal, terms, url=None):
+    """
+    Tables of every term in one browser session opened with a postal code of the warehouse.
+    """
+    # Importado aqui para que el barrido HTTP no necesite Chrome
+    from selenium.webdriver.support.ui import WebDriverWait
+    from guardar_productos import URL_MERCADONA, crear_driver, extraer_termino, iniciar_sesion
+
+    driver = crear_driver(headless=True)
+    wait = WebDriverWait(driver, 5)
+    tablas = {}
+    try:
+        iniciar_sesion(driver, wait, codigo_postal, url or URL_MERCADONA)
+        for term in terms:
+            try:
+                tablas[term], _ = extraer_termino(driver, wait, term)
+            except Exception as e:
+                print(f"Error al procesar el producto '{term}': {e}. Continuando con el siguiente.")
+    finally:
+        driver.quit()
+    return tablas
+
+
+def barrer_codigos_postales(codigos_postales, terms, backend='http', store_path=DB_PRODUCTOS, run_ts=None,
+                            cache=ALMACENES_CACHE, ttl_s=ALMACENES_TTL_S, url_api=URL_API,
+                            url_busqueda=URL_BUSQUEDA, url_tienda=None):
+    """
+    Prices every term for every postal code, scraping each distinct warehouse once.
+    Args:
+        codigos_postales: Postal codes to monitor.
+        terms: Search terms.
+        backend: 'http' (http_backend) or 'selenium' (one browser session per warehouse).
+        store_path: Snapshot database where the rows of every postal code are written. None to skip it.
+        run_ts: Run timestamp stored with the rows. Defaults to now.
+        cache, ttl_s: Postal code -> warehouse cache (see almacenes_por_codigo).
+        url_api, url_busqueda: HTTP backend URLs.
+        url_tienda: Store URL for the selenium backend.
+    Returns:
+        Dict postal code -> dict term -> DataFrame. Postal codes of the same warehouse share
+        the same DataFrame objects.
+    """
+    run_ts = run_ts or nuevo_run_ts()
+    session = crear_sesion_http()
+    almacenes = almacenes_por_codigo(codigos_postales, session, cache, ttl_s, url_api)
+    grupos = agrupar_por_almacen(almacenes)
+    print(f"{len(almacenes)} códigos postales en {len(grupos)} almacenes.")
+
+    conn = abrir_store(store_path) if store_path else None
+    resultados = {}
+    try:
+        for almacen, codigos in grupos.items():
+            inicio = time.perf_counter()
+            if backend == 'selenium':
+                tablas = extraer_almacen_selenium(codigos[0], terms, url_tienda)
+            else:
+                tablas = extraer_almacen_http(session, almacen, terms, url_busqueda)
+            print(f"Almacén {almacen}: {len(tablas)} términos en {time.perf_counter() - inicio:.1f} s "
+                  f"para {len(codigos)} códigos postales.")
+
+            for codigo_postal in codigos:
+                resultados[codigo_postal] = tablas
+                if conn is not None:
+                    guardar_snapshots(conn, tablas, codigo_postal, run_ts)
+    finally:
+        if conn is not None:
+            conn.close()
+    return resultados
+
+
+if __name__ == "__main__":
+    from guardar_productos import LISTA_PRODUCTOS
+
+    if len(sys.argv) < 2:
+        print("Uso: python barrido.py codigos_postales.txt [http|selenium]")
+        sys.exit(2)
+    with open(sys.argv[1], encoding='utf-8') as f:
+        codigos = [linea.strip() for linea in f if linea.strip()]
+    barrer_codigos_postales(codigos, LISTA_PRODUCTOS, backend=sys.argv[2] if len(sys.argv) > 2 else 'http')
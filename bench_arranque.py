@@ -0,0 +1,67 @@
+#Benchmark: tiempo hasta la primera busqueda con arranque en frio frente a conexion al navegador persistente
+#Uso: python bench_arranque.py
+import tempfile
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from webdriver_manager.chrome import ChromeDriverManager
+
+from browser_session import arrancar_navegador_persistente, conectar_navegador, ruta_chromedriver, soltar_navegador
+from fixture_server import start_fixture_server
+from functions import mark_results, search_and_submit, wait_for_results_ready
+from guardar_productos import CODIGO_POSTAL, crear_driver, preparar_sesion
+
+# Puerto y perfil distintos de los de uso normal para no tocar el navegador persistente real
+PUERTO_BENCH = 9333
+PERFIL_BENCH = tempfile.mkdtemp(prefix='perfil_bench_')
+
+
+def primera_busqueda(driver, url):
+    """Prepares the session and runs one search. Returns the seconds it took"""
+    wait = WebDriverWait(driver, 5)
+    preparar_sesion(driver, wait, CODIGO_POSTAL, url)
+    previous_signature = mark_results(driver)
+    search_and_submit(driver, wait, 'leche')
+    wait_for_results_ready(driver, previous_signature)
+
+
+server, base_url = start_fixture_server()
+url = f"{base_url}/index.html"
+try:
+    inicio = time.perf_counter()
+    ChromeDriverManager().install()
+    t_manager = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    ruta_chromedriver()
+    t_cache = time.perf_counter() - inicio
+
+    # Arranque en frio: Chrome nuevo, cookies y codigo postal
+    inicio = time.perf_counter()
+    driver = crear_driver(headless=True)
+    primera_busqueda(driver, url)
+    t_frio = time.perf_counter() - inicio
+    driver.quit()
+
+    # Dejar un navegador persistente preparado (no se mide)
+    arrancar_navegador_persistente(puerto=PUERTO_BENCH, perfil=PERFIL_BENCH, headless=True)
+    driver = conectar_navegador(PUERTO_BENCH)
+    primera_busqueda(driver, url)
+    soltar_navegador(driver)
+
+    # Arranque en caliente: conectarse al navegador persistente
+    inicio = time.perf_counter()
+    driver = conectar_navegador(PUERTO_BENCH)
+    primera_busqueda(driver, url)
+    t_caliente = time.perf_counter() - inicio
+    # Cerrar el navegador del benchmark
+    driver.quit()
+
+    print('--------------------------------------------------------------')
+    print(f"chromedriver con ChromeDriverManager: {t_manager * 1000:.0f} ms")
+    print(f"chromedriver desde la caché:          {t_cache * 1000:.1f} ms")
+    print(f"Primera búsqueda en frío:             {t_frio:.2f} s")
+    print(f"Primera búsqueda en caliente:         {t_caliente:.2f} s")
+finally:
+    server.shutdown()
@@ -0,0 +1,49 @@
+#Benchmark: deteccion de cambios (cambios.py) entre dos catalogos sinteticos de N productos con un 2% de
+#precios cambiados, un 0,5% de formatos cambiados, un 1% de productos retirados y otro 1% de nuevos
+#Uso: python bench_cambios.py [productos]
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from cambios import detectar_cambios
+
+PRODUCTOS = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+REPETICIONES = 5
+
+
+def catalogo(n, rng, desde=0):
+    ids = np.arange(desde, desde + n)
+    return pd.DataFrame({
+        'codigo_postal': rng.choice(['46007', '28001', '08001'], n),
+        'termino': rng.choice(['leche', 'agua', 'vino', 'pan', 'fruta'], n),
+        'id': ids.astype(str),
+        'Nombre_producto': [f"Producto {i}" for i in ids],
+        'Precio': [f"{p:.2f} €".replace('.', ',') for p in rng.uniform(0.3, 20, n)],
+        'etiqueta': rng.choice(['ud', 'pack'], n),
+        'formato': rng.choice(['Brick 1 L', 'Paquete 500 g', 'Pack-6 6 x 1,5 L', 'Botella 75 cl'], n),
+    })
+
+
+rng = np.random.default_rng(0)
+anterior = catalogo(PRODUCTOS, rng)
+nuevo = anterior.copy()
+cambia_precio = rng.random(PRODUCTOS) < 0.02
+nuevo.loc[cambia_precio, 'Precio'] = [f"{p:.2f} €".replace('.', ',')
+                                      for p in rng.uniform(0.3, 20, cambia_precio.sum())]
+cambia_formato = rng.random(PRODUCTOS) < 0.005
+nuevo.loc[cambia_formato, 'formato'] = 'Garrafa 5 L'
+nuevo = nuevo[rng.random(PRODUCTOS) >= 0.01]
+nuevo = pd.concat([nuevo, catalogo(PRODUCTOS // 100, rng, desde=PRODUCTOS)], ignore_index=True)
+
+tiempos = []
+for _ in range(REPETICIONES):
+    inicio = time.perf_counter()
+    cambios = detectar_cambios(anterior, nuevo)
+    tiempos.append(time.perf_counter() - inicio)
+
+print('--------------------------------------------------------------')
+print(f"{len(anterior)} productos antes, {len(nuevo)} después")
+print(f"Cambios: {cambios['tipo'].value_counts().to_dict()}")
+print(f"detectar_cambios: mediana {np.median(tiempos) * 1000:.0f} ms, mínimo {min(tiempos) * 1000:.0f} ms")
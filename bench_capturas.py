@@ -0,0 +1,64 @@
+#Benchmark: coste de las capturas de resultados en varias ejecuciones seguidas. Compara la captura PNG de la
+#ventana de siempre con capturas.GestorCapturas (solo el grid, WebP) con cada politica. En la tienda de prueba
+#los precios no cambian entre ejecuciones, asi que 'cambio_precio' solo captura la primera vez.
+#Uso: python bench_capturas.py [ejecuciones]
+import os
+import sys
+import tempfile
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from capturas import GestorCapturas
+from fixture_server import start_fixture_server
+from guardar_productos import CODIGO_POSTAL, LISTA_PRODUCTOS, buscar_termino, crear_driver, iniciar_sesion
+from guardar_productos import sanitizar_termino
+
+EJECUCIONES = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+server, base_url = start_fixture_server()
+url = f"{base_url}/index.html"
+carpeta = tempfile.mkdtemp(prefix='bench_capturas_')
+driver = crear_driver(headless=True)
+wait = WebDriverWait(driver, 5)
+
+try:
+    iniciar_sesion(driver, wait, CODIGO_POSTAL, url)
+    resultados = {}
+    for nombre in ('png_ventana', 'siempre', 'cada_n', 'cambio_precio'):
+        gestor = None
+        if nombre != 'png_ventana':
+            gestor = GestorCapturas(os.path.join(carpeta, f"{nombre}.sqlite"), politica=nombre, cada_n=3)
+        bytes_escritos = 0
+        segundos = 0.0
+        for _ in range(EJECUCIONES):
+            for term in LISTA_PRODUCTOS:
+                buscar_termino(driver, wait, term)
+                carpeta_termino = os.path.join(carpeta, nombre, sanitizar_termino(term))
+                os.makedirs(carpeta_termino, exist_ok=True)
+                inicio = time.perf_counter()
+                if gestor is None:
+                    png = driver.get_screenshot_as_png()
+                    with open(os.path.join(carpeta_termino, 'captura.png'), 'wb') as f:
+                        f.write(png)
+                    bytes_escritos += len(png)
+                else:
+                    captura = gestor.capturar(driver, sanitizar_termino(term), CODIGO_POSTAL)
+                    if captura is not None:
+                        captura.guardar(carpeta_termino, sanitizar_termino(term))
+                segundos += time.perf_counter() - inicio
+        if gestor is not None:
+            metricas = gestor.metricas()
+            bytes_escritos = metricas['bytes_escritos']
+            gestor.close()
+        resultados[nombre] = (bytes_escritos, segundos)
+
+    print('--------------------------------------------------------------')
+    print(f"{EJECUCIONES} ejecuciones de {len(LISTA_PRODUCTOS)} términos")
+    base_bytes, base_s = resultados['png_ventana']
+    for nombre, (bytes_escritos, segundos) in resultados.items():
+        print(f"{nombre:<14}{bytes_escritos / 1024:>10.1f} KB escritos{segundos:>8.2f} s   "
+              f"ahorro {(base_bytes - bytes_escritos) / 1024:>9.1f} KB, {base_s - segundos:>6.2f} s")
+finally:
+    driver.quit()
+    server.shutdown()
@@ -0,0 +1,49 @@
+#Benchmark: llenado del carro linea a linea (click_add_to_cart_by_name) frente a llenar_carro, contra la tienda de prueba
+#Uso: python bench_carro.py [lineas]
+import sys
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from cart import llenar_carro
+from fixture_server import lista_compra_de_prueba, start_fixture_server
+from functions import click_add_to_cart_by_name, mark_results, search_and_submit, wait_for_results_ready
+from guardar_productos import CODIGO_POSTAL, LISTA_PRODUCTOS, crear_driver, iniciar_sesion
+
+LINEAS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+
+def linea_a_linea(driver, wait, lista):
+    """The previous way: one search and one click_add_to_cart_by_name per line"""
+    for _, linea in lista.iterrows():
+        previous_signature = mark_results(driver)
+        search_and_submit(driver, wait, linea['Busqueda'])
+        wait_for_results_ready(driver, previous_signature)
+        click_add_to_cart_by_name(driver, wait, linea['Producto'], linea['Cantidad'],
+                                  linea['Etiqueta'], linea['Subtitulo'])
+
+
+server, base_url = start_fixture_server()
+lista = lista_compra_de_prueba(LISTA_PRODUCTOS, LINEAS)
+try:
+    tiempos = {}
+    for nombre, llenar in (('Línea a línea', linea_a_linea), ('llenar_carro', llenar_carro)):
+        # Sesion nueva para empezar con el carro vacio
+        driver = crear_driver(headless=True)
+        wait = WebDriverWait(driver, 5)
+        try:
+            iniciar_sesion(driver, wait, CODIGO_POSTAL, f"{base_url}/index.html")
+            inicio = time.perf_counter()
+            informe = llenar(driver, wait, lista)
+            tiempos[nombre] = time.perf_counter() - inicio
+        finally:
+            driver.quit()
+
+    print('--------------------------------------------------------------')
+    print(f"Líneas: {len(lista)}, unidades pedidas: {lista['Cantidad'].sum()}")
+    for nombre, segundos in tiempos.items():
+        print(f"{nombre}: {segundos:.1f} s")
+    print(f"Speedup: x{tiempos['Línea a línea'] / tiempos['llenar_carro']:.1f}")
+    print(informe['estado'].value_counts().to_string())
+finally:
+    server.shutdown()
@@ -0,0 +1,77 @@
+#Benchmark: catalogo compacto (catalogo.py) contra la tabla de texto de hoy (columnas object) con P productos
+#extraidos en varios codigos postales y dias: tiempo de construccion, memoria y latencia de busqueda de un
+#producto y de un codigo postal
+#Uso: python bench_catalogo.py [productos] [dias]
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalogo import Catalogo
+
+PRODUCTOS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+DIAS = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+CODIGOS_POSTALES = ['46007', '28001', '08001', '41001', '48001']
+TERMINOS = ['leche', 'agua', 'vino', 'pan', 'fruta', 'aceite', 'arroz', 'huevos', 'yogur', 'cafe']
+BUSQUEDAS = 200
+
+
+def tabla_termino(ids, rng):
+    return pd.DataFrame({
+        'id': ids.astype(str),
+        'Nombre_producto': [f"Producto {i}" for i in ids],
+        'Precio': [f"{p:.2f} €".replace('.', ',') for p in rng.uniform(0.3, 20, len(ids))],
+        'etiqueta': rng.choice(['ud', 'pack'], len(ids)),
+        'formato': rng.choice(['Brick 1 L', 'Paquete 500 g', 'Pack-6 6 x 1,5 L', 'Botella 75 cl'], len(ids)),
+    })
+
+
+rng = np.random.default_rng(0)
+por_termino = np.array_split(np.arange(PRODUCTOS), len(TERMINOS))
+lotes = [(f"2024-01-{dia + 1:02d}T08:00:00", cp, termino, tabla_termino(ids, rng))
+         for dia in range(DIAS) for cp in CODIGOS_POSTALES for termino, ids in zip(TERMINOS, por_termino)]
+
+inicio = time.perf_counter()
+objeto = pd.concat([df.assign(run_ts=run_ts, codigo_postal=cp, termino=termino)
+                    for run_ts, cp, termino, df in lotes], ignore_index=True)
+segundos_objeto = time.perf_counter() - inicio
+
+inicio = time.perf_counter()
+catalogo = Catalogo()
+for run_ts, cp, termino, df in lotes:
+    catalogo.anadir(df, termino, cp, run_ts)
+segundos_catalogo = time.perf_counter() - inicio
+
+bytes_objeto = objeto.memory_usage(deep=True).sum()
+memoria = catalogo.memoria()
+bytes_categorica = catalogo.tabla().memory_usage(deep=True).sum()
+
+buscados = rng.integers(0, PRODUCTOS, BUSQUEDAS)
+inicio = time.perf_counter()
+for i in buscados:
+    objeto[objeto['id'] == str(i)]
+ms_objeto = (time.perf_counter() - inicio) / BUSQUEDAS * 1000
+inicio = time.perf_counter()
+for i in buscados:
+    catalogo.producto(id=i)
+ms_catalogo = (time.perf_counter() - inicio) / BUSQUEDAS * 1000
+
+inicio = time.perf_counter()
+for cp in CODIGOS_POSTALES:
+    objeto[objeto['codigo_postal'] == cp]
+ms_cp_objeto = (time.perf_counter() - inicio) / len(CODIGOS_POSTALES) * 1000
+inicio = time.perf_counter()
+for cp in CODIGOS_POSTALES:
+    catalogo.codigo_postal(cp)
+ms_cp_catalogo = (time.perf_counter() - inicio) / len(CODIGOS_POSTALES) * 1000
+
+print('--------------------------------------------------------------')
+print(f"{len(catalogo)} filas: {PRODUCTOS} productos x {len(CODIGOS_POSTALES)} códigos postales x {DIAS} días")
+print(f"Construcción: object {segundos_objeto:.2f} s, catálogo {segundos_catalogo:.2f} s")
+print(f"Memoria: object {bytes_objeto / 2**20:.1f} MB, catálogo {memoria['total'] / 2**20:.1f} MB "
+      f"(filas {memoria['filas'] / 2**20:.1f}, diccionarios {memoria['diccionarios'] / 2**20:.1f}, "
+      f"índices {memoria['indices'] / 2**20:.1f}) -> {memoria['total'] / bytes_objeto:.0%}; "
+      f"tabla() categórica {bytes_categorica / 2**20:.1f} MB")
+print(f"Buscar un producto: object {ms_objeto:.3f} ms, catálogo {ms_catalogo:.3f} ms")
+print(f"Filas de un código postal: object {ms_cp_objeto:.3f} ms, catálogo {ms_cp_catalogo:.3f} ms")
@@ -0,0 +1,57 @@
+#Benchmark: grid con carga perezosa leido bajando y releyendo todas las celdas en cada paso frente a
+#harvest_products, que solo lee las celdas nuevas de cada paso
+#Uso: python bench_cosecha.py [celdas_por_pagina]
+import sys
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from fixture_server import start_fixture_server
+from functions import HARVEST_QUIET_MS, PRODUCT_CELLS_JS, harvest_products, mark_results, search_and_submit
+from functions import wait_for_results_ready
+from guardar_productos import CODIGO_POSTAL, LISTA_PRODUCTOS, crear_driver, iniciar_sesion
+
+PAGINA = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+
+
+def releer_todo(driver):
+    """Scrolls to the end and re-reads every cell until the count stops changing. Returns (products, cells read)"""
+    leidas = 0
+    while True:
+        records = driver.execute_script(PRODUCT_CELLS_JS)
+        leidas += len(records)
+        driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
+        time.sleep(HARVEST_QUIET_MS / 1000)
+        if len(driver.find_elements('css selector', 'div[data-testid="product-cell"]')) == len(records):
+            return records, leidas
+
+
+server, base_url = start_fixture_server()
+driver = crear_driver(headless=True)
+wait = WebDriverWait(driver, 5)
+try:
+    iniciar_sesion(driver, wait, CODIGO_POSTAL, f"{base_url}/index.html?pagina={PAGINA}")
+    totales = {'Releer todo': [0.0, 0, 0], 'harvest_products': [0.0, 0, 0]}
+    for nombre in totales:
+        for term in LISTA_PRODUCTOS:
+            previous_signature = mark_results(driver)
+            driver.execute_script("window.scrollTo(0, 0);")
+            search_and_submit(driver, wait, term)
+            wait_for_results_ready(driver, previous_signature)
+            inicio = time.perf_counter()
+            if nombre == 'Releer todo':
+                productos, leidas = releer_todo(driver)
+            else:
+                productos = harvest_products(driver)
+                leidas = len(productos)
+            totales[nombre][0] += time.perf_counter() - inicio
+            totales[nombre][1] += len(productos)
+            totales[nombre][2] += leidas
+
+    print('--------------------------------------------------------------')
+    print(f"Celdas por página: {PAGINA}, términos: {len(LISTA_PRODUCTOS)}")
+    for nombre, (segundos, productos, leidas) in totales.items():
+        print(f"{nombre}: {segundos:.1f} s, {productos} productos, {leidas} celdas leídas")
+finally:
+    driver.quit()
+    server.shutdown()
@@ -0,0 +1,52 @@
+#Benchmark: extraccion celda a celda vs extraccion batch (un solo execute_script)
+#Uso: python bench_extraccion.py [repeticiones]
+import sys
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
+
+from webdriver_manager.chrome import ChromeDriverManager
+
+from functions import guardar_productos_2
+from fixture_server import start_fixture_server
+
+REPETICIONES = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+
+def medir(driver, wait, batch):
+    """Runs guardar_productos_2 REPETICIONES times and returns (seconds per run, last DataFrame)"""
+    tiempos = []
+    df = None
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        df = guardar_productos_2(driver, wait, 'leche', batch=batch)
+        tiempos.append(time.perf_counter() - inicio)
+    return sorted(tiempos)[len(tiempos) // 2], df
+
+
+server, base_url = start_fixture_server()
+
+options = Options()
+options.add_argument("--headless")
+service = Service(ChromeDriverManager().install())
+driver = webdriver.Chrome(service=service, options=options)
+wait = WebDriverWait(driver, 5)
+
+try:
+    driver.get(f"{base_url}/resultados_busqueda.html")
+
+    t_celdas, df_celdas = medir(driver, wait, batch=False)
+    t_batch, df_batch = medir(driver, wait, batch=True)
+
+    print('--------------------------------------------------------------')
+    print(f"Productos extraidos: {len(df_batch)}")
+    print(f"Celda a celda: {t_celdas * 1000:.1f} ms (mediana de {REPETICIONES})")
+    print(f"Batch:         {t_batch * 1000:.1f} ms (mediana de {REPETICIONES})")
+    print(f"Speedup:       x{t_celdas / t_batch:.1f}")
+    print(f"Mismo resultado: {df_celdas.equals(df_batch)}")
+finally:
+    driver.quit()
+    server.shutdown()
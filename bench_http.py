@@ -0,0 +1,50 @@
+#Benchmark: coste por termino del backend HTTP frente al flujo Selenium, contra la tienda de prueba
+#Uso: python bench_http.py [--solo-http]
+import sys
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from fixture_server import start_fixture_server
+from functions import guardar_productos_2, mark_results, search_and_submit, wait_for_results_ready
+from guardar_productos import CODIGO_POSTAL, LISTA_PRODUCTOS, crear_driver, iniciar_sesion
+from http_backend import buscar_terminos_http, crear_sesion_http, resolver_almacen
+
+SOLO_HTTP = '--solo-http' in sys.argv
+
+
+server, base_url = start_fixture_server()
+try:
+    session = crear_sesion_http()
+    almacen = resolver_almacen(session, CODIGO_POSTAL, url_api=f"{base_url}/api")
+    url_busqueda = f"{base_url}/1/indexes/products_prod_{{almacen}}_es/query"
+
+    inicio = time.perf_counter()
+    tablas_http = buscar_terminos_http(session, LISTA_PRODUCTOS, almacen, url_busqueda)
+    t_http = (time.perf_counter() - inicio) / len(LISTA_PRODUCTOS)
+
+    print('--------------------------------------------------------------')
+    print(f"HTTP:     {t_http * 1000:.1f} ms por término")
+
+    if not SOLO_HTTP:
+        driver = crear_driver(headless=True)
+        wait = WebDriverWait(driver, 5)
+        try:
+            iniciar_sesion(driver, wait, CODIGO_POSTAL, f"{base_url}/index.html")
+            tablas_selenium = {}
+            inicio = time.perf_counter()
+            for term in LISTA_PRODUCTOS:
+                previous_signature = mark_results(driver)
+                search_and_submit(driver, wait, term)
+                wait_for_results_ready(driver, previous_signature)
+                tablas_selenium[term] = guardar_productos_2(driver, wait, term)
+            t_selenium = (time.perf_counter() - inicio) / len(LISTA_PRODUCTOS)
+        finally:
+            driver.quit()
+
+        iguales = all(tablas_selenium[t].equals(tablas_http[t]) for t in LISTA_PRODUCTOS)
+        print(f"Selenium: {t_selenium * 1000:.1f} ms por término")
+        print(f"Ratio:    x{t_selenium / t_http:.0f}")
+        print(f"Mismo resultado: {iguales}")
+finally:
+    server.shutdown()
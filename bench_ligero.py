@@ -0,0 +1,53 @@
+#Benchmark: bytes transferidos y tiempo hasta que la pagina se estabiliza por termino, con y sin modo ligero,
+#contra la tienda de prueba o una grabacion de record_replay.py
+#Uso: python bench_ligero.py [carpeta_grabacion]
+import sys
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from fixture_server import start_fixture_server
+from guardar_productos import CODIGO_POSTAL, LISTA_PRODUCTOS, buscar_termino, crear_driver, iniciar_sesion
+from guardar_productos import leer_resultados
+from lean_mode import iniciar_medicion, informe_termino, informes
+
+if len(sys.argv) > 1:
+    from record_replay import start_replay_server
+    server, url, manifiesto = start_replay_server(sys.argv[1])
+    terms = manifiesto['terminos']
+else:
+    server, base_url = start_fixture_server()
+    url = f"{base_url}/index.html"
+    terms = LISTA_PRODUCTOS
+
+try:
+    resultados = {}
+    for nombre, ligero in (('Completo', False), ('Ligero', True)):
+        driver = crear_driver(headless=True, ligero=ligero)
+        wait = WebDriverWait(driver, 5)
+        try:
+            iniciar_sesion(driver, wait, CODIGO_POSTAL, url)
+            medidas = []
+            for term in terms:
+                if ligero:
+                    # buscar_termino registra el informe del termino en modo ligero
+                    buscar_termino(driver, wait, term)
+                else:
+                    inicio = iniciar_medicion(driver)
+                    buscar_termino(driver, wait, term)
+                    medidas.append(informe_termino(driver, term, inicio))
+                leer_resultados(driver, wait, term)
+            resultados[nombre] = informes(driver) if ligero else medidas
+        finally:
+            driver.quit()
+
+    print('--------------------------------------------------------------')
+    print(f"{'Término':<14}{'KB completo':>12}{'KB ligero':>11}{'ms completo':>13}{'ms ligero':>11}")
+    for completo, ligero in zip(resultados['Completo'], resultados['Ligero']):
+        print(f"{completo['termino']:<14}{completo['bytes'] / 1024:>12.1f}{ligero['bytes'] / 1024:>11.1f}"
+              f"{completo['estable_ms']:>13.0f}{ligero['estable_ms']:>11.0f}")
+    for nombre, medidas in resultados.items():
+        total_kb = sum(m['bytes'] for m in medidas) / 1024
+        media_ms = sum(m['estable_ms'] for m in medidas) / max(1, len(medidas))
+        print(f"{nombre}: {total_kb:.1f} KB en total, {media_ms:.0f} ms de media hasta estabilizarse")
+finally:
+    server.shutdown()
@@ -0,0 +1,71 @@
+#Benchmark: construccion del indice de matching.py y latencia por busqueda con un catalogo sintetico de
+#50.000 productos generado a partir de las respuestas grabadas en fixtures/api
+#Uso: python bench_matching.py [productos]
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from fixture_server import FIXTURES_FOLDER
+from http_backend import producto_desde_json
+from matching import IndiceProductos
+
+PRODUCTOS = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+VARIANTES = ['sin lactosa', 'light', 'ecológico', 'familiar', 'mini', 'maxi', 'sabor fresa', 'integral', '0%']
+MARCAS = ['Hacendado', 'Deliplus', 'Bosque Verde', 'Pascual', 'Danone', 'Nestlé', 'Central Lechera']
+
+
+def catalogo_sintetico(n):
+    """The recorded products plus variants with extra words until there are n rows, each with its own id"""
+    hits = [h for f in glob.glob(os.path.join(FIXTURES_FOLDER, 'api', 'search', '*.json'))
+            for h in json.load(open(f, encoding='utf-8'))['hits']]
+    # Un producto por nombre y etiqueta: la consulta no dice mas, asi que cada una tiene un solo id correcto
+    base = (pd.DataFrame([producto_desde_json(h) for h in hits])
+            .drop_duplicates(['Nombre_producto', 'etiqueta']).to_dict('records'))
+    rng = random.Random(0)
+    filas = list(base)
+    while len(filas) < n:
+        producto = dict(rng.choice(base))
+        producto['Nombre_producto'] += f" {rng.choice(VARIANTES)} {rng.choice(MARCAS)} {rng.randint(1, 999)}"
+        filas.append(producto)
+    catalogo = pd.DataFrame(filas)
+    catalogo['id'] = range(len(catalogo))
+    return catalogo, catalogo.iloc[:len(base)].to_dict('records')
+
+
+catalogo, originales = catalogo_sintetico(PRODUCTOS)
+inicio = time.perf_counter()
+indice = IndiceProductos(catalogo)
+construccion_s = time.perf_counter() - inicio
+
+# Consultas como en prueba_compra.xlsx: espacios de sobra, sin acentos, mayusculas o sin la marca
+rng = random.Random(1)
+consultas = []
+for producto in rng.sample(originales, min(200, len(originales))):
+    nombre = producto['Nombre_producto']
+    nombre = rng.choice([f"        {nombre} ", nombre.upper(), nombre.replace('á', 'a').replace('é', 'e'),
+                         ' '.join(nombre.split()[:-1]) or nombre])
+    consultas.append((nombre, producto['etiqueta'], producto['id']))
+
+tiempos = []
+aciertos = 0
+correctos = 0
+for nombre, etiqueta, esperado in consultas:
+    t = time.perf_counter()
+    encontrados = indice.buscar(nombre, etiqueta)
+    tiempos.append((time.perf_counter() - t) * 1000)
+    aciertos += bool(encontrados) and encontrados[0]['confianza'] >= 0.6
+    correctos += bool(encontrados) and encontrados[0]['id'] == esperado
+
+print('--------------------------------------------------------------')
+print(f"Productos: {len(catalogo)}, construcción del índice: {construccion_s:.2f} s")
+print(f"Búsquedas: {len(consultas)}, p50 {np.percentile(tiempos, 50):.3f} ms, p95 {np.percentile(tiempos, 95):.3f} ms, "
+      f"máx {max(tiempos):.3f} ms")
+print(f"Emparejadas con confianza >= 0.6: {aciertos} de {len(consultas)}; "
+      f"primer resultado correcto: {correctos} de {len(consultas)} ({correctos / len(consultas):.0%})")
@@ -0,0 +1,76 @@
+#Benchmark: terminos/min con K pestañas en la misma sesion de Chrome (pestanas.py) y memoria de Chrome por
+#pestaña, contra la tienda de prueba con latencia simulada o contra una grabacion de record_replay.py
+#Uso: python bench_pestanas.py [carpeta_grabacion] [--latencia ms] [--repeticiones n]
+import argparse
+import time
+
+import psutil
+from selenium.webdriver.support.ui import WebDriverWait
+
+from fixture_server import start_fixture_server
+from guardar_productos import CODIGO_POSTAL, LISTA_PRODUCTOS, crear_driver, iniciar_sesion
+from pestanas import abrir_pestanas, cerrar_pestanas, extraer_en_pestanas
+
+NIVELES = [1, 2, 4, 8]
+
+
+def memoria_chrome(driver):
+    """RSS in bytes of every process started by chromedriver (browser, renderers, GPU...)"""
+    total = 0
+    for proceso in psutil.Process(driver.service.process.pid).children(recursive=True):
+        try:
+            total += proceso.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('grabacion', nargs='?', help="Carpeta grabada con record_replay.py")
+parser.add_argument('--latencia', type=float, default=150, help="Latencia simulada por respuesta (ms)")
+parser.add_argument('--repeticiones', type=int, default=2, help="Veces que se recorre la lista de términos")
+args = parser.parse_args()
+
+if args.grabacion:
+    from record_replay import start_replay_server
+    server, url, manifiesto = start_replay_server(args.grabacion, latencia_ms=args.latencia)
+    terms = manifiesto['terminos'] * args.repeticiones
+else:
+    server, base_url = start_fixture_server(latencia_ms=args.latencia)
+    url = f"{base_url}/index.html"
+    terms = LISTA_PRODUCTOS * args.repeticiones
+
+resultados = []
+try:
+    for k in NIVELES:
+        driver = crear_driver(headless=True, pestanas=True)
+        wait = WebDriverWait(driver, 5)
+        try:
+            iniciar_sesion(driver, wait, CODIGO_POSTAL, url)
+            memoria_una = memoria_chrome(driver)
+            handles = abrir_pestanas(driver, wait, k, CODIGO_POSTAL)
+            hechos = 0
+            inicio = time.perf_counter()
+            for term, df, png, error in extraer_en_pestanas(driver, wait, terms, handles):
+                if error is None:
+                    hechos += 1
+                else:
+                    print(f"Error al procesar el producto '{term}': {error}")
+            segundos = time.perf_counter() - inicio
+            memoria = memoria_chrome(driver)
+            cerrar_pestanas(driver, handles)
+        finally:
+            driver.quit()
+        por_pestana = (memoria - memoria_una) / (k - 1) if k > 1 else memoria
+        resultados.append((k, hechos, segundos, memoria, por_pestana))
+finally:
+    server.shutdown()
+
+print('--------------------------------------------------------------')
+print(f"{len(terms)} términos, latencia {args.latencia:.0f} ms")
+base = resultados[0][1] / resultados[0][2]
+for k, hechos, segundos, memoria, por_pestana in resultados:
+    throughput = hechos / segundos
+    print(f"{k:>2} pestañas: {hechos} términos en {segundos:.1f} s -> {throughput * 60:.1f} términos/min "
+          f"(x{throughput / base:.2f}), Chrome {memoria / 2**20:.0f} MB, "
+          f"{por_pestana / 2**20:.0f} MB por pestaña{' adicional' if k > 1 else ''}")
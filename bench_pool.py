@@ -0,0 +1,41 @@
+#Benchmark: throughput del pool de navegadores con N workers contra la tienda de prueba
+#Uso: python bench_pool.py [repeticiones de LISTA_PRODUCTOS]
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+from fixture_server import start_fixture_server
+from guardar_productos import LISTA_PRODUCTOS
+from worker_pool import run_pool
+
+REPETICIONES = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+
+
+if __name__ == "__main__":
+    server, base_url = start_fixture_server()
+    terms = LISTA_PRODUCTOS * REPETICIONES
+
+    niveles = [1]
+    while niveles[-1] * 2 <= mp.cpu_count():
+        niveles.append(niveles[-1] * 2)
+
+    resultados = []
+    try:
+        for n_workers in niveles:
+            with tempfile.TemporaryDirectory() as carpeta:
+                inicio = time.perf_counter()
+                resultado = run_pool(terms, n_workers, url=f"{base_url}/index.html",
+                                     main_folder=carpeta, store_path=os.path.join(carpeta, 'productos.sqlite'))
+                segundos = time.perf_counter() - inicio
+            resultados.append((n_workers, len(resultado['done']), segundos))
+    finally:
+        server.shutdown()
+
+    print('--------------------------------------------------------------')
+    base = resultados[0][1] / resultados[0][2]
+    for n_workers, hechos, segundos in resultados:
+        throughput = hechos / segundos
+        print(f"{n_workers:>2} workers: {hechos} términos en {segundos:.1f} s "
+              f"-> {throughput * 60:.1f} términos/min (x{throughput / base:.2f})")
@@ -0,0 +1,170 @@
+#Suite de benchmarks: flujo completo, extraccion por termino y llenado del carro contra la tienda de prueba
+#(fixtures/) o una grabacion de record_replay.py, con latencia de red simulada. Compara cada metrica con la
+#linea base guardada y termina con codigo 1 si alguna empeora mas del umbral.
+#Uso: python bench_suite.py [--grabacion carpeta] [--latencia ms] [--jitter ms] [--lineas n]
+#                           [--baseline bench_baseline.json] [--guardar-baseline] [--umbral 0.2]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from cart import llenar_carro
+from fixture_server import lista_compra_de_prueba, start_fixture_server
+from guardar_productos import CODIGO_POSTAL, LISTA_PRODUCTOS, crear_driver, extraer_termino, iniciar_sesion
+from guardar_productos import procesar_termino
+
+BASELINE = "bench_baseline.json"
+UMBRAL = 0.20
+
+
+def latencias(tiempos, total_s, unidad):
+    """Throughput per minute and latency distribution of a list of durations in seconds"""
+    ms = np.array(tiempos) * 1000
+    return {
+        f'{unidad}_min': len(tiempos) / total_s * 60 if total_s else 0.0,
+        'total_s': total_s,
+        'p50_ms': float(np.percentile(ms, 50)) if len(ms) else 0.0,
+        'p95_ms': float(np.percentile(ms, 95)) if len(ms) else 0.0,
+        'max_ms': float(ms.max()) if len(ms) else 0.0,
+    }
+
+
+def flujo_completo(url, terms, codigo_postal):
+    """Cold start to last term written: driver, session, then search, extract and write every term"""
+    inicio = time.perf_counter()
+    driver = crear_driver(headless=True)
+    wait = WebDriverWait(driver, 5)
+    tiempos = []
+    try:
+        iniciar_sesion(driver, wait, codigo_postal, url)
+        with tempfile.TemporaryDirectory() as carpeta:
+            for term in terms:
+                t = time.perf_counter()
+                procesar_termino(driver, wait, term, carpeta, codigo_postal=codigo_postal, excel=False)
+                tiempos.append(time.perf_counter() - t)
+        total_s = time.perf_counter() - inicio
+
+        # Con la sesion ya abierta: solo busqueda, espera y extraccion de cada termino
+        tiempos_extraccion = []
+        inicio = time.perf_counter()
+        for term in terms:
+            t = time.perf_counter()
+            extraer_termino(driver, wait, term)
+            tiempos_extraccion.append(time.perf_counter() - t)
+        total_extraccion_s = time.perf_counter() - inicio
+    finally:
+        driver.quit()
+    return (latencias(tiempos, total_s, 'terminos'),
+            latencias(tiempos_extraccion, total_extraccion_s, 'terminos'))
+
+
+def carro(url, lista, codigo_postal):
+    """Fills the cart with a shopping list in a fresh session"""
+    driver = crear_driver(headless=True)
+    wait = WebDriverWait(driver, 5)
+    try:
+        iniciar_sesion(driver, wait, codigo_postal, url)
+        inicio = time.perf_counter()
+        informe = llenar_carro(driver, wait, lista)
+        total_s = time.perf_counter() - inicio
+    finally:
+        driver.quit()
+    return {
+        'lineas_min': len(lista) / total_s * 60,
+        'total_s': total_s,
+        'fallidas': int((~informe['estado'].isin(['added', 'clamped', 'skipped'])).sum()),
+    }
+
+
+def comparar(resultados, baseline, umbral):
+    """
+    Metrics that got worse than the baseline by more than umbral (relative).
+    Throughput metrics (*_min) regress when they go down, the rest when they go up.
+    Returns:
+        List of (scenario, metric, baseline value, current value).
+    """
+    regresiones = []
+    for escenario, metricas in resultados.items():
+        for nombre, valor in metricas.items():
+            base = baseline.get(escenario, {}).get(nombre)
+            if base is None:
+                continue
+            if nombre.endswith('_min'):
+                peor = valor < base * (1 - umbral)
+            elif base == 0:
+                peor = valor > 0
+            else:
+                peor = valor > base * (1 + umbral)
+            if peor:
+                regresiones.append((escenario, nombre, base, valor))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del flujo con detección de regresiones")
+    parser.add_argument('--grabacion', help="Carpeta grabada con record_replay.py (por defecto fixtures/)")
+    parser.add_argument('--latencia', type=float, default=0, help="Latencia añadida a cada respuesta, en ms")
+    parser.add_argument('--jitter', type=float, default=0, help="Variación aleatoria de la latencia, +- ms")
+    parser.add_argument('--lineas', type=int, default=50, help="Líneas de la lista de la compra del carro")
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--guardar-baseline', action='store_true', help="Guarda estos resultados como línea base")
+    parser.add_argument('--umbral', type=float, default=UMBRAL, help="Empeoramiento relativo tolerado")
+    args = parser.parse_args()
+
+    if args.grabacion:
+        from record_replay import start_replay_server
+        server, url, manifiesto = start_replay_server(args.grabacion, args.latencia, args.jitter)
+        terms = manifiesto['terminos']
+        codigo_postal = manifiesto.get('codigo_postal', CODIGO_POSTAL)
+    else:
+        server, base_url = start_fixture_server(latencia_ms=args.latencia, jitter_ms=args.jitter)
+        url = f"{base_url}/index.html"
+        terms = LISTA_PRODUCTOS
+        codigo_postal = CODIGO_POSTAL
+
+    resultados = {}
+    try:
+        resultados['flujo_completo'], resultados['extraccion'] = flujo_completo(url, terms, codigo_postal)
+        # La grabacion solo contiene las busquedas de sus terminos: el carro se mide en la tienda de prueba
+        if not args.grabacion:
+            resultados['carro'] = carro(url, lista_compra_de_prueba(terms, args.lineas), codigo_postal)
+    finally:
+        server.shutdown()
+
+    condiciones = {'origen': args.grabacion or 'fixtures', 'latencia_ms': args.latencia, 'jitter_ms': args.jitter}
+    print('--------------------------------------------------------------')
+    print(f"Origen: {condiciones['origen']}, latencia {args.latencia:.0f} ms +- {args.jitter:.0f} ms")
+    for escenario, metricas in resultados.items():
+        print(f"{escenario}: " + ', '.join(f"{k}={v:.1f}" for k, v in metricas.items()))
+
+    if args.guardar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'condiciones': condiciones, 'resultados': resultados}, f, indent=1)
+        print(f"Línea base guardada en {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No hay línea base en {args.baseline}; ejecuta con --guardar-baseline para crearla.")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('condiciones') != condiciones:
+        print(f"Aviso: la línea base se midió con otras condiciones: {baseline.get('condiciones')}")
+
+    regresiones = comparar(resultados, baseline['resultados'], args.umbral)
+    for escenario, nombre, base, valor in regresiones:
+        print(f"REGRESIÓN {escenario}.{nombre}: {base:.1f} -> {valor:.1f}")
+    if regresiones:
+        return 1
+    print(f"Sin regresiones por encima del {args.umbral:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+#Navegador persistente: un Chrome de larga duracion con perfil propio (cookies y codigo postal ya
+#guardados) al que se conectan las ejecuciones cortas, y chromedriver resuelto desde una cache local.
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import urllib.request
+from urllib.parse import urlparse
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+
+from webdriver_manager.chrome import ChromeDriverManager
+
+from xhr_capture import activar_captura_red
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+
+# Ruta de chromedriver resuelta la primera vez por ChromeDriverManager
+CHROMEDRIVER_CACHE = os.path.join(CARPETA, ".chromedriver_cache.json")
+# Perfil del navegador persistente (cookies, localStorage con el codigo postal...)
+PERFIL_CHROME = os.path.join(CARPETA, "perfil_chrome")
+PUERTO_DEPURACION = 9222
+
+_RUTAS_CHROME = [
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+]
+
+_SESION_LISTA_JS = """
+const visible = sel => {
+    const el = document.querySelector(sel);
+    return el !== null && el.offsetParent !== null;
+};
+return location.hostname.endsWith(arguments[0])
+    && visible('input[data-testid="search-input"]')
+    && !visible('input[aria-label="Código postal"]');
+"""
+
+
+def ruta_chromedriver(cache=CHROMEDRIVER_CACHE, refrescar=False):
+    """
+    Returns the chromedriver path without network access when possible: CHROMEDRIVER_PATH,
+    then the path cached on a previous run. Only falls back to ChromeDriverManager().install()
+    (a network lookup) when neither exists or refrescar=True, e.g. after a Chrome update.
+    """
+    env = os.environ.get("CHROMEDRIVER_PATH")
+    if env and os.path.exists(env):
+        return env
+
+    if not refrescar and os.path.exists(cache):
+        with open(cache) as f:
+            path = json.load(f).get("path")
+        if path and os.path.exists(path):
+            return path
+
+    path = ChromeDriverManager().install()
+    with open(cache, "w") as f:
+        json.dump({"path": path}, f)
+    return path
+
+
+def ruta_chrome():
+    """Locates the Chrome binary: CHROME_BINARY, the PATH or the usual install folders"""
+    env = os.environ.get("CHROME_BINARY")
+    if env and os.path.exists(env):
+        return env
+    for nombre in ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome"):
+        path = shutil.which(nombre)
+        if path:
+            return path
+    for path in _RUTAS_CHROME:
+        if os.path.exists(path):
+            return path
+    raise Exception("No se encontró Chrome. Define la variable de entorno CHROME_BINARY.")
+
+
+def navegador_activo(puerto=PUERTO_DEPURACION):
+    """True if a Chrome with remote debugging is listening on the port"""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/json/version", timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+def arrancar_navegador_persistente(puerto=PUERTO_DEPURACION, perfil=PERFIL_CHROME, headless=False, timeout=20):
+    """
+    Starts a long-lived Chrome with remote debugging and a saved profile, detached from
+    this process. Does nothing if it is already running.
+    Args:
+        puerto: Remote debugging port.
+        perfil: Profile folder where cookies and the store session are kept.
+        headless: Run it without a window.
+        timeout: Seconds to wait for the debugging port.
+    """
+    if navegador_activo(puerto):
+        return
+
+    args = [ruta_chrome(), f"--remote-debugging-port={puerto}", f"--user-data-dir={perfil}",
+            "--no-first-run", "--no-default-browser-check"]
+    if headless:
+        args.append("--headless=new")
+    args.append("about:blank")
+
+    # Que el navegador sobreviva a este proceso
+    if sys.platform == "win32":
+        flags = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, creationflags=flags)
+    else:
+        subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+    limite = time.perf_counter() + timeout
+    while not navegador_activo(puerto):
+        if time.perf_counter() > limite:
+            raise Exception(f"Chrome no abrió el puerto de depuración {puerto} en {timeout} s")
+        time.sleep(0.1)
+    print(f"Navegador persistente arrancado en el puerto {puerto} con el perfil '{perfil}'.")
+
+
+def conectar_navegador(puerto=PUERTO_DEPURACION, captura_red=False):
+    """
+    Attaches a WebDriver to the persistent Chrome. The pages it has open, cookies included, are kept.
+    Args:
+        puerto: Remote debugging port of the persistent Chrome.
+        captura_red: Enable the performance log needed by guardar_productos_red.
+    Returns:
+        Selenium WebDriver instance. Release it with soltar_navegador so Chrome stays open.
+    """
+    options = Options()
+    options.debugger_address = f"127.0.0.1:{puerto}"
+    if captura_red:
+        activar_captura_red(options)
+    return webdriver.Chrome(service=Service(ruta_chromedriver()), options=options)
+
+
+def soltar_navegador(driver):
+    """Stops chromedriver without closing the persistent Chrome it is attached to"""
+    driver.service.stop()
+
+
+def sesion_lista(driver, url):
+    """
+    True if the current tab is already on the store with the cookies dismissed and the
+    postal code entered, so the search can start without loading anything.
+    """
+    dominio = urlparse(url).hostname.removeprefix("www.")
+    try:
+        return driver.execute_script(_SESION_LISTA_JS, dominio)
+    except Exception:
+        return False
+
+
+if __name__ == "__main__":
+    # Arranca el navegador persistente y deja la sesion preparada para las siguientes ejecuciones
+    from selenium.webdriver.support.ui import WebDriverWait
+    from guardar_productos import CODIGO_POSTAL, URL_MERCADONA, preparar_sesion
+
+    arrancar_navegador_persistente()
+    driver = conectar_navegador()
+    preparar_sesion(driver, WebDriverWait(driver, 5), CODIGO_POSTAL, URL_MERCADONA)
+    soltar_navegador(driver)
@@ -0,0 +1,211 @@
+#Deteccion de cambios entre dos ejecuciones: productos nuevos, retirados y cambios de precio, formato, etiqueta
+#o nombre. Los productos se identifican por su id o por nombre + etiqueta + formato, se cruzan con un hash-join
+#vectorizado y solo las diferencias se envian a los destinos (JSONL, SQLite, consola...).
+import json
+
+import numpy as np
+import pandas as pd
+
+from normalizacion import parsear_precio
+from snapshot_store import DB_PRODUCTOS, abrir_store
+
+COLUMNAS_IDENTIDAD = ['Nombre_producto', 'etiqueta', 'formato']
+# Campos que se comparan en los productos presentes en las dos ejecuciones, con el tipo de cambio de cada uno
+CAMPOS = {'Precio': 'precio', 'formato': 'formato', 'etiqueta': 'etiqueta', 'Nombre_producto': 'nombre'}
+COLUMNAS_CAMBIO = ['tipo', 'codigo_postal', 'clave', 'Nombre_producto', 'etiqueta', 'formato', 'campo', 'antes',
+                   'despues', 'variacion_pct']
+# Filas que se envian de una vez a cada destino
+LOTE_CAMBIOS = 5000
+
+_SCHEMA_CAMBIOS = """
+CREATE TABLE IF NOT EXISTS cambios (
+    run_anterior TEXT,
+    run_nuevo TEXT,
+    tipo TEXT NOT NULL,
+    codigo_postal TEXT,
+    clave TEXT NOT NULL,
+    Nombre_producto TEXT,
+    etiqueta TEXT,
+    formato TEXT,
+    campo TEXT,
+    antes TEXT,
+    despues TEXT,
+    variacion_pct REAL
+);
+CREATE INDEX IF NOT EXISTS idx_cambios_run ON cambios (run_nuevo, tipo);
+"""
+
+
+def claves_productos(df):
+    """
+    Stable identity of every row as text: 'id:<id>' where the table has a product id,
+    otherwise name|etiqueta|formato. Vectorized over the whole table.
+    """
+    identidad = df['Nombre_producto'].astype(str)
+    for columna in COLUMNAS_IDENTIDAD[1:]:
+        identidad = identidad + '|' + df[columna].astype(str)
+    if 'id' in df.columns:
+        con_id = df['id'].notna() & (df['id'].astype(str) != '')
+        identidad = identidad.where(~con_id, 'id:' + df['id'].astype(str))
+    return identidad
+
+
+def _hashes(df, por_codigo_postal):
+    """64-bit hash of the identity of every row: (postal code,) id where there is one, else name|etiqueta|formato"""
+    prefijo = ['codigo_postal'] if por_codigo_postal else []
+    hashes = pd.util.hash_pandas_object(df[prefijo + COLUMNAS_IDENTIDAD].astype(str), index=False).to_numpy()
+    if 'id' in df.columns:
+        con_id = (df['id'].notna() & (df['id'].astype(str) != '')).to_numpy()
+        if con_id.any():
+            hashes_id = pd.util.hash_pandas_object(df[prefijo + ['id']].astype(str), index=False).to_numpy()
+            hashes = np.where(con_id, hashes_id, hashes)
+    return hashes
+
+
+def _preparar(df, hashes, por_codigo_postal):
+    """One row per product (a product shows up under several terms), indexed by its hash"""
+    columnas = list(CAMPOS) + (['id'] if 'id' in df.columns else [])
+    out = df[columnas].astype(str)
+    if 'id' in df.columns:
+        out['id'] = df['id']
+    out['codigo_postal'] = df['codigo_postal'].astype(str) if por_codigo_postal else None
+    out.index = hashes
+    return out[~out.index.duplicated(keep='last')]
+
+
+def detectar_cambios(anterior, nuevo):
+    """
+    Compares two product snapshots.
+    Args:
+        anterior, nuevo: DataFrames with Nombre_producto, Precio, etiqueta, formato and
+                         optionally id, codigo_postal (compared per postal code when both
+                         have it) and termino. With termino, a product is only reported as
+                         retired if one of its previous terms was extracted in the new run,
+                         so a failed term does not look like a delisting.
+    Returns:
+        DataFrame with COLUMNAS_CAMBIO, one row per change: tipo 'nuevo' or 'retirado' for
+        products only in one snapshot, and 'precio', 'formato', 'etiqueta' or 'nombre' with
+        the old and new values for products in both. variacion_pct is set for prices.
+    """
+    por_cp = 'codigo_postal' in anterior.columns and 'codigo_postal' in nuevo.columns
+    hashes_anterior = _hashes(anterior, por_cp)
+    a = _preparar(anterior, hashes_anterior, por_cp)
+    n = _preparar(nuevo, _hashes(nuevo, por_cp), por_cp)
+
+    # Hash-join: posicion de cada producto nuevo en la tabla anterior (-1 si no estaba)
+    posiciones = a.index.get_indexer(n.index)
+    en_a = posiciones >= 0
+    retirados = ~a.index.isin(n.index)
+    if 'termino' in anterior.columns and 'termino' in nuevo.columns:
+        extraidos = anterior['termino'].isin(nuevo['termino'].unique()).to_numpy()
+        retirados &= a.index.isin(hashes_anterior[extraidos])
+
+    partes = [
+        n[~en_a].assign(tipo='nuevo', campo=None, antes=None, despues=None),
+        a[retirados].assign(tipo='retirado', campo=None, antes=None, despues=None),
+    ]
+
+    # Productos en las dos: se comparan columna a columna ya alineados
+    a_c = a.iloc[posiciones[en_a]]
+    n_c = n[en_a]
+    for campo, tipo in CAMPOS.items():
+        antes = a_c[campo].to_numpy()
+        despues = n_c[campo].to_numpy()
+        distinto = antes != despues
+        if distinto.any():
+            partes.append(n_c[distinto].assign(tipo=tipo, campo=campo, antes=antes[distinto],
+                                               despues=despues[distinto]))
+
+    cambios = pd.concat(partes, ignore_index=True)
+    cambios['clave'] = claves_productos(cambios) if len(cambios) else pd.Series(dtype=object)
+    es_precio = cambios['tipo'] == 'precio'
+    cambios['variacion_pct'] = np.nan
+    if es_precio.any():
+        antes = parsear_precio(cambios.loc[es_precio, 'antes'])
+        despues = parsear_precio(cambios.loc[es_precio, 'despues'])
+        cambios.loc[es_precio, 'variacion_pct'] = ((despues - antes) / antes * 100).round(2)
+    return cambios[COLUMNAS_CAMBIO]
+
+
+def emitir(cambios, destinos, lote=LOTE_CAMBIOS):
+    """Sends the changes to every destination in batches of `lote` rows"""
+    for inicio in range(0, len(cambios), lote):
+        trozo = cambios.iloc[inicio:inicio + lote]
+        for destino in destinos:
+            destino(trozo)
+
+
+def destino_jsonl(path):
+    """Destination that appends every change as a JSON line"""
+    def escribir(trozo):
+        with open(path, 'a', encoding='utf-8') as f:
+            for fila in trozo.to_dict('records'):
+                f.write(json.dumps({k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in fila.items()},
+                                   ensure_ascii=False) + '\n')
+    return escribir
+
+
+def destino_sqlite(conn):
+    """Destination that appends the changes (and run_anterior/run_nuevo if present) to the cambios table"""
+    conn.executescript(_SCHEMA_CAMBIOS)
+
+    def escribir(trozo):
+        columnas = [c for c in ['run_anterior', 'run_nuevo'] + COLUMNAS_CAMBIO if c in trozo.columns]
+        filas = trozo[columnas].astype(object).where(trozo[columnas].notna(), None).itertuples(index=False)
+        with conn:
+            conn.executemany(f"INSERT INTO cambios ({', '.join(columnas)}) "
+                             f"VALUES ({', '.join('?' * len(columnas))})", list(filas))
+    return escribir
+
+
+def destino_consola(trozo):
+    """Destination that prints a line per change"""
+    for fila in trozo.itertuples(index=False):
+        if fila.tipo in ('nuevo', 'retirado'):
+            print(f"[{fila.codigo_postal or '-'}] {fila.tipo}: {fila.Nombre_producto} ({fila.formato})")
+        else:
+            print(f"[{fila.codigo_postal or '-'}] {fila.tipo}: {fila.Nombre_producto}: {fila.antes} -> {fila.despues}")
+
+
+def comparar_runs(conn, run_anterior=None, run_nuevo=None, codigo_postal=None, destinos=()):
+    """
+    Detects the changes between two runs of the snapshot store and sends them to the destinations.
+    Args:
+        conn: Connection from snapshot_store.abrir_store.
+        run_anterior, run_nuevo: run_ts to compare. Default to the latest run and the one before it.
+        codigo_postal: Only this postal code. All of them if None.
+        destinos: Callables that receive each batch of changes (see destino_jsonl,
+                  destino_sqlite, destino_consola).
+    Returns:
+        DataFrame with the changes (see detectar_cambios) plus run_anterior and run_nuevo.
+        Empty if there are fewer than two runs.
+    """
+    condicion = "AND codigo_postal = ?" if codigo_postal else ""
+    params = [codigo_postal] if codigo_postal else []
+    if run_nuevo is None:
+        run_nuevo = conn.execute(f"SELECT MAX(run_ts) FROM productos WHERE 1 {condicion}", params).fetchone()[0]
+    if run_anterior is None and run_nuevo is not None:
+        run_anterior = conn.execute(f"SELECT MAX(run_ts) FROM productos WHERE run_ts < ? {condicion}",
+                                    [run_nuevo] + params).fetchone()[0]
+    if run_anterior is None or run_nuevo is None:
+        print("No hay dos ejecuciones que comparar.")
+        return pd.DataFrame(columns=COLUMNAS_CAMBIO)
+
+    consulta = (f"SELECT codigo_postal, termino, producto_id AS id, Nombre_producto, Precio, etiqueta, formato "
+                f"FROM productos WHERE run_ts = ? {condicion}")
+    anterior = pd.read_sql_query(consulta, conn, params=[run_anterior] + params)
+    nuevo = pd.read_sql_query(consulta, conn, params=[run_nuevo] + params)
+
+    cambios = detectar_cambios(anterior, nuevo).assign(run_anterior=run_anterior, run_nuevo=run_nuevo)
+    emitir(cambios, destinos)
+    resumen = cambios['tipo'].value_counts().to_dict()
+    print(f"Cambios de {run_anterior} a {run_nuevo}: {resumen or 'ninguno'}")
+    return cambios
+
+
+if __name__ == "__main__":
+    conn = abrir_store(DB_PRODUCTOS)
+    try:
+        comparar_runs(conn, destinos=[destino_consola])
+    finally:
+        conn.close()
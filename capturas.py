@@ -0,0 +1,218 @@
+#Capturas ligeras de resultados: solo el grid de productos, comprimido por Chrome (WebP/JPEG) con el CDP y
+#escrito en los hilos de escritura del pipeline. Una politica decide cuando capturar (siempre, cada N
+#ejecuciones o solo si cambian los precios) y las capturas identicas a la anterior no se vuelven a escribir.
+import base64
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import weakref
+
+from functions import huella_resultados
+from lean_mode import con_imagenes
+
+CAPTURAS_ESTADO = "capturas.sqlite"
+
+# 'siempre', 'cada_n' (una de cada CAPTURA_CADA_N ejecuciones) o 'cambio_precio' (solo si cambia la huella)
+POLITICAS = ('siempre', 'cada_n', 'cambio_precio')
+CAPTURA_CADA_N = 5
+FORMATO_CAPTURA = 'webp'
+CALIDAD_CAPTURA = 60
+SELECTOR_GRID = '.product-container'
+# Alto maximo del recorte: por encima Chrome no puede componer la captura de una vez
+MAX_ALTO_CAPTURA = 16000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS capturas (
+    termino TEXT NOT NULL,
+    codigo_postal TEXT NOT NULL,
+    ejecuciones INTEGER NOT NULL,
+    huella TEXT,
+    hash_imagen TEXT,
+    bytes INTEGER,
+    ruta TEXT,
+    capturada REAL,
+    PRIMARY KEY (termino, codigo_postal)
+);
+"""
+
+_RECORTE_JS = """
+const el = document.querySelector(arguments[0]);
+if (!el) return null;
+const r = el.getBoundingClientRect();
+return {x: r.left + window.scrollX, y: r.top + window.scrollY, width: r.width, height: r.height};
+"""
+
+# Driver -> (GestorCapturas, codigo postal de la sesion)
+_activos = weakref.WeakKeyDictionary()
+
+
+class Captura:
+    """Screenshot taken on the driver thread, still base64-encoded; GestorCapturas.guardar writes it"""
+
+    def __init__(self, gestor, termino, codigo_postal, datos_b64, formato, segundos):
+        self.gestor = gestor
+        self.termino = termino
+        self.codigo_postal = codigo_postal
+        self.datos_b64 = datos_b64
+        self.formato = formato
+        self.segundos = segundos
+
+    def guardar(self, product_folder, sanitized_term):
+        return self.gestor.guardar(self, product_folder, sanitized_term)
+
+
+class GestorCapturas:
+    """
+    Decides, takes and writes the result screenshots of every (term, postal code).
+
+    capturar runs on the driver thread: it applies the policy with the cell fingerprint
+    (one script call) and, if a capture is due, asks Chrome for a compressed clip of the
+    grid. guardar runs on the writer threads: it decodes and hashes the image and skips
+    the write when it is identical to the previous one. Counts captures, skipped ones,
+    bytes written and the bytes and seconds saved.
+    """
+
+    def __init__(self, path=CAPTURAS_ESTADO, politica='siempre', cada_n=CAPTURA_CADA_N, formato=FORMATO_CAPTURA,
+                 calidad=CALIDAD_CAPTURA, selector=SELECTOR_GRID):
+        """
+        Args:
+            path: SQLite file with the state of the last capture of every term and postal code.
+            politica: One of POLITICAS.
+            cada_n: Capture one run out of cada_n with politica='cada_n'.
+            formato: 'webp', 'jpeg' or 'png'.
+            calidad: Compression quality (0-100) of webp and jpeg.
+            selector: CSS selector of the element captured. The whole page if it is not found.
+        """
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de capturas desconocida: '{politica}'. Opciones: {POLITICAS}")
+        # El estado se toca desde el hilo del driver y desde los escritores
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        self.lock = threading.Lock()
+        self.politica = politica
+        self.cada_n = max(1, cada_n)
+        self.formato = formato
+        self.calidad = calidad
+        self.selector = selector
+        self.contadores = {'capturas': 0, 'omitidas': 0, 'duplicadas': 0, 'bytes_escritos': 0,
+                           'bytes_ahorrados': 0, 'segundos_captura': 0.0}
+
+    def close(self):
+        self.conn.close()
+
+    def _estado(self, termino, codigo_postal):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT ejecuciones, huella, hash_imagen, bytes FROM capturas WHERE termino = ? AND codigo_postal = ?",
+                (termino, codigo_postal)).fetchone()
+
+    def _toca_capturar(self, estado, huella):
+        if estado is None:
+            return True
+        ejecuciones, huella_anterior, _, _ = estado
+        if self.politica == 'cada_n':
+            return ejecuciones % self.cada_n == 0
+        if self.politica == 'cambio_precio':
+            return huella != huella_anterior
+        return True
+
+    def _capturar_grid(self, driver):
+        """Compressed clip of the grid through the CDP, base64-encoded as Chrome returns it"""
+        recorte = driver.execute_script(_RECORTE_JS, self.selector)
+        parametros = {'format': self.formato, 'captureBeyondViewport': True}
+        if self.formato != 'png':
+            parametros['quality'] = self.calidad
+        if recorte and recorte['width'] and recorte['height']:
+            parametros['clip'] = dict(recorte, height=min(recorte['height'], MAX_ALTO_CAPTURA), scale=1)
+        try:
+            return driver.execute_cdp_cmd('Page.captureScreenshot', parametros)['data'], self.formato
+        except Exception as e:
+            print(f"Captura por CDP no disponible ({e}); se usa la captura PNG de la ventana.")
+            return driver.get_screenshot_as_base64(), 'png'
+
+    def capturar(self, driver, termino, codigo_postal):
+        """
+        Applies the policy and takes the screenshot if it is due.
+        Returns:
+            Captura to pass to guardar, or None if the policy skipped it.
+        """
+        codigo_postal = str(codigo_postal)
+        estado = self._estado(termino, codigo_postal)
+        huella = huella_resultados(driver) if self.politica == 'cambio_precio' else None
+        if not self._toca_capturar(estado, huella):
+            with self.lock:
+                self.contadores['omitidas'] += 1
+                self.contadores['bytes_ahorrados'] += estado[3] or 0
+                self.conn.execute("UPDATE capturas SET ejecuciones = ejecuciones + 1 "
+                                  "WHERE termino = ? AND codigo_postal = ?", (termino, codigo_postal))
+                self.conn.commit()
+            print(f"Captura de '{termino}' omitida (política {self.politica}).")
+            return None
+
+        inicio = time.perf_counter()
+        with con_imagenes(driver):
+            datos, formato = self._capturar_grid(driver)
+        segundos = time.perf_counter() - inicio
+        with self.lock:
+            self.contadores['capturas'] += 1
+            self.contadores['segundos_captura'] += segundos
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO capturas (termino, codigo_postal, ejecuciones, huella, capturada) VALUES (?, ?, 1, ?, ?) "
+                    "ON CONFLICT (termino, codigo_postal) DO UPDATE SET ejecuciones = ejecuciones + 1, "
+                    "huella = excluded.huella, capturada = excluded.capturada",
+                    (termino, codigo_postal, huella, time.time()))
+        return Captura(self, termino, codigo_postal, datos, formato, segundos)
+
+    def guardar(self, captura, product_folder, sanitized_term):
+        """
+        Decodes and writes a capture unless it is identical to the previous one of its term
+        and postal code.
+        Returns:
+            Path of the file written, or None if it was a duplicate.
+        """
+        datos = base64.b64decode(captura.datos_b64)
+        hash_imagen = hashlib.sha1(datos).hexdigest()
+        estado = self._estado(captura.termino, captura.codigo_postal)
+        if estado is not None and estado[2] == hash_imagen:
+            with self.lock:
+                self.contadores['duplicadas'] += 1
+                self.contadores['bytes_ahorrados'] += len(datos)
+            print(f"Captura de '{captura.termino}' idéntica a la anterior; no se escribe.")
+            return None
+
+        ruta = os.path.join(product_folder, f"{sanitized_term}_screenshot.{captura.formato}")
+        with open(ruta, 'wb') as f:
+            f.write(datos)
+        with self.lock:
+            self.contadores['bytes_escritos'] += len(datos)
+            with self.conn:
+                self.conn.execute("UPDATE capturas SET hash_imagen = ?, bytes = ?, ruta = ? "
+                                  "WHERE termino = ? AND codigo_postal = ?",
+                                  (hash_imagen, len(datos), ruta, captura.termino, captura.codigo_postal))
+        print(f"Screenshot saved: {ruta} ({len(datos) / 1024:.1f} KB)")
+        return ruta
+
+    def metricas(self):
+        """Counters plus the seconds saved by the skipped captures, at the mean time of the ones taken"""
+        with self.lock:
+            metricas = dict(self.contadores)
+        media = metricas['segundos_captura'] / metricas['capturas'] if metricas['capturas'] else 0.0
+        metricas['segundos_ahorrados'] = metricas['omitidas'] * media
+        return metricas
+
+
+def activar_capturas(driver, gestor, codigo_postal):
+    """capture_product_screenshot uses the gestor for this driver, keyed by the session postal code"""
+    _activos[driver] = (gestor, str(codigo_postal))
+
+
+def desactivar_capturas(driver):
+    _activos.pop(driver, None)
+
+
+def gestor_activo(driver):
+    """(GestorCapturas, postal code) set with activar_capturas, or None"""
+    return _activos.get(driver)
@@ -0,0 +1,215 @@
+#Llenado del carro por lotes a partir de una lista de la compra (formato de prueba_compra.xlsx).
+#Cada pagina de resultados se indexa una sola vez y cada linea se anade con una unica llamada al navegador.
+
+import pandas as pd
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from functions import handle_popup, mark_results, search_and_submit, wait_for_results_ready
+from functions import RESULTS_READY_TIMEOUT
+from matching import MIN_CONFIANZA, IndiceProductos, normalizar_etiqueta, normalizar_nombre
+
+# Maximo de unidades por producto, como click_add_to_cart_by_name
+MAX_CANTIDAD = 10
+
+_INDICE_CELDAS_JS = """
+const text = (cell, selector) => {
+    const el = cell.querySelector(selector);
+    return el ? el.innerText : '';
+};
+return Array.from(document.querySelectorAll('div[data-testid="product-cell"]')).map((cell, i) => ({
+    i: i,
+    name: text(cell, 'h4[data-testid="product-cell-name"]'),
+    label: text(cell, 'p.product-price__extra-price.subhead1-r'),
+    details: Array.from(cell.querySelectorAll('span.footnote1-r')).map(e => e.innerText.trim()).join(' ')
+}));
+"""
+
+# Pulsa "Añadir al carro" y luego "+" hasta llegar a la cantidad, esperando a que la celda
+# se actualice tras cada pulsacion, todo dentro del navegador. Al final lee las unidades que
+# muestra la celda: las pulsaciones que la tienda no ha registrado no cuentan
+_ANADIR_JS = """
+const [index, cantidad, done] = arguments;
+const cell = document.querySelectorAll('div[data-testid="product-cell"]')[index];
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+const waitFor = async (fn, timeoutMs) => {
+    const limite = performance.now() + timeoutMs;
+    while (performance.now() < limite) {
+        const value = fn();
+        if (value) return value;
+        await sleep(25);
+    }
+    return null;
+};
+const enCarro = () => {
+    const el = cell && cell.querySelector('.product-quantity-button__quantity');
+    const n = el ? parseInt(el.innerText, 10) : 0;
+    return isNaN(n) ? 0 : n;
+};
+let clicks = 0;
+const fin = error => done({clicks: clicks, cantidad: enCarro(), error: error});
+(async () => {
+    try {
+        const add = cell && cell.querySelector('button[data-testid="product-quantity-button"]');
+        if (!add) return fin('No se encontró el botón "Añadir al carro"');
+        add.scrollIntoView({block: 'center'});
+        add.click();
+        clicks++;
+        for (let k = 1; k < cantidad; k++) {
+            const plus = await waitFor(() => cell.querySelector('i.icon-plus-28[data-testid="icon"]'), 3000);
+            if (!plus) return fin('No apareció el botón "+"');
+            const antes = cell.innerText;
+            (plus.closest('button') || plus).click();
+            clicks++;
+            await waitFor(() => cell.innerText !== antes, 1000);
+        }
+        await waitFor(() => enCarro() >= cantidad, 3000);
+        const unidades = enCarro();
+        fin(unidades === cantidad ? null : `El carro muestra ${unidades} ud. de ${cantidad}`);
+    } catch (e) {
+        fin(String(e));
+    }
+})();
+"""
+
+
+def leer_lista_compra(path):
+    """
+    Reads a shopping list sheet with columns Producto, Cantidad and, optionally,
+    Etiqueta, Subtitulo (etiqueta_2) and Busqueda (text to search, Producto if missing).
+    """
+    return pd.read_excel(path)
+
+
+def indexar_resultados(driver):
+    """
+    Reads every product cell on the page with one execute_script call.
+    Returns:
+        Dict (name, label) -> list of (cell index, details text). Name and label are
+        normalized with matching.normalizar_nombre and normalizar_etiqueta ('ud', 'pack'...),
+        so spacing, case and accents do not matter.
+    """
+    indice = {}
+    for celda in driver.execute_script(_INDICE_CELDAS_JS) or []:
+        clave = (normalizar_nombre(celda['name']), normalizar_etiqueta(celda['label']))
+        indice.setdefault(clave, []).append((celda['i'], normalizar_nombre(celda['details'])))
+    return indice
+
+
+def buscar_celda(indice, producto, etiqueta, etiqueta_2):
+    """Index of the cell matching name, label and etiqueta_2 (ignored if NaN), or None"""
+    for index, details in indice.get((normalizar_nombre(producto), normalizar_etiqueta(etiqueta)), []):
+        if pd.isna(etiqueta_2) or str(etiqueta_2).lower() == 'nan' or normalizar_nombre(etiqueta_2) in details:
+            return index
+    return None
+
+
+def indice_difuso(indice):
+    """IndiceProductos over the cells of indexar_resultados, with the cell index in column 'i'"""
+    celdas = [{'Nombre_producto': nombre, 'etiqueta': etiqueta, 'formato': details, 'i': index}
+              for (nombre, etiqueta), lista in indice.items() for index, details in lista]
+    return IndiceProductos(pd.DataFrame(celdas, columns=['Nombre_producto', 'etiqueta', 'formato', 'i']))
+
+
+def anadir_celda(driver, index, cantidad, timeout=30):
+    """
+    Adds a cell to the cart `cantidad` times in a single WebDriver call.
+    Returns:
+        Dict with 'clicks' done, 'cantidad' (units the cell shows in the cart at the end) and
+        'error' (None if the cell shows exactly `cantidad` units).
+    """
+    driver.set_script_timeout(timeout)
+    return driver.execute_async_script(_ANADIR_JS, index, cantidad)
+
+
+def llenar_carro(driver, wait, lista, espera_maxima=RESULTS_READY_TIMEOUT, max_cantidad=MAX_CANTIDAD,
+                 cerrar_popup=True, min_confianza=MIN_CONFIANZA):
+    """
+    Adds every line of a shopping list to the cart.
+
+    Lines are grouped by search text, so each results page is searched and indexed once
+    for all its lines.
+
+    Args:
+        driver: Selenium WebDriver instance with a ready store session.
+        wait: WebDriverWait instance for explicit waits.
+        lista: DataFrame from leer_lista_compra, or the path of the sheet.
+        espera_maxima: Upper bound in seconds to wait for each results page.
+        max_cantidad: Units per product are clamped to this value.
+        cerrar_popup: Close the "¿Ya tienes cuenta?" popup after the first addition.
+        min_confianza: Lines without an exact match take the most similar cell with the same
+                       label and etiqueta_2 if its confidence reaches this (see matching).
+                       None to only accept exact matches.
+    Returns:
+        DataFrame with one row per line: Producto, Cantidad, estado ('added', 'clamped',
+        'missing', 'failed' or 'skipped' for quantities <= 0), anadidos (units the cart shows
+        for the product after adding it) and detalle.
+    """
+    if isinstance(lista, str):
+        lista = leer_lista_compra(lista)
+
+    lineas = lista.reset_index(drop=True)
+    busquedas = lineas['Busqueda'] if 'Busqueda' in lineas.columns else lineas['Producto']
+    busquedas = busquedas.fillna(lineas['Producto']).astype(str).str.strip()
+
+    informe = [None] * len(lineas)
+    popup_pendiente = cerrar_popup
+    for busqueda, grupo in lineas.groupby(busquedas, sort=False):
+        previous_signature = mark_results(driver)
+        try:
+            search_and_submit(driver, wait, busqueda)
+            wait_for_results_ready(driver, previous_signature, timeout=espera_maxima)
+        except TimeoutException as e:
+            # Las celdas en pantalla pueden ser las de la busqueda anterior: no se toca el carro
+            for i, linea in grupo.iterrows():
+                pedida = int(linea['Cantidad']) if not pd.isna(linea['Cantidad']) else 0
+                informe[i] = {'Producto': str(linea['Producto']).strip(), 'Cantidad': pedida,
+                              'estado': 'failed' if pedida > 0 else 'skipped', 'anadidos': 0, 'detalle': str(e)}
+            print(f"Búsqueda '{busqueda}' sin resultados estables: {e}")
+            continue
+        indice = indexar_resultados(driver)
+        difuso = None
+
+        for i, linea in grupo.iterrows():
+            producto = str(linea['Producto'])
+            pedida = int(linea['Cantidad']) if not pd.isna(linea['Cantidad']) else 0
+            fila = {'Producto': producto.strip(), 'Cantidad': pedida, 'estado': None, 'anadidos': 0, 'detalle': ''}
+            informe[i] = fila
+            if pedida <= 0:
+                fila['estado'] = 'skipped'
+                continue
+
+            index = buscar_celda(indice, producto, linea.get('Etiqueta', 'ud'), linea.get('Subtitulo'))
+            if index is None and min_confianza is not None:
+                difuso = difuso or indice_difuso(indice)
+                encontrados = difuso.buscar(producto, linea.get('Etiqueta', 'ud'), linea.get('Subtitulo'),
+                                            min_confianza=min_confianza)
+                if encontrados:
+                    index = encontrados[0]['i']
+                    fila['detalle'] = (f"Emparejado con '{encontrados[0]['Nombre_producto']}' "
+                                       f"(confianza {encontrados[0]['confianza']})")
+            if index is None:
+                fila['estado'] = 'missing'
+                fila['detalle'] = f"No encontrado en la búsqueda '{busqueda}'"
+                print(f"Producto '{producto.strip()}' no encontrado.")
+                continue
+
+            cantidad = min(pedida, max_cantidad)
+            try:
+                resultado = anadir_celda(driver, index, cantidad)
+            except Exception as e:
+                resultado = {'clicks': 0, 'cantidad': 0, 'error': str(e)}
+            fila['anadidos'] = resultado['cantidad']
+            if resultado['error'] or resultado['cantidad'] != cantidad:
+                fila['estado'] = 'failed'
+                fila['detalle'] = resultado['error'] or fila['detalle']
+            else:
+                fila['estado'] = 'clamped' if pedida > cantidad else 'added'
+            print(f"Añadido al carro {fila['anadidos']} de {pedida} veces para '{producto.strip()}' ({fila['estado']}).")
+
+            if popup_pendiente and fila['anadidos'] > 0:
+                handle_popup(driver, WebDriverWait(driver, 2))
+                popup_pendiente = False
+
+    return pd.DataFrame(informe, columns=['Producto', 'Cantidad', 'estado', 'anadidos', 'detalle'])
@@ -0,0 +1,226 @@
+#Catalogo compacto en memoria: los textos repetidos (codigo postal, termino, ejecucion, nombre, etiqueta, formato,
+#id) se guardan como codigos enteros de un diccionario y el precio como float32. Cada lote de un termino se
+#anade como un bloque nuevo sin copiar los anteriores, y dos indices hash dan las filas de un producto o de un
+#codigo postal sin recorrer la tabla.
+import sys
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from normalizacion import parsear_precio
+
+# Columnas de texto codificadas con diccionario
+COLUMNAS_TEXTO = ['run_ts', 'codigo_postal', 'termino', 'id', 'Nombre_producto', 'etiqueta', 'formato']
+COLUMNAS = COLUMNAS_TEXTO + ['precio_eur']
+# Filas que se leen de una vez del almacen de productos
+LOTE_CARGA = 50000
+# Hasta cuantas filas filas() las lee una a una en lugar de agrupar por bloque
+FILAS_SUELTAS = 256
+
+
+def _agrupar(codigos):
+    """(value, positions) for every distinct value of an integer array"""
+    if not len(codigos):
+        return []
+    orden = np.argsort(codigos, kind='stable')
+    ordenados = codigos[orden]
+    cortes = np.flatnonzero(np.diff(ordenados)) + 1
+    return zip(ordenados[np.r_[0, cortes]].tolist(), np.split(orden, cortes))
+
+
+class Catalogo:
+    """
+    Append-only product table for many postal codes, terms and runs.
+
+    Every string column is dictionary-encoded: rows hold int32 codes into the list of
+    distinct values of the column, -1 for missing. Rows are stored in blocks, one per
+    anadir call, so appending never copies what is already stored, and a block keeps the
+    codes of each row together in one row of an int32 matrix. Two hash indexes map a
+    product (its id, or name + etiqueta + formato) and a postal code to their row numbers.
+    """
+
+    def __init__(self):
+        self.valores = {c: [] for c in COLUMNAS_TEXTO}
+        self.codigos = {c: {} for c in COLUMNAS_TEXTO}
+        self.bloques = []
+        self.inicios = np.zeros(0, dtype=np.int64)
+        self.n = 0
+        self.por_producto = {}
+        self.por_codigo_postal = {}
+        self._decodificar = {}
+
+    def __len__(self):
+        return self.n
+
+    def _codificar(self, columna, valores):
+        """int32 codes of the values, adding the new ones to the dictionary of the column"""
+        locales, unicos = pd.factorize(pd.Series(valores, dtype=object))
+        codigos = self.codigos[columna]
+        lista = self.valores[columna]
+        globales = np.empty(len(unicos) + 1, dtype=np.int32)
+        globales[-1] = -1  # factorize marca los nulos con -1
+        for i, valor in enumerate(unicos):
+            valor = str(valor)
+            codigo = codigos.get(valor)
+            if codigo is None:
+                codigo = codigos[valor] = len(lista)
+                lista.append(valor)
+            globales[i] = codigo
+        return globales[locales]
+
+    def anadir(self, df, termino=None, codigo_postal=None, run_ts=None):
+        """
+        Appends the table of one term.
+        Args:
+            df: DataFrame from guardar_productos_2 (Nombre_producto, Precio, etiqueta, formato and
+                optionally id). Columns run_ts, codigo_postal or termino take precedence over
+                the arguments, so rows of the snapshot store can be appended as they are.
+            termino, codigo_postal, run_ts: Values shared by the whole batch.
+        Returns:
+            range with the row numbers of the batch.
+        """
+        m = len(df)
+        codigos = np.empty((m, len(COLUMNAS_TEXTO)), dtype=np.int32)
+        for columna, valor in (('run_ts', run_ts), ('codigo_postal', codigo_postal), ('termino', termino)):
+            codigos[:, COLUMNAS_TEXTO.index(columna)] = self._codificar(
+                columna, df[columna] if columna in df.columns else [valor] * m)
+        ids = df['id'].where(df['id'].astype(str) != '') if 'id' in df.columns else [None] * m
+        codigos[:, COLUMNAS_TEXTO.index('id')] = self._codificar('id', ids)
+        for columna in ('Nombre_producto', 'etiqueta', 'formato'):
+            codigos[:, COLUMNAS_TEXTO.index(columna)] = self._codificar(columna, df[columna])
+        precios = df['precio_eur'] if 'precio_eur' in df.columns else parsear_precio(df['Precio'])
+        bloque = {'codigos': codigos, 'precio_eur': precios.to_numpy(dtype=np.float32)}
+
+        inicio = self.n
+        self.bloques.append(bloque)
+        self.inicios = np.append(self.inicios, inicio)
+        self.n += m
+        self._indexar(bloque, inicio)
+        return range(inicio, self.n)
+
+    def _indexar(self, bloque, inicio):
+        filas = np.arange(inicio, inicio + len(bloque['precio_eur']), dtype=np.int32)
+        # Casi todos los productos salen una vez por lote: una pasada por fila es mas barata que agrupar
+        por_producto = self.por_producto
+        codigos = bloque['codigos']
+        identidad = codigos[:, COLUMNAS_TEXTO.index('id'):].tolist()  # id, nombre, etiqueta, formato
+        for fila, (id_, nombre, etiqueta, formato) in zip(filas.tolist(), identidad):
+            clave = ('id', id_) if id_ >= 0 else (nombre, etiqueta, formato)
+            indice = por_producto.get(clave)
+            if indice is None:
+                indice = por_producto[clave] = array('i')
+            indice.append(fila)
+        for codigo_postal, posiciones in _agrupar(codigos[:, COLUMNAS_TEXTO.index('codigo_postal')]):
+            self.por_codigo_postal.setdefault(codigo_postal, array('i')).frombytes(filas[posiciones].tobytes())
+
+    def filas_producto(self, nombre=None, etiqueta=None, formato=None, id=None):
+        """
+        Row numbers of one product, in insertion order: O(1) hash lookup.
+        Args:
+            nombre, etiqueta, formato: Identity of a product without id.
+            id: Product id. Takes precedence over the name.
+        """
+        if id is not None:
+            clave = ('id', self.codigos['id'].get(str(id)))
+        else:
+            clave = tuple(self.codigos[c].get(v) for c, v in
+                          (('Nombre_producto', nombre), ('etiqueta', etiqueta), ('formato', formato)))
+        return np.frombuffer(self.por_producto.get(clave, array('i')), dtype=np.int32)
+
+    def filas_codigo_postal(self, codigo_postal):
+        """Row numbers of one postal code, in insertion order: O(1) hash lookup"""
+        codigo = self.codigos['codigo_postal'].get(str(codigo_postal))
+        return np.frombuffer(self.por_codigo_postal.get(codigo, array('i')), dtype=np.int32)
+
+    def _valores(self, columna):
+        """Distinct values of a column as an object array ending in None, so code -1 decodes to None"""
+        valores = self.valores[columna]
+        decodificar = self._decodificar.get(columna)
+        if decodificar is None or len(decodificar) != len(valores) + 1:
+            decodificar = self._decodificar[columna] = np.array(valores + [None], dtype=object)
+        return decodificar
+
+    def filas(self, numeros):
+        """
+        Decodes some rows.
+        Args:
+            numeros: Row numbers (see filas_producto, filas_codigo_postal).
+        Returns:
+            DataFrame with COLUMNAS and plain string values.
+        """
+        numeros = np.asarray(numeros, dtype=np.int64)
+        bloques = np.searchsorted(self.inicios, numeros, side='right') - 1
+        locales = numeros - self.inicios[bloques]
+        codigos = np.empty((len(numeros), len(COLUMNAS_TEXTO)), dtype=np.int32)
+        precios = np.empty(len(numeros), dtype=np.float32)
+        if len(numeros) <= FILAS_SUELTAS:
+            # Pocas filas (un producto sale una vez por lote): leer fila a fila es mas barato que agrupar
+            for k, (b, local) in enumerate(zip(bloques.tolist(), locales.tolist())):
+                bloque = self.bloques[b]
+                codigos[k] = bloque['codigos'][local]
+                precios[k] = bloque['precio_eur'][local]
+        else:
+            for b, posiciones in _agrupar(bloques):
+                codigos[posiciones] = self.bloques[b]['codigos'][locales[posiciones]]
+                precios[posiciones] = self.bloques[b]['precio_eur'][locales[posiciones]]
+        out = {columna: self._valores(columna)[codigos[:, j]] for j, columna in enumerate(COLUMNAS_TEXTO)}
+        out['precio_eur'] = precios
+        return pd.DataFrame(out, columns=COLUMNAS)
+
+    def producto(self, nombre=None, etiqueta=None, formato=None, id=None, codigo_postal=None):
+        """History of one product (see filas_producto), optionally in one postal code only"""
+        numeros = self.filas_producto(nombre, etiqueta, formato, id)
+        if codigo_postal is not None:
+            numeros = np.intersect1d(numeros, self.filas_codigo_postal(codigo_postal), assume_unique=True)
+        return self.filas(numeros)
+
+    def codigo_postal(self, codigo_postal):
+        """Every row of one postal code"""
+        return self.filas(self.filas_codigo_postal(codigo_postal))
+
+    def tabla(self):
+        """
+        Whole catalog as a DataFrame with pandas Categorical columns over the dictionaries
+        (codes are shared, strings are not copied) and a float32 precio_eur.
+        """
+        out = {}
+        codigos = (np.concatenate([b['codigos'] for b in self.bloques]) if self.bloques
+                   else np.zeros((0, len(COLUMNAS_TEXTO)), np.int32))
+        for j, columna in enumerate(COLUMNAS_TEXTO):
+            out[columna] = pd.Categorical.from_codes(codigos[:, j],
+                                                     categories=pd.Index(self.valores[columna], dtype=object))
+        out['precio_eur'] = (np.concatenate([b['precio_eur'] for b in self.bloques]) if self.bloques
+                             else np.zeros(0, np.float32))
+        return pd.DataFrame(out, columns=COLUMNAS)
+
+    def memoria(self):
+        """
+        Bytes used, split into 'filas' (code and price arrays), 'diccionarios' (distinct
+        strings and their lookup dicts), 'indices' (hash indexes) and 'total'.
+        """
+        filas = sum(a.nbytes for b in self.bloques for a in b.values()) + self.inicios.nbytes
+        diccionarios = sum(sys.getsizeof(self.valores[c]) + sys.getsizeof(self.codigos[c])
+                           + sum(sys.getsizeof(v) for v in self.valores[c]) for c in COLUMNAS_TEXTO)
+        indices = 0
+        for indice in (self.por_producto, self.por_codigo_postal):
+            indices += sys.getsizeof(indice) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in indice.items())
+        return {'filas': filas, 'diccionarios': diccionarios, 'indices': indices,
+                'total': filas + diccionarios + indices}
+
+    @classmethod
+    def desde_store(cls, conn, codigo_postal=None, lote=LOTE_CARGA):
+        """
+        Loads the snapshot store into a catalog, `lote` rows at a time.
+        Args:
+            conn: Connection from snapshot_store.abrir_store.
+            codigo_postal: Only this postal code. All of them if None.
+        """
+        filtro = "WHERE codigo_postal = ?" if codigo_postal else ""
+        consulta = (f"SELECT run_ts, codigo_postal, termino, producto_id AS id, Nombre_producto, Precio, etiqueta, "
+                    f"formato FROM productos {filtro} ORDER BY run_ts, codigo_postal, termino")
+        catalogo = cls()
+        for trozo in pd.read_sql_query(consulta, conn, params=[codigo_postal] if codigo_postal else [],
+                                       chunksize=lote):
+            catalogo.anadir(trozo)
+        return catalogo
@@ -0,0 +1,86 @@
+#Comprobacion del freno global del planificador (scheduler.py) sin navegador: un driver de prueba hace que la
+#rejilla no se estabilice o que sus celdas queden obsoletas, por el camino real de procesar_termino, y se
+#comprueba que el error llega al planificador y pausa todos los trabajos
+#Uso: python comprobar_planificador.py
+import os
+import sys
+import tempfile
+
+from selenium.common.exceptions import StaleElementReferenceException
+
+from scheduler import BACKOFF_BASE_S, Planificador
+
+
+class Elemento:
+    def clear(self):
+        pass
+
+    def send_keys(self, texto):
+        pass
+
+    def click(self):
+        pass
+
+
+class Espera:
+    """Stands in for WebDriverWait: every element is there at once"""
+
+    def until(self, condicion):
+        return Elemento()
+
+
+class DriverDePrueba:
+    """
+    Answers the scripts of the search flow. `fallo` decides what goes wrong:
+    'timeout' -> the grid never settles; 'obsoleto' -> the cells go stale while read.
+    """
+
+    def __init__(self, fallo):
+        self.fallo = fallo
+
+    def set_script_timeout(self, segundos):
+        pass
+
+    def execute_script(self, script, *args):
+        if 'product-cell' in script and 'cell: cell' in script and self.fallo == 'obsoleto':
+            raise StaleElementReferenceException("la rejilla se ha sustituido")
+        return '0:0'
+
+    def execute_async_script(self, script, *args):
+        return {'ready': self.fallo != 'timeout', 'count': 3, 'signature': '3:abc', 'ms': 100}
+
+    def get_screenshot_as_png(self):
+        return b''
+
+    def quit(self):
+        pass
+
+
+def comprobar(fallo):
+    """Runs two jobs whose searches fail with `fallo`. Returns the list of errors found"""
+    checkpoint = os.path.join(tempfile.mkdtemp(prefix='planificador_'), 'checkpoint.json')
+    planificador = Planificador([('leche', '46007'), ('agua', '46007')], checkpoint=checkpoint, store_path=None)
+    planificador.driver = DriverDePrueba(fallo)
+    planificador.wait = Espera()
+    planificador.codigo_postal_sesion = '46007'
+    pausas = []
+    planificador._dormir = pausas.append
+
+    planificador.run(max_trabajos=2)
+
+    errores = []
+    if planificador.fallos_globales != 2:
+        errores.append(f"{fallo}: {planificador.fallos_globales} errores de saturación, se esperaban 2")
+    if len(pausas) != 1 or pausas[0] < BACKOFF_BASE_S / 2:
+        errores.append(f"{fallo}: pausas globales {pausas}, se esperaba una de al menos {BACKOFF_BASE_S / 2} s")
+    if any(e['fallos'] != 1 or e['ultima_ok'] for e in planificador.trabajos.values()):
+        errores.append(f"{fallo}: algún trabajo se ha dado por bueno: {planificador.trabajos}")
+    return errores
+
+
+errores = comprobar('timeout') + comprobar('obsoleto')
+print('--------------------------------------------------------------')
+for error in errores:
+    print(f"FALLO {error}")
+print("Freno global del planificador: " + ("FALLO" if errores else "OK"))
+sys.exit(1 if errores else 0)
@@ -0,0 +1,208 @@
+#Rastreo del catalogo completo por categorias: una frontera sin duplicados de paginas de categoria y de ids de
+#producto. Cada pagina se visita una vez y cada producto se guarda una vez, aunque aparezca en varias
+#categorias. Tras cada pagina se escribe un checkpoint, asi que un reinicio continua donde se quedo; las filas
+#de una pagina se reescriben en lugar de anadirse, asi que repetirla al reanudar no las duplica.
+#Uso: python crawler.py [codigo_postal] [--nuevo]
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+
+import pandas as pd
+from selenium.webdriver.support.ui import WebDriverWait
+
+from functions import RESULTS_READY_TIMEOUT, guardar_productos_2, mark_results, wait_for_results_ready
+from guardar_productos import CODIGO_POSTAL, URL_MERCADONA, crear_driver, iniciar_sesion
+from http_backend import URL_API, categorias_http, crear_sesion_http
+from snapshot_store import DB_PRODUCTOS, abrir_store, nuevo_run_ts, reemplazar_snapshot
+
+CHECKPOINT_RASTREO = "crawler_checkpoint.json"
+URL_CATEGORIA = "https://tienda.mercadona.es/categories/{id}"
+
+# Enlaces a otras paginas de categoria del menu lateral
+ENLACES_CATEGORIA_JS = """
+return Array.from(document.querySelectorAll('a[href*="/categories/"]'))
+    .map(a => ({href: a.href, nombre: a.innerText.trim()}));
+"""
+
+
+def clave_fila(fila):
+    """Identity of a product row: its id, or name + etiqueta + formato if the cell had none"""
+    producto_id = fila.get('id')
+    if not pd.isna(producto_id) and str(producto_id):
+        return str(producto_id)
+    return '|'.join(str(fila.get(c)) for c in ('Nombre_producto', 'etiqueta', 'formato'))
+
+
+class Frontera:
+    """
+    Category pages left to visit and what has already been seen.
+    A page is queued at most once per crawl, and a product key (see clave_fila) is
+    accepted at most once, so the work grows with the number of unique products.
+    """
+
+    def __init__(self, pendientes=(), visitadas=(), fallidas=(), productos=(), nombres=None, run_ts=None):
+        self.pendientes = deque(str(c) for c in pendientes)
+        self.en_cola = set(self.pendientes)
+        self.visitadas = set(map(str, visitadas))
+        self.fallidas = set(map(str, fallidas))
+        self.productos = set(productos)
+        self.nombres = dict(nombres or {})
+        self.run_ts = run_ts or nuevo_run_ts()
+
+    def anadir(self, categoria_id, nombre=None):
+        """Queues a page unless it was already queued or visited. Returns True if it was queued"""
+        categoria_id = str(categoria_id)
+        if nombre:
+            self.nombres.setdefault(categoria_id, nombre)
+        if categoria_id in self.en_cola or categoria_id in self.visitadas or categoria_id in self.fallidas:
+            return False
+        self.pendientes.append(categoria_id)
+        self.en_cola.add(categoria_id)
+        return True
+
+    def siguiente(self):
+        """Next page to visit, None when the crawl is finished. It stays queued until marked"""
+        return self.pendientes[0] if self.pendientes else None
+
+    def nuevos(self, df):
+        """Rows of df whose product was not seen yet; their keys are recorded as seen"""
+        if df.empty:
+            return df
+        claves = [clave_fila(fila) for fila in df.to_dict('records')]
+        nuevas = []
+        for clave in claves:
+            nuevas.append(clave not in self.productos)
+            self.productos.add(clave)
+        return df[nuevas]
+
+    def marcar(self, categoria_id, fallida=False):
+        self.pendientes.remove(categoria_id)
+        self.en_cola.discard(categoria_id)
+        (self.fallidas if fallida else self.visitadas).add(categoria_id)
+
+    def a_dict(self):
+        return {'run_ts': self.run_ts, 'pendientes': list(self.pendientes), 'visitadas': sorted(self.visitadas),
+                'fallidas': sorted(self.fallidas), 'productos': sorted(self.productos), 'nombres': self.nombres}
+
+    def guardar(self, path=CHECKPOINT_RASTREO):
+        """Writes the frontier atomically, so a crash while writing keeps the previous checkpoint"""
+        temporal = f"{path}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(dict(self.a_dict(), guardado=time.time()), f, ensure_ascii=False)
+        os.replace(temporal, path)
+
+    @classmethod
+    def cargar(cls, path=CHECKPOINT_RASTREO):
+        """Frontier saved by guardar, None if there is no checkpoint"""
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            estado = json.load(f)
+        estado.pop('guardado', None)
+        return cls(**estado)
+
+
+def categorias_de_pagina(driver):
+    """(id, name) of the category pages linked from the page on screen"""
+    enlaces = driver.execute_script(ENLACES_CATEGORIA_JS) or []
+    encontradas = []
+    for enlace in enlaces:
+        match = re.search(r'/categories/(\d+)', enlace['href'])
+        if match:
+            encontradas.append((match.group(1), enlace['nombre']))
+    return encontradas
+
+
+def semillas_api(url_api=URL_API):
+    """(id, name) of every subcategory listed by the store API, or [] if it cannot be read"""
+    try:
+        return [(sub['id'], sub['name']) for categoria in categorias_http(crear_sesion_http(), url_api)
+                for sub in categoria.get('categories', [])]
+    except Exception as e:
+        print(f"No se pudo leer el árbol de categorías de la API: {e}. Se parte de los enlaces de la web.")
+        return []
+
+
+def rastrear_catalogo(codigo_postal=CODIGO_POSTAL, url=URL_MERCADONA, url_categoria=URL_CATEGORIA,
+                      url_api=URL_API, inicio=None, checkpoint=CHECKPOINT_RASTREO, store_path=DB_PRODUCTOS,
+                      incremental=False, headless=True, max_paginas=None, espera_maxima=RESULTS_READY_TIMEOUT):
+    """
+    Crawls every category page of the store in one browser session.
+    Args:
+        codigo_postal: Postal code of the session.
+        url: Store URL where the session is opened.
+        url_categoria: URL of a category page, with an {id} placeholder.
+        url_api: Store API whose category tree seeds the frontier.
+        inicio: Category ids to start from. Defaults to the API tree; pages linked from the
+                store page and from the category menu of each page are added as well.
+        checkpoint: JSON file with the frontier. If it exists the crawl resumes from it.
+        store_path: Snapshot database where the new products of every page are stored, under
+                    the term 'categoria:<id>'. A page visited again in the same crawl replaces
+                    its rows (see reemplazar_snapshot).
+        incremental: Scroll lazy-loaded category pages (see harvest_products).
+        max_paginas: Stop after this many pages (the checkpoint keeps the rest).
+        espera_maxima: Upper bound in seconds to wait for the grid of each page. A page
+                       whose grid does not settle is marked as failed.
+    Returns:
+        The Frontera, with the visited and failed pages and the product keys seen.
+    """
+    frontera = Frontera.cargar(checkpoint)
+    if frontera is not None:
+        print(f"Rastreo reanudado: {len(frontera.visitadas)} páginas visitadas, {len(frontera.pendientes)} "
+              f"pendientes, {len(frontera.productos)} productos.")
+    else:
+        frontera = Frontera()
+        for categoria_id, nombre in ([(c, None) for c in inicio] if inicio else semillas_api(url_api)):
+            frontera.anadir(categoria_id, nombre)
+        frontera.guardar(checkpoint)
+
+    driver = crear_driver(headless=headless)
+    wait = WebDriverWait(driver, 5)
+    conn = abrir_store(store_path) if store_path else None
+    paginas = 0
+    inicio_s = time.perf_counter()
+    try:
+        iniciar_sesion(driver, wait, codigo_postal, url)
+        for categoria_id, nombre in categorias_de_pagina(driver):
+            frontera.anadir(categoria_id, nombre)
+        while frontera.siguiente() is not None and (max_paginas is None or paginas < max_paginas):
+            categoria_id = frontera.siguiente()
+            nombre = frontera.nombres.get(categoria_id, categoria_id)
+            try:
+                firma = mark_results(driver)
+                driver.get(url_categoria.format(id=categoria_id))
+                # Lanza TimeoutException si el grid no se estabiliza: no se lee a medio pintar
+                wait_for_results_ready(driver, firma, timeout=espera_maxima)
+                df = guardar_productos_2(driver, wait, nombre, incremental=incremental, con_id=True)
+                for enlace_id, enlace_nombre in categorias_de_pagina(driver):
+                    frontera.anadir(enlace_id, enlace_nombre)
+            except Exception as e:
+                print(f"Error en la categoría '{nombre}' ({categoria_id}): {e}. Continuando con la siguiente.")
+                frontera.marcar(categoria_id, fallida=True)
+            else:
+                nuevos = frontera.nuevos(df)
+                if conn is not None:
+                    reemplazar_snapshot(conn, nuevos, f"categoria:{categoria_id}", codigo_postal, frontera.run_ts)
+                frontera.marcar(categoria_id)
+                print(f"Categoría '{nombre}': {len(df)} productos, {len(nuevos)} nuevos. "
+                      f"Quedan {len(frontera.pendientes)} páginas.")
+            frontera.guardar(checkpoint)
+            paginas += 1
+    finally:
+        driver.quit()
+        if conn is not None:
+            conn.close()
+
+    print(f"{paginas} páginas en {time.perf_counter() - inicio_s:.1f} s; {len(frontera.productos)} productos "
+          f"únicos, {len(frontera.fallidas)} páginas fallidas, {len(frontera.pendientes)} pendientes.")
+    return frontera
+
+
+if __name__ == "__main__":
+    argumentos = [a for a in sys.argv[1:] if a != '--nuevo']
+    if '--nuevo' in sys.argv and os.path.exists(CHECKPOINT_RASTREO):
+        os.remove(CHECKPOINT_RASTREO)
+    rastrear_catalogo(argumentos[0] if argumentos else CODIGO_POSTAL)
@@ -0,0 +1,151 @@
+#Servidor HTTP local para servir paginas guardadas (fixtures) a los benchmarks
+import json
+import os
+import random
+import re
+import threading
+import time
+import unicodedata
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def slug_termino(term):
+    """File name used for the recorded search response of a term"""
+    sin_acentos = ''.join(c for c in unicodedata.normalize('NFD', term)
+                          if unicodedata.category(c) != 'Mn')
+    return re.sub(r'[^a-z0-9]+', '_', sin_acentos.lower()).strip('_')
+
+
+def simular_latencia(latencia_ms, jitter_ms):
+    """Sleeps latencia_ms plus a uniform random jitter of +-jitter_ms"""
+    retardo = latencia_ms + random.uniform(-jitter_ms, jitter_ms)
+    if retardo > 0:
+        time.sleep(retardo / 1000)
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Static file handler that does not log every request to stderr"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubHandler(QuietHandler):
+    """
+    Serves the static fixtures plus the recorded JSON of the store API in fixtures/api/:
+        POST /1/indexes/<index>/query            -> api/search/<term>.json
+        GET  /api/categories/                    -> api/categories.json
+        GET  /api/categories/<id>/               -> api/categories/<id>.json
+        PUT  /api/postal-codes/actions/change-pc/ -> header x-customer-wh from api/postal_codes.json
+        GET  /categories/<id>                    -> index.html, which renders the category
+    Every response is delayed by latencia_ms +- jitter_ms.
+    """
+
+    def __init__(self, *args, latencia_ms=0, jitter_ms=0, **kwargs):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        super().__init__(*args, **kwargs)
+
+    def _send_json(self, data, status=200, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_recorded(self, *parts):
+        path = os.path.join(self.directory, 'api', *parts)
+        if not os.path.exists(path):
+            self._send_json({'message': 'Not found'}, status=404)
+            return
+        with open(path, encoding='utf-8') as f:
+            self._send_json(json.load(f))
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length).decode('utf-8') if length else ''
+
+    def do_GET(self):
+        simular_latencia(self.latencia_ms, self.jitter_ms)
+        path = urlparse(self.path).path
+        if path.rstrip('/') == '/api/categories':
+            return self._send_recorded('categories.json')
+        match = re.fullmatch(r'/api/categories/(\d+)/?', path)
+        if match:
+            return self._send_recorded('categories', f'{match.group(1)}.json')
+        if re.fullmatch(r'/categories/\d+/?', path):
+            self.path = '/index.html'
+        return super().do_GET()
+
+    def do_POST(self):
+        simular_latencia(self.latencia_ms, self.jitter_ms)
+        path = urlparse(self.path).path
+        if re.fullmatch(r'/1/indexes/[^/]+/query', path):
+            params = parse_qs(json.loads(self._read_body() or '{}').get('params', ''))
+            term = params.get('query', [''])[0]
+            recorded = os.path.join(self.directory, 'api', 'search', f'{slug_termino(term)}.json')
+            if os.path.exists(recorded):
+                return self._send_recorded('search', f'{slug_termino(term)}.json')
+            return self._send_json({'hits': [], 'nbHits': 0, 'query': term})
+        self._send_json({'message': 'Not found'}, status=404)
+
+    def do_PUT(self):
+        simular_latencia(self.latencia_ms, self.jitter_ms)
+        path = urlparse(self.path).path
+        if path.rstrip('/') == '/api/postal-codes/actions/change-pc':
+            codigo_postal = json.loads(self._read_body() or '{}').get('new_postal_code', '')
+            with open(os.path.join(self.directory, 'api', 'postal_codes.json'), encoding='utf-8') as f:
+                almacenes = json.load(f)
+            if codigo_postal not in almacenes:
+                return self._send_json({'errors': [{'code': 'invalid_postal_code'}]}, status=400)
+            return self._send_json({}, headers={'x-customer-wh': almacenes[codigo_postal],
+                                                'Access-Control-Expose-Headers': 'x-customer-wh'})
+        self._send_json({'message': 'Not found'}, status=404)
+
+
+def start_fixture_server(directory=FIXTURES_FOLDER, port=0, latencia_ms=0, jitter_ms=0):
+    """
+    Serves a folder of saved pages and recorded API responses on localhost in a background thread.
+    Args:
+        directory: Folder to serve.
+        port: Port to listen on. 0 picks a free port.
+        latencia_ms: Delay added to every response.
+        jitter_ms: Random variation of the delay, +-jitter_ms.
+    Returns:
+        (server, base_url). Call server.shutdown() when finished.
+    """
+    handler = partial(StubHandler, directory=directory, latencia_ms=latencia_ms, jitter_ms=jitter_ms)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Fixture server sirviendo '{directory}' en {base_url}")
+    return server, base_url
+
+
+def lista_compra_de_prueba(terms, n_lineas=50, directory=FIXTURES_FOLDER):
+    """
+    Shopping list in the prueba_compra.xlsx layout built from the recorded searches of the
+    fixture store, with a Busqueda column so every line can be found there.
+    """
+    # Importado aqui para que el servidor no dependa de pandas
+    import pandas as pd
+
+    rng = random.Random(1)
+    lineas = []
+    for term in terms:
+        with open(os.path.join(directory, 'api', 'search', f'{slug_termino(term)}.json'), encoding='utf-8') as f:
+            hits = json.load(f)['hits']
+        for producto in rng.sample(hits, min(4, len(hits))):
+            pi = producto['price_instructions']
+            lineas.append({'Producto': producto['display_name'].strip(), 'Cantidad': rng.randint(1, 12),
+                           'Etiqueta': 'pack' if pi.get('is_pack') else 'ud',
+                           'Subtitulo': producto['packaging'], 'Busqueda': term})
+    return pd.DataFrame(lineas[:n_lineas])
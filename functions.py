@@ -7,13 +7,15 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException,TimeoutException
 from selenium.common.exceptions import TimeoutException, StaleElementReferenceException
 
-import time
 
 #Limpiar texto
 import re
 
 import pandas as pd
 
+from instrumentation import medir, contar
+
+@medir('retry_click_element')
 def retry_click_element(driver, by, selector, retries=3, wait_time=2):
     """
     Tries to click an element specified by a selector multiple times.
@@ -33,12 +35,16 @@ def retry_click_element(driver, by, selector, retries=3, wait_time=2):
             ).click()
             print(f"Elemento clicado correctamente en el intento {attempt + 1}.")
             return True
-        except (TimeoutException, NoSuchElementException):
+        except (TimeoutException, NoSuchElementException) as e:
             print(f"Intento {attempt + 1} fallido. Reintentando...")
+            if isinstance(e, TimeoutException):
+                contar('timeouts')
+            contar('reintentos')
     return False
 
 #Auxiliares
 
+@medir('enter_postal_code')
 def enter_postal_code(driver, wait , postal_code):
     """
     Handles entering the postal code and clicking the submit button.
@@ -47,20 +53,24 @@ def enter_postal_code(driver, wait , postal_code):
         postal_code: Postal code to be entered in the input field.
     """
 
-    # Wait for the postal code input field to be present
-    input_codigo_postal = wait.until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, 'input[aria-label="Código postal"]'))
-    )
-    input_codigo_postal.clear()  # Clear the field before entering the postal code
-    input_codigo_postal.send_keys(postal_code)  # Enter the postal code
-    print("Código postal ingresado correctamente.")
+    try:
+        # Wait for the postal code input field to be present
+        input_codigo_postal = wait.until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, 'input[aria-label="Código postal"]'))
+        )
+        input_codigo_postal.clear()  # Clear the field before entering the postal code
+        input_codigo_postal.send_keys(postal_code)  # Enter the postal code
+        print("Código postal ingresado correctamente.")
 
-    # Wait for the submit button to be clickable
-    boton_entrar = wait.until(
-        EC.element_to_be_clickable((By.CSS_SELECTOR, 'input.postal-code-form__button[type="submit"]'))
-    )
-    boton_entrar.click()  # Click the button
-    print("Botón de entrada presionado correctamente.")
+        # Wait for the submit button to be clickable
+        boton_entrar = wait.until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, 'input.postal-code-form__button[type="submit"]'))
+        )
+        boton_entrar.click()  # Click the button
+        print("Botón de entrada presionado correctamente.")
+    except TimeoutException:
+        contar('timeouts')
+        raise
 
 def handle_popup(driver, wait):
     """
@@ -78,8 +88,15 @@ def handle_popup(driver, wait):
     except TimeoutException:
         print("El popup '¿Ya tienes cuenta?' no apareció. Continuando...")
 
+@medir('retry_find_elements')
 def retry_find_elements(wait, selector, max_attempts=3):
-    """Retry mechanism to find elements with specified selector"""
+    """
+    Retry mechanism to find elements with specified selector.
+    Each attempt waits at most the timeout of `wait`, so the total time is bounded
+    by max_attempts * wait timeout; there is no extra pause between attempts.
+    Raises:
+        TimeoutException or StaleElementReferenceException: The error of the last attempt.
+    """
     attempt = 0
     while attempt < max_attempts:
         try:
@@ -90,8 +107,147 @@ def retry_find_elements(wait, selector, max_attempts=3):
         except (StaleElementReferenceException, TimeoutException) as e:
             attempt += 1
             print(f"Attempt {attempt} failed with error: {e}. Retrying...")
-            time.sleep(2)
-    raise Exception(f"Unable to locate elements with selector '{selector}' after {max_attempts} attempts")
+            if isinstance(e, TimeoutException):
+                contar('timeouts')
+            contar('reintentos')
+            error = e
+    print(f"Unable to locate elements with selector '{selector}' after {max_attempts} attempts")
+    raise error
+
+#Esperas de resultados
+
+# Tiempo maximo (s) que se espera a que el grid de resultados este listo
+RESULTS_READY_TIMEOUT = 7
+# Tiempo (ms) sin cambios en el grid ni peticiones en curso para darlo por estable
+RESULTS_QUIET_MS = 300
+
+# Instala (una vez por pagina) un MutationObserver sobre las celdas de producto y un
+# contador de peticiones fetch/XHR en curso, y define la firma del grid actual.
+_READINESS_INSTALL_JS = """
+const SEL = 'div[data-testid="product-cell"]';
+if (!window.__resultsReady) {
+    const st = {lastMutation: performance.now(), replaced: false, pending: 0};
+    const isCell = n => n.nodeType === 1 && (n.matches(SEL) || n.querySelector(SEL) !== null);
+    new MutationObserver(records => {
+        for (const r of records) {
+            const nodes = [...r.addedNodes, ...r.removedNodes];
+            const target = r.target.nodeType === 1 ? r.target : r.target.parentElement;
+            if (nodes.some(isCell)) {
+                st.replaced = true;
+                st.lastMutation = performance.now();
+            } else if (target && target.closest(SEL)) {
+                st.lastMutation = performance.now();
+            }
+        }
+    }).observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+
+    const originalFetch = window.fetch;
+    window.fetch = function () {
+        st.pending++;
+        return originalFetch.apply(this, arguments).finally(() => st.pending--);
+    };
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        st.pending++;
+        this.addEventListener('loadend', () => st.pending--, {once: true});
+        return originalSend.apply(this, arguments);
+    };
+
+    window.__resultsReady = st;
+    window.__resultsSignature = () => {
+        const cells = document.querySelectorAll(SEL);
+        let h = 0;
+        for (const cell of cells) {
+            const t = cell.textContent;
+            for (let i = 0; i < t.length; i++) h = (h * 31 + t.charCodeAt(i)) | 0;
+        }
+        return {count: cells.length, signature: cells.length + ':' + h};
+    };
+}
+"""
+
+_READINESS_MARK_JS = _READINESS_INSTALL_JS + """
+window.__resultsReady.replaced = false;
+return window.__resultsSignature().signature;
+"""
+
+_READINESS_WAIT_JS = _READINESS_INSTALL_JS + """
+const [previous, quietMs, timeoutMs, done] = arguments;
+const st = window.__resultsReady;
+const start = performance.now();
+const check = () => {
+    const now = performance.now();
+    const current = window.__resultsSignature();
+    const changed = st.replaced || current.signature !== previous;
+    const quiet = st.pending === 0 && now - st.lastMutation >= quietMs;
+    if (current.count > 0 && changed && quiet) {
+        done({ready: true, count: current.count, signature: current.signature, ms: now - start});
+    } else if (now - start >= timeoutMs) {
+        done({ready: false, count: current.count, signature: current.signature, ms: now - start});
+    } else {
+        setTimeout(check, 50);
+    }
+};
+check();
+"""
+
+# Numero de celdas y hash FNV-1a de nombre y precio de cada una, en una sola llamada
+HUELLA_JS = """
+const cells = document.querySelectorAll('div[data-testid="product-cell"]');
+let h = 0x811c9dc5;
+for (const cell of cells) {
+    const name = cell.querySelector('h4[data-testid="product-cell-name"]');
+    const price = cell.querySelector('p.product-price__unit-price[data-testid="product-price"]');
+    const s = (name ? name.innerText : '') + '\\t' + (price ? price.innerText : '') + '\\n';
+    for (let i = 0; i < s.length; i++) {
+        h ^= s.charCodeAt(i);
+        h = Math.imul(h, 0x01000193) >>> 0;
+    }
+}
+return cells.length + ':' + h.toString(16);
+"""
+
+def huella_resultados(driver):
+    """Cheap fingerprint of the results on screen: 'cells:hash' of names and prices"""
+    return driver.execute_script(HUELLA_JS)
+
+def mark_results(driver):
+    """
+    Records the current state of the result grid before a new search.
+    Args:
+        driver: Selenium WebDriver instance.
+    Returns:
+        Signature of the cells on screen, to pass to wait_for_results_ready.
+    """
+    return driver.execute_script(_READINESS_MARK_JS)
+
+@medir('wait_for_results_ready')
+def wait_for_results_ready(driver, previous_signature=None, timeout=RESULTS_READY_TIMEOUT,
+                           quiet_ms=RESULTS_QUIET_MS):
+    """
+    Waits inside the browser until the result grid has settled after a search:
+    there are product cells, they are not the ones from the previous search, no
+    cell has changed for quiet_ms and there are no fetch/XHR requests in flight.
+    The whole wait is a single WebDriver call.
+    Args:
+        driver: Selenium WebDriver instance.
+        previous_signature: Value returned by mark_results before the search.
+        timeout: Upper bound in seconds.
+        quiet_ms: Milliseconds without changes to consider the grid settled.
+    Returns:
+        Dict with 'ready', 'count', 'signature' and 'ms'.
+    Raises:
+        TimeoutException: The grid did not settle in time. The cells on screen may still be
+                          the ones of the previous search, so they must not be read.
+    """
+    driver.set_script_timeout(timeout + 5)
+    estado = driver.execute_async_script(_READINESS_WAIT_JS, previous_signature, quiet_ms, timeout * 1000)
+    if not estado['ready']:
+        contar('timeouts')
+        raise TimeoutException(f"Los resultados no se estabilizaron en {timeout} s "
+                               f"({estado['count']} productos en pantalla).")
+    print(f"Resultados listos en {estado['ms']:.0f} ms ({estado['count']} productos).")
+    return estado
 
 #Comprar productos
 
@@ -369,8 +525,198 @@ def guardar_productos(driver, wait, producto):
     df = pd.DataFrame(productos)
     return df
 
-def guardar_productos_2(driver, wait, producto, max_attempts=3):
-    """Main function to gather and process product data"""
+# Un solo execute_script devuelve todas las celdas con sus campos; los campos
+# que falten vuelven como null y se resuelven por el camino de find_element.
+PRODUCT_CELLS_JS = """
+const text = (cell, selector) => {
+    const el = cell.querySelector(selector);
+    return el ? el.innerText : null;
+};
+return Array.from(document.querySelectorAll('div[data-testid="product-cell"]')).map(cell => ({
+    cell: cell,
+    id: cell.dataset.productId || null,
+    name: text(cell, 'h4[data-testid="product-cell-name"]'),
+    label: text(cell, 'p.product-price__extra-price.subhead1-r'),
+    format: text(cell, 'div.product-format.product-format__size--cell'),
+    price: text(cell, 'p.product-price__unit-price[data-testid="product-price"]')
+}));
+"""
+
+def extraer_producto(product):
+    """Extract one product record from a product cell, one find_element per field"""
+    # Extract product name
+    name_element = product.find_element(By.CSS_SELECTOR, 'h4[data-testid="product-cell-name"]')
+    product_name = name_element.text.strip()
+
+    # Extract and clean product label
+    label_element = product.find_element(By.CSS_SELECTOR, 'p.product-price__extra-price.subhead1-r')
+    product_label = re.sub(r'[^a-zA-Z]', '', label_element.text)
+
+    # Extract product format
+    format_element = product.find_element(By.CSS_SELECTOR, 'div.product-format.product-format__size--cell')
+    product_format = format_element.text
+
+    # Extract product price
+    price_element = product.find_element(By.CSS_SELECTOR, 'p.product-price__unit-price[data-testid="product-price"]')
+    product_price = price_element.text
+
+    return {
+        'Nombre_producto': product_name,
+        'Precio': product_price,
+        'etiqueta': product_label,
+        'formato': product_format
+    }
+
+def producto_de_registro(record):
+    """Product dict from a PRODUCT_CELLS_JS record, re-reading the cell if a field is missing"""
+    if None in (record['name'], record['label'], record['format'], record['price']):
+        return extraer_producto(record['cell'])
+    return {
+        'Nombre_producto': record['name'].strip(),
+        'Precio': record['price'],
+        'etiqueta': re.sub(r'[^a-zA-Z]', '', record['label']),
+        'formato': record['format']
+    }
+
+def extraer_productos_batch(driver, con_id=False):
+    """
+    Extracts every product cell on the page with a single execute_script call.
+    Args:
+        driver: Selenium WebDriver instance.
+        con_id: Add the product id of the cell (data-product-id, None if missing) as 'id'.
+    Returns:
+        List of product dicts with the same keys as extraer_producto. Cells with
+        a missing field are re-read through extraer_producto, and skipped if that fails too.
+    Raises:
+        StaleElementReferenceException: The grid was replaced while it was being read.
+    """
+    records = driver.execute_script(PRODUCT_CELLS_JS) or []
+
+    productos = []
+    for record in records:
+        try:
+            producto = producto_de_registro(record)
+        except StaleElementReferenceException:
+            raise
+        except Exception as e:
+            print(f"Error processing product: {e}")
+            continue
+        if con_id:
+            producto['id'] = record.get('id')
+
+        print('Nombre_producto', producto['Nombre_producto'], 'Precio', producto['Precio'],
+              'etiqueta', producto['etiqueta'], 'formato', producto['formato'])
+        productos.append(producto)
+    return productos
+
+# Sin cambios en el numero de celdas durante este tiempo tras bajar al final, el grid ha terminado de cargar
+HARVEST_QUIET_MS = 1500
+HARVEST_MAX_STEPS = 200
+
+# Un paso de la carga perezosa: lee solo las celdas sin marcar, las marca, baja hasta el final
+# del grid y espera a que aparezcan celdas nuevas o a que pasen quietMs sin ninguna.
+HARVEST_STEP_JS = """
+const [quietMs, reset, done] = arguments;
+const SELECTOR = 'div[data-testid="product-cell"]';
+const text = (cell, selector) => {
+    const el = cell.querySelector(selector);
+    return el ? el.innerText : null;
+};
+// La SPA puede reutilizar los nodos de la busqueda anterior: se empieza sin marcas
+if (reset) document.querySelectorAll(SELECTOR + '[data-harvested]').forEach(c => c.removeAttribute('data-harvested'));
+const nuevas = Array.from(document.querySelectorAll(SELECTOR + ':not([data-harvested])'));
+const records = nuevas.map(cell => {
+    cell.setAttribute('data-harvested', '');
+    return {
+        cell: cell,
+        id: cell.dataset.productId || null,
+        name: text(cell, 'h4[data-testid="product-cell-name"]'),
+        label: text(cell, 'p.product-price__extra-price.subhead1-r'),
+        format: text(cell, 'div.product-format.product-format__size--cell'),
+        price: text(cell, 'p.product-price__unit-price[data-testid="product-price"]')
+    };
+});
+const cells = document.querySelectorAll(SELECTOR);
+if (cells.length) cells[cells.length - 1].scrollIntoView({block: 'end'});
+window.scrollTo(0, document.documentElement.scrollHeight);
+const inicio = performance.now();
+const timer = setInterval(() => {
+    const crece = document.querySelector(SELECTOR + ':not([data-harvested])') !== null;
+    if (crece || performance.now() - inicio >= quietMs) {
+        clearInterval(timer);
+        done({records: records, grows: crece});
+    }
+}, 50);
+"""
+
+def clave_producto(record, producto):
+    """Stable identity of a cell: the product id, or name + label + format if the cell has none"""
+    return record.get('id') or (producto['Nombre_producto'], producto['etiqueta'], producto['formato'])
+
+@medir('harvest_products')
+def harvest_products(driver, quiet_ms=HARVEST_QUIET_MS, max_steps=HARVEST_MAX_STEPS, con_id=False):
+    """
+    Reads a lazy-loaded result grid by scrolling it in steps.
+    Every step extracts only the cells added since the previous one, so each cell is read
+    once and the work grows linearly with the number of results. Stops when the grid does
+    not grow for quiet_ms after scrolling to the end.
+    Args:
+        driver: Selenium WebDriver instance.
+        quiet_ms: Time without new cells after which the grid is considered complete.
+        max_steps: Upper bound on scroll steps.
+        con_id: Add the product id of the cell as 'id', like extraer_productos_batch.
+    Returns:
+        List of product dicts like extraer_productos_batch, deduplicated by clave_producto.
+    """
+    driver.set_script_timeout(quiet_ms / 1000 + RESULTS_READY_TIMEOUT)
+    vistos = set()
+    productos = []
+    for step in range(max_steps):
+        resultado = driver.execute_async_script(HARVEST_STEP_JS, quiet_ms, step == 0)
+        for record in resultado['records']:
+            try:
+                producto = producto_de_registro(record)
+            except StaleElementReferenceException:
+                raise
+            except Exception as e:
+                print(f"Error processing product: {e}")
+                continue
+            clave = clave_producto(record, producto)
+            if clave in vistos:
+                continue
+            vistos.add(clave)
+            if con_id:
+                producto['id'] = record.get('id')
+            print('Nombre_producto', producto['Nombre_producto'], 'Precio', producto['Precio'],
+                  'etiqueta', producto['etiqueta'], 'formato', producto['formato'])
+            productos.append(producto)
+        if not resultado['grows']:
+            break
+    else:
+        print(f"El grid seguía creciendo tras {max_steps} pasos; se devuelven {len(productos)} productos.")
+    return productos
+
+@medir('guardar_productos_2')
+def guardar_productos_2(driver, wait, producto, max_attempts=3, batch=True, incremental=False, con_id=False):
+    """
+    Main function to gather and process product data.
+    Args:
+        driver: Selenium WebDriver instance.
+        wait: WebDriverWait instance for explicit waits.
+        producto: The search term the results belong to.
+        max_attempts: Attempts to locate the product cells.
+        batch: Read all cells in one execute_script round trip instead of
+               four find_element/.text calls per cell.
+        incremental: Scroll a lazy-loaded grid to the end reading only the new cells
+                     of each step (see harvest_products).
+        con_id: Add an 'id' column with the product id of each cell (data-product-id).
+    Returns:
+        DataFrame with columns Nombre_producto, Precio, etiqueta, formato (and id).
+    Raises:
+        TimeoutException: No product cells appeared.
+        StaleElementReferenceException: The grid was replaced while it was being read; the
+                                        rest of the cells would be stale too.
+    """
     # Get product cells with retry mechanism
     product_cells = retry_find_elements(
         wait,
@@ -378,41 +724,38 @@ def guardar_productos_2(driver, wait, producto, max_attempts=3):
         max_attempts
     )
 
+    if incremental:
+        return pd.DataFrame(harvest_products(driver, con_id=con_id))
+
+    if batch:
+        try:
+            return pd.DataFrame(extraer_productos_batch(driver, con_id))
+        except StaleElementReferenceException:
+            raise
+        except Exception as e:
+            print(f"Batch extraction failed: {e}. Falling back to per-cell extraction.")
+
     # Process all product cells
     productos = []
     for product in product_cells:
         try:
-            # Extract product name
-            name_element = product.find_element(By.CSS_SELECTOR, 'h4[data-testid="product-cell-name"]')
-            product_name = name_element.text.strip()
-
-            # Extract and clean product label
-            label_element = product.find_element(By.CSS_SELECTOR, 'p.product-price__extra-price.subhead1-r')
-            product_label = re.sub(r'[^a-zA-Z]', '', label_element.text)
-
-            # Extract product format
-            format_element = product.find_element(By.CSS_SELECTOR, 'div.product-format.product-format__size--cell')
-            product_format = format_element.text
-
-            # Extract product price
-            price_element = product.find_element(By.CSS_SELECTOR, 'p.product-price__unit-price[data-testid="product-price"]')
-            product_price = price_element.text
+            producto_cell = extraer_producto(product)
+            if con_id:
+                producto_cell['id'] = product.get_attribute('data-product-id')
 
             # Print and store the data
-            print('Nombre_producto', product_name, 'Precio', product_price, 
-                 'etiqueta', product_label, 'formato', product_format)
-            
-            productos.append({
-                'Nombre_producto': product_name,
-                'Precio': product_price,
-                'etiqueta': product_label,
-                'formato': product_format
-            })
+            print('Nombre_producto', producto_cell['Nombre_producto'], 'Precio', producto_cell['Precio'],
+                 'etiqueta', producto_cell['etiqueta'], 'formato', producto_cell['formato'])
+
+            productos.append(producto_cell)
+        except StaleElementReferenceException:
+            raise
         except Exception as e:
             print(f"Error processing product: {e}")
 
     return pd.DataFrame(productos)
 
+@medir('search_and_submit')
 def search_and_submit(driver, wait, term):
     """
     Searches for each term in a given list by entering it into the search input field
@@ -422,6 +765,8 @@ def search_and_submit(driver, wait, term):
         driver: Selenium WebDriver instance.
         wait: WebDriverWait instance for explicit waits.
         search_terms: List of strings to search for.
+    Raises:
+        TimeoutException: The search box or button did not show up.
     """
     try:
         # Locate the search input field
@@ -442,4 +787,6 @@ def search_and_submit(driver, wait, term):
         #time.sleep(1)  # Add a short delay to allow the results to load
     except TimeoutException:
         print(f"No se pudo completar la búsqueda para el término '{term}'.")
+        contar('timeouts')
+        raise
 
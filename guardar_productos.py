@@ -5,16 +5,30 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException,TimeoutException
+from selenium.common.exceptions import NoSuchElementException,TimeoutException,StaleElementReferenceException
 from selenium.webdriver.chrome.options import Options
 
-from webdriver_manager.chrome import ChromeDriverManager
 
 
 #Move
 from functions import retry_click_element , enter_postal_code , handle_popup ,search_and_submit 
 #Work with products
 from functions import guardar_productos , click_add_to_cart_by_name , click_add_to_cart_by_name_delete, guardar_productos_2
+#Esperas
+from functions import mark_results, wait_for_results_ready, RESULTS_READY_TIMEOUT
+#Captura de las respuestas JSON
+from xhr_capture import activar_captura_red, descartar_log_red, guardar_productos_red
+#Navegador persistente
+from browser_session import ruta_chromedriver, arrancar_navegador_persistente, conectar_navegador, sesion_lista
+from browser_session import soltar_navegador
+#Modo ligero
+from lean_mode import activar_modo_ligero, con_imagenes, iniciar_medicion, informe_termino, modo_ligero_activo
+#Capturas del grid con politica
+from capturas import Captura, GestorCapturas, activar_capturas, gestor_activo
+#Instrumentacion
+from instrumentation import medir, activar, desactivar, contar
+#Almacen de snapshots
+from snapshot_store import guardar_snapshot
 #Limpiar texto
 import re
 import os
@@ -22,45 +36,62 @@ import os
 #DF
 import pandas as pd
 
-import time
 # https://sites.google.com/chromium.org/driver/
 
-def take_product_screenshot(driver, wait, product_folder, sanitized_term):
-    """Capture and save screenshot of product results"""
+@medir('capture_product_screenshot')
+def capture_product_screenshot(driver, wait, sanitized_term):
+    """
+    Capture the product results as PNG bytes, or as a capturas.Captura of the grid when
+    capturas.activar_capturas was called for the driver. Returns None if it fails or the
+    capture policy skips it. Timeouts and stale elements are raised: they mean the grid
+    is not there or is being replaced, not that the capture failed.
+    """
     try:
         # Wait for results to load
         wait.until(EC.presence_of_element_located(
             (By.CSS_SELECTOR, 'div[data-testid="product-cell"]')
         ))
-        
-        # Take screenshot and save to product folder
-        screenshot_path = os.path.join(product_folder, f"{sanitized_term}_screenshot.png")
-        driver.save_screenshot(screenshot_path)
-        print(f"Screenshot saved: {screenshot_path}")
+        activo = gestor_activo(driver)
+        if activo is not None:
+            gestor, codigo_postal = activo
+            return gestor.capturar(driver, sanitized_term, codigo_postal)
+        # En modo ligero las imagenes solo se cargan para la captura
+        with con_imagenes(driver):
+            return driver.get_screenshot_as_png()
+    except TimeoutException:
+        contar('timeouts')
+        raise
+    except StaleElementReferenceException:
+        raise
+    except Exception as screenshot_error:
+        print(f"Failed to take screenshot for {sanitized_term}: {screenshot_error}")
+        return None
+
+def save_product_screenshot(png, product_folder, sanitized_term):
+    """Save a screenshot taken with capture_product_screenshot to the product folder"""
+    if isinstance(png, Captura):
+        return png.guardar(product_folder, sanitized_term)
+    screenshot_path = os.path.join(product_folder, f"{sanitized_term}_screenshot.png")
+    with open(screenshot_path, 'wb') as f:
+        f.write(png)
+    print(f"Screenshot saved: {screenshot_path}")
+    return screenshot_path
+
+@medir('take_product_screenshot')
+def take_product_screenshot(driver, wait, product_folder, sanitized_term):
+    """Capture and save screenshot of product results"""
+    png = capture_product_screenshot(driver, wait, sanitized_term)
+    if png is None:
+        return False
+    try:
+        save_product_screenshot(png, product_folder, sanitized_term)
         return True
     except Exception as screenshot_error:
         print(f"Failed to take screenshot for {sanitized_term}: {screenshot_error}")
         return False
 
 
-# Para que no corra minimizado comenta la línea de abajo
-options = Options()
-# options.add_argument("--headless")  # Ejecuta Chrome en modo headless
-service = Service(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=service, options=options)
-
-
-# #Para que no corra minimizado comenta la linea de abajo
-# options = Options()
-
-# #options.add_argument("--headless")  # Run Chrome in headless mode
-
-# service = Service(executable_path="chromedriver.exe")
-# driver = webdriver.Chrome(service=service, options=options)
-
-driver.get("https://www.mercadona.es/")
-
-wait = WebDriverWait(driver, 5)  # Wait for up to 10 seconds
+URL_MERCADONA = "https://www.mercadona.es/"
 
 CODIGO_POSTAL = "46007"
 
@@ -68,9 +99,78 @@ CODIGO_POSTAL = "46007"
 PRODUCTO_PRUEBA = 'Espárrago verde grueso'
 
 LISTA_PRODUCTOS = ['manzanas','peras','gominolas','chocolate','leche','pan','agua','cerveza','vino','cava','coca cola','fanta','sprite','naranja']
-print(LISTA_PRODUCTOS)
 
-try:
+MAIN_FOLDER = "excel_productos_headless"
+
+# Los resultados se guardan en el almacen de snapshots; el Excel por termino es opcional
+GUARDAR_EXCEL = False
+
+# Bajar por el grid leyendo solo las celdas nuevas que se cargan al hacer scroll
+CARGA_INCREMENTAL = False
+
+# Servir desde resultados_cache.sqlite los terminos que no han cambiado desde la ultima ejecucion
+USAR_CACHE = False
+
+# Bloquear imagenes, fuentes y scripts de terceros mientras se busca y extrae (ver lean_mode.py)
+MODO_LIGERO = False
+
+# Construir la tabla con las respuestas JSON de la busqueda en lugar de leer las celdas (ver xhr_capture.py)
+CAPTURA_RED = False
+
+# Capturar solo el grid, comprimido y escrito en segundo plano, con la politica POLITICA_CAPTURAS
+# ('siempre', 'cada_n' o 'cambio_precio', ver capturas.py)
+CAPTURAS_LIGERAS = False
+POLITICA_CAPTURAS = 'cambio_precio'
+
+# Pestañas de la misma sesion que buscan a la vez (ver pestanas.py); 1 = una busqueda tras otra
+PESTANAS = 1
+
+# Al terminar, comparar con la ejecucion anterior y guardar solo los cambios (ver cambios.py)
+DETECTAR_CAMBIOS = False
+CAMBIOS_JSONL = "cambios.jsonl"
+
+# Registrar la duracion y los comandos WebDriver de cada paso en instrumentacion.jsonl
+INSTRUMENTAR = False
+
+# Conectarse al navegador persistente de browser_session.py en lugar de abrir uno nuevo
+NAVEGADOR_PERSISTENTE = False
+
+def crear_driver(headless=False, captura_red=False, ligero=False, pestanas=False):
+    """
+    Creates the Chrome WebDriver.
+    Args:
+        headless: Run it without a window.
+        captura_red: Enable the performance log needed by guardar_productos_red.
+        ligero: Block images, fonts and third-party scripts (see lean_mode.activar_modo_ligero).
+        pestanas: Keep timers and rendering of background tabs at full speed (see pestanas.py).
+    """
+    options = Options()
+    if headless:
+        options.add_argument("--headless")  # Ejecuta Chrome en modo headless
+    if pestanas:
+        # Sin esto Chrome frena los setTimeout y el pintado de las pestañas que no estan delante
+        for flag in ("--disable-background-timer-throttling", "--disable-renderer-backgrounding",
+                     "--disable-backgrounding-occluded-windows"):
+            options.add_argument(flag)
+    if captura_red:
+        activar_captura_red(options)
+    service = Service(ruta_chromedriver())
+    driver = webdriver.Chrome(service=service, options=options)
+    if ligero:
+        activar_modo_ligero(driver)
+    return driver
+
+def iniciar_sesion(driver, wait, codigo_postal, url=URL_MERCADONA):
+    """
+    Opens the store, rejects the cookies and enters the postal code.
+    Args:
+        driver: Selenium WebDriver instance.
+        wait: WebDriverWait instance for explicit waits.
+        codigo_postal: Postal code for the store session.
+        url: Store URL.
+    """
+    driver.get(url)
+
     # Rechazar las cookies.
     cookies_closed = retry_click_element(driver,By.CSS_SELECTOR,'button.ui-button--tertiary.ui-button--positive',
     retries=3,wait_time=5)
@@ -80,62 +180,210 @@ try:
         print("No se pudo clicar el botón 'Rechazar' tras varios intentos.")
 
     # Añade el Codigo Postal
-    enter_postal_code(driver, wait, CODIGO_POSTAL)
+    enter_postal_code(driver, wait, codigo_postal)
+
+def preparar_sesion(driver, wait, codigo_postal, url=URL_MERCADONA):
+    """Runs iniciar_sesion unless the tab already has a ready store session (persistent browser)"""
+    if sesion_lista(driver, url):
+        print("Sesión del navegador persistente reutilizada.")
+        return
+    iniciar_sesion(driver, wait, codigo_postal, url)
+
+def sanitizar_termino(term):
+    """Term as used in folder and file names"""
+    return term.replace(' ', '_').replace('/', '-')
+
+def buscar_termino(driver, wait, term, espera_maxima=RESULTS_READY_TIMEOUT, captura_red=False):
+    """
+    Searches one term and waits until the grid shows its results.
+    Args:
+        driver: Selenium WebDriver instance.
+        wait: WebDriverWait instance for explicit waits.
+        term: Search term.
+        espera_maxima: Upper bound in seconds to wait for the results of the search.
+        captura_red: Empty the performance log first, so leer_resultados only sees this search.
+    In lean mode it also reports the bytes transferred and the time until the results settled.
+    Raises:
+        TimeoutException: The grid did not settle in espera_maxima. The term must not be read,
+                          the cells on screen may belong to the previous search.
+    """
+    medir_red = modo_ligero_activo(driver)
+    if medir_red:
+        inicio = iniciar_medicion(driver)
+    previous_signature = mark_results(driver)
+    if captura_red:
+        descartar_log_red(driver)
+    search_and_submit(driver, wait, term)
+
+    # Esperar a que el grid muestre los resultados de este término; si no llegan, lanza TimeoutException
+    wait_for_results_ready(driver, previous_signature, timeout=espera_maxima)
+    if medir_red:
+        informe_termino(driver, term, inicio)
+
+def leer_resultados(driver, wait, term, captura_red=False, incremental=False):
+    """
+    Takes the screenshot and reads the product table of the results on screen.
+    Returns:
+        (DataFrame with the products, screenshot PNG bytes or None).
+    """
+    # Capture screenshot using dedicated function
+    png = capture_product_screenshot(driver, wait, sanitizar_termino(term))
+
+    if captura_red:
+        df = guardar_productos_red(driver, wait, term)
+    else:
+        df = guardar_productos_2(driver, wait, term, incremental=incremental)
+    return df, png
+
+def extraer_termino(driver, wait, term, espera_maxima=RESULTS_READY_TIMEOUT, captura_red=False, incremental=False):
+    """
+    Searches one term and reads its results, without writing anything to disk.
+    Args:
+        driver: Selenium WebDriver instance.
+        wait: WebDriverWait instance for explicit waits.
+        term: Search term.
+        espera_maxima: Upper bound in seconds to wait for the results of the search.
+        captura_red: Build the table from the captured JSON responses (driver created
+                     with captura_red=True) instead of the rendered cells.
+        incremental: Scroll the grid reading the lazy-loaded cells (see harvest_products).
+    Returns:
+        (DataFrame with the products, screenshot PNG bytes or None).
+    """
+    buscar_termino(driver, wait, term, espera_maxima, captura_red)
+    return leer_resultados(driver, wait, term, captura_red, incremental)
+
+def escribir_resultado(term, df, png, main_folder=MAIN_FOLDER, conn=None, codigo_postal=CODIGO_POSTAL,
+                       run_ts=None, excel=True):
+    """
+    Writes the results of one term: screenshot in main_folder/<term>/, rows in the
+    snapshot store and, optionally, main_folder/<term>/<term>.xlsx.
+    Args:
+        term: Search term.
+        df: DataFrame returned by extraer_termino.
+        png: Screenshot returned by extraer_termino. Skipped if None.
+        main_folder: Folder where every term gets its own subfolder.
+        conn: Snapshot store connection (see snapshot_store.abrir_store). Not used if None.
+        codigo_postal: Postal code stored with the rows.
+        run_ts: Run timestamp stored with the rows.
+        excel: Also write the Excel file.
+    """
+    # Sanitize the term for folder/file names
+    sanitized_term = sanitizar_termino(term)
+    
+    # Create product-specific folder path
+    product_folder = os.path.join(main_folder, sanitized_term)
+    
+    # Create product folder if it doesn't exist
+    os.makedirs(product_folder, exist_ok=True)
+
+    if png is not None:
+        save_product_screenshot(png, product_folder, sanitized_term)
+
+    if conn is not None:
+        filas = guardar_snapshot(conn, df, term, codigo_postal, run_ts)
+        print(f"{filas} productos guardados en el almacén para '{term}'.")
+
+    if excel:
+        # Create file path inside the product folder
+        file_name = f"{sanitized_term}.xlsx"
+        file_path = os.path.join(product_folder, file_name)
+
+        # Save the DataFrame to Excel
+        df.to_excel(file_path, index=False)
+        print(f"Excel file saved: {file_path}")
+
+def procesar_termino(driver, wait, term, main_folder=MAIN_FOLDER, espera_maxima=RESULTS_READY_TIMEOUT,
+                     captura_red=False, conn=None, codigo_postal=CODIGO_POSTAL, run_ts=None, excel=True,
+                     incremental=False):
+    """
+    Searches one term and writes its results. See extraer_termino and escribir_resultado.
+    Returns:
+        DataFrame with the products of the term.
+    """
+    df, png = extraer_termino(driver, wait, term, espera_maxima, captura_red, incremental)
+    escribir_resultado(term, df, png, main_folder, conn, codigo_postal, run_ts, excel)
+    return df
+
+
+if __name__ == "__main__":
+    if INSTRUMENTAR:
+        activar()
+
+    if NAVEGADOR_PERSISTENTE:
+        arrancar_navegador_persistente()
+        driver = conectar_navegador(captura_red=CAPTURA_RED)
+        if MODO_LIGERO:
+            activar_modo_ligero(driver)
+    else:
+        # Para que no corra minimizado pasa headless=True
+        driver = crear_driver(captura_red=CAPTURA_RED, ligero=MODO_LIGERO, pestanas=PESTANAS > 1)
 
-    # Añade los productos al carro con "Añadir al carro" 
-    # El primer producto saca un pop up, asi que se mete elemento de prueba que posteriormente se elimina.
+    # #Con un chromedriver local en lugar de ChromeDriverManager
+    # service = Service(executable_path="chromedriver.exe")
+    # driver = webdriver.Chrome(service=service, options=Options())
 
-    # search_and_submit(driver, wait, PRODUCTO_PRUEBA)
-    # click_add_to_cart_by_name(driver,wait,PRODUCTO_PRUEBA,1,'ud','NaN')
-    # # Handle the popup if it appears
-    # handle_popup(driver, wait)
-    
-    # Buscar y seleccionar los productos de la lista
-
-    # Create the folder if it doesn't exist
-    main_folder = "excel_productos_headless"
-    if not os.path.exists(main_folder):
-        os.makedirs(main_folder)
-
-    for i in range(0, len(LISTA_PRODUCTOS)):
-        try:
-            time.sleep(2)
-            term = LISTA_PRODUCTOS[i]
-            
-            # Sanitize the term for folder/file names
-            sanitized_term = term.replace(' ', '_').replace('/', '-')
-            
-            # Create product-specific folder path
-            product_folder = os.path.join(main_folder, sanitized_term)
-            
-            # Create product folder if it doesn't exist
-            os.makedirs(product_folder, exist_ok=True)
-
-            search_and_submit(driver, wait, term)
-
-            # Capture screenshot using dedicated function
-            time.sleep(5)
-            take_product_screenshot(driver, wait, product_folder, sanitized_term)
-
-            df = guardar_productos_2(driver, wait, term)
-            
-            # Create file path inside the product folder
-            file_name = f"{sanitized_term}.xlsx"
-            file_path = os.path.join(product_folder, file_name)
-
-            # Save the DataFrame to Excel
-            df.to_excel(file_path, index=False)
-            print(f"Excel file saved: {file_path}")
-
-        except Exception as e:
-            print(f"Error al procesar el producto '{term}': {e}. Continuando con el siguiente.")
-
-    #Eliminar elemento de prueba
-    #search_and_submit(driver, wait, PRODUCTO_PRUEBA)
-    #click_add_to_cart_by_name_delete(driver,wait,PRODUCTO_PRUEBA,1,'ud','NaN',True)
-
-except TimeoutException:
-    print("El campo de código postal no se encontró dentro del tiempo de espera.")
-
-# Mantener el navegador abierto hasta que el usuario presione Enter
-input("Presiona Enter para cerrar el navegador...")
\ No newline at end of file
+    wait = WebDriverWait(driver, 5)  # Wait for up to 10 seconds
+
+    gestor_capturas = GestorCapturas(politica=POLITICA_CAPTURAS) if CAPTURAS_LIGERAS else None
+    if gestor_capturas is not None:
+        activar_capturas(driver, gestor_capturas, CODIGO_POSTAL)
+
+    print(LISTA_PRODUCTOS)
+
+    try:
+        preparar_sesion(driver, wait, CODIGO_POSTAL)
+
+        # Añade los productos al carro con "Añadir al carro" 
+        # El primer producto saca un pop up, asi que se mete elemento de prueba que posteriormente se elimina.
+
+        # search_and_submit(driver, wait, PRODUCTO_PRUEBA)
+        # click_add_to_cart_by_name(driver,wait,PRODUCTO_PRUEBA,1,'ud','NaN')
+        # # Handle the popup if it appears
+        # handle_popup(driver, wait)
+        
+        # Buscar y seleccionar los productos de la lista
+
+        # Create the folder if it doesn't exist
+        if not os.path.exists(MAIN_FOLDER):
+            os.makedirs(MAIN_FOLDER)
+
+        # El driver sigue con el siguiente término mientras las capturas y tablas se escriben en segundo plano
+        from pipeline import ejecutar_pipeline
+        from result_cache import CacheResultados
+        cache = CacheResultados() if USAR_CACHE else None
+        ejecutar_pipeline(driver, wait, LISTA_PRODUCTOS, MAIN_FOLDER, codigo_postal=CODIGO_POSTAL,
+                          excel=GUARDAR_EXCEL, captura_red=CAPTURA_RED, incremental=CARGA_INCREMENTAL, cache=cache,
+                          pestanas=PESTANAS)
+        if cache is not None:
+            print(f"Cache de resultados: {cache.metricas()}")
+            cache.close()
+        if gestor_capturas is not None:
+            print(f"Capturas: {gestor_capturas.metricas()}")
+            gestor_capturas.close()
+
+        if DETECTAR_CAMBIOS:
+            from cambios import comparar_runs, destino_consola, destino_jsonl, destino_sqlite
+            from snapshot_store import DB_PRODUCTOS, abrir_store
+            conn = abrir_store(DB_PRODUCTOS)
+            try:
+                comparar_runs(conn, codigo_postal=CODIGO_POSTAL,
+                              destinos=[destino_consola, destino_jsonl(CAMBIOS_JSONL), destino_sqlite(conn)])
+            finally:
+                conn.close()
+
+        #Eliminar elemento de prueba
+        #search_and_submit(driver, wait, PRODUCTO_PRUEBA)
+        #click_add_to_cart_by_name_delete(driver,wait,PRODUCTO_PRUEBA,1,'ud','NaN',True)
+
+    except TimeoutException:
+        print("El campo de código postal no se encontró dentro del tiempo de espera.")
+
+    if INSTRUMENTAR:
+        desactivar()
+
+    if NAVEGADOR_PERSISTENTE:
+        # El navegador persistente sigue abierto para la siguiente ejecución
+        soltar_navegador(driver)
+    else:
+        # Mantener el navegador abierto hasta que el usuario presione Enter
+        input("Presiona Enter para cerrar el navegador...")
@@ -0,0 +1,203 @@
+#Backend HTTP: busquedas y catalogo directamente contra la API JSON de la tienda, sin navegador.
+#Devuelve el mismo DataFrame que guardar_productos_2 (Nombre_producto, Precio, etiqueta, formato).
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+URL_API = "https://tienda.mercadona.es/api"
+# La busqueda de la tienda la sirve Algolia, con un indice por almacen. Las credenciales se leen del entorno
+URL_BUSQUEDA = "https://{app_id}-dsn.algolia.net/1/indexes/products_prod_{almacen}_es/query"
+VAR_ALGOLIA_APP_ID = "MERCADONA_ALGOLIA_APP_ID"
+VAR_ALGOLIA_API_KEY = "MERCADONA_ALGOLIA_API_KEY"
+
+ALMACEN_POR_DEFECTO = "vlc1"
+
+COLUMNAS_PRODUCTO = ['Nombre_producto', 'Precio', 'etiqueta', 'formato']
+
+
+def credenciales_algolia():
+    """(application id, API key) of the store search from the environment, None where missing"""
+    return os.environ.get(VAR_ALGOLIA_APP_ID), os.environ.get(VAR_ALGOLIA_API_KEY)
+
+
+def url_busqueda_almacen(url_busqueda, almacen):
+    """
+    Search URL of a warehouse.
+    Raises:
+        Exception: The URL is the store's Algolia one ({app_id} placeholder) and the
+                   credentials are not in the environment.
+    """
+    app_id, api_key = credenciales_algolia()
+    if '{app_id}' in url_busqueda and not (app_id and api_key):
+        raise Exception(f"Faltan las credenciales de búsqueda de la tienda: define {VAR_ALGOLIA_APP_ID} "
+                        f"y {VAR_ALGOLIA_API_KEY} en el entorno.")
+    return url_busqueda.format(app_id=(app_id or '').lower(), almacen=almacen)
+
+
+def crear_sesion_http(pool_size=8, retries=3):
+    """
+    Creates a requests.Session with a connection pool and retries on 429/5xx. The
+    search credentials are sent if they are in the environment (see credenciales_algolia).
+    Args:
+        pool_size: Maximum open connections per host. Use at least max_workers.
+        retries: Retries per request.
+    Returns:
+        requests.Session instance.
+    """
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=None)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept": "application/json"})
+    app_id, api_key = credenciales_algolia()
+    if app_id and api_key:
+        session.headers.update({"x-algolia-application-id": app_id, "x-algolia-api-key": api_key})
+    return session
+
+
+def resolver_almacen(session, codigo_postal, url_api=URL_API, timeout=10):
+    """
+    Asks the store which warehouse serves a postal code.
+    Args:
+        session: Session from crear_sesion_http.
+        codigo_postal: Postal code.
+        url_api: Base URL of the store API.
+    Returns:
+        Warehouse code (e.g. 'vlc1').
+    """
+    response = session.put(f"{url_api}/postal-codes/actions/change-pc/",
+                           json={"new_postal_code": codigo_postal}, timeout=timeout)
+    response.raise_for_status()
+    almacen = response.headers.get("x-customer-wh")
+    if not almacen:
+        raise Exception(f"La tienda no devolvió almacén para el código postal '{codigo_postal}'")
+    return almacen
+
+
+def _numero(valor):
+    """Formats a number the way the store does: comma as decimal separator, no trailing zeros"""
+    return f"{valor:g}".replace('.', ',')
+
+
+def formato_producto(producto):
+    """
+    Builds the text of the product format cell (e.g. 'Brick 1 L', 'Pack-6 6 x 1,5 L',
+    'Paquete 500 g') from the price_instructions of the API.
+    """
+    pi = producto['price_instructions']
+    unidad = 'kg' if pi.get('size_format') == 'kg' else 'L'
+    unit_size = float(pi.get('unit_size') or 0)
+    if pi.get('is_pack') and pi.get('total_units'):
+        size = f"{pi['total_units']} x {_numero(round(unit_size / pi['total_units'], 2))} {unidad}"
+    elif 0 < unit_size < 1:
+        size = f"{round(unit_size * 1000)} {'g' if unidad == 'kg' else 'ml'}"
+    else:
+        size = f"{_numero(unit_size)} {unidad}"
+    return f"{producto.get('packaging') or ''} {size}".strip()
+
+
+def etiqueta_producto(producto):
+    """
+    Text the store shows after the price: '/ud.' or '/pack' for products sold by units,
+    and the weight unit ('/kg', '/100 g') for products sold by weight (selling_method != 0).
+    """
+    pi = producto['price_instructions']
+    if pi.get('selling_method'):
+        unidad = (pi.get('size_format') or 'kg').lower()
+        return '/100 g' if unidad == 'g' else f"/{unidad}"
+    return '/pack' if pi.get('is_pack') else '/ud.'
+
+
+def producto_desde_json(producto):
+    """
+    Converts a product of the API into the same record guardar_productos_2 builds from the cell.
+    Args:
+        producto: Product dict with display_name, packaging and price_instructions.
+    Returns:
+        Dict with Nombre_producto, Precio, etiqueta and formato.
+    """
+    pi = producto['price_instructions']
+    return {
+        'Nombre_producto': producto['display_name'].strip(),
+        'Precio': f"{pi['unit_price'].replace('.', ',')} €",
+        # Solo las letras, como guardar_productos_2 con la etiqueta de la celda
+        'etiqueta': re.sub(r'[^a-zA-Z]', '', etiqueta_producto(producto)),
+        'formato': formato_producto(producto)
+    }
+
+
+def productos_a_dataframe(productos):
+    """Product table with the guardar_productos_2 columns, also when there are no products"""
+    return pd.DataFrame([producto_desde_json(p) for p in productos], columns=COLUMNAS_PRODUCTO)
+
+
+def buscar_productos_http(session, term, almacen=ALMACEN_POR_DEFECTO, url_busqueda=URL_BUSQUEDA, timeout=10):
+    """
+    Searches a term over HTTP.
+    Args:
+        session: Session from crear_sesion_http.
+        term: Search term.
+        almacen: Warehouse whose catalog is searched (see resolver_almacen).
+        url_busqueda: Search URL, with an {almacen} placeholder.
+    Returns:
+        DataFrame with columns Nombre_producto, Precio, etiqueta, formato.
+    """
+    response = session.post(url_busqueda_almacen(url_busqueda, almacen),
+                            json={"params": f"query={requests.utils.quote(term)}&hitsPerPage=500"},
+                            timeout=timeout)
+    response.raise_for_status()
+    return productos_a_dataframe(response.json().get('hits', []))
+
+
+def buscar_terminos_http(session, terms, almacen=ALMACEN_POR_DEFECTO, url_busqueda=URL_BUSQUEDA,
+                         max_workers=8, timeout=10):
+    """
+    Searches several terms concurrently, with at most max_workers requests in flight.
+    Returns:
+        Dict term -> DataFrame. Terms whose request failed are left out and printed.
+    Raises:
+        Exception: Missing search credentials (see url_busqueda_almacen), before any request.
+    """
+    url_busqueda_almacen(url_busqueda, almacen)
+
+    def buscar(term):
+        try:
+            return term, buscar_productos_http(session, term, almacen, url_busqueda, timeout)
+        except Exception as e:
+            print(f"Error al buscar '{term}' por HTTP: {e}")
+            return term, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        resultados = executor.map(buscar, terms)
+    return {term: df for term, df in resultados if df is not None}
+
+
+def categorias_http(session, url_api=URL_API, timeout=10):
+    """Returns the top-level categories of the store, each with its subcategories"""
+    response = session.get(f"{url_api}/categories/", timeout=timeout)
+    response.raise_for_status()
+    return response.json()['results']
+
+
+def productos_categoria_http(session, categoria_id, almacen=ALMACEN_POR_DEFECTO, url_api=URL_API, timeout=10):
+    """
+    Returns every product of a subcategory.
+    Args:
+        session: Session from crear_sesion_http.
+        categoria_id: Id of a subcategory listed by categorias_http.
+        almacen: Warehouse whose catalog is read.
+    Returns:
+        DataFrame with columns Nombre_producto, Precio, etiqueta, formato.
+    """
+    response = session.get(f"{url_api}/categories/{categoria_id}/",
+                           params={"lang": "es", "wh": almacen}, timeout=timeout)
+    response.raise_for_status()
+    productos = [p for sub in response.json().get('categories', []) for p in sub.get('products', [])]
+    return productos_a_dataframe(productos)
@@ -0,0 +1,145 @@
+#Instrumentacion: duracion de cada paso, comandos WebDriver que lanza, reintentos y timeouts.
+#Desactivada por defecto; con activar() escribe un registro JSON por paso y un resumen p50/p95 al final.
+import functools
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+INSTRUMENTACION_JSONL = "instrumentacion.jsonl"
+
+_estado = {'activo': False, 'salida': None, 'pasos': defaultdict(list), 'inicio': None}
+_lock = threading.Lock()
+_local = threading.local()
+_execute_original = WebDriver.execute
+
+
+def _pila():
+    if not hasattr(_local, 'pila'):
+        _local.pila = []
+    return _local.pila
+
+
+def _execute_contado(self, driver_command, params=None):
+    """WebDriver.execute that counts the command in every open span of the thread"""
+    for span in _pila():
+        span['comandos'] += 1
+    return _execute_original(self, driver_command, params)
+
+
+def activar(path=INSTRUMENTACION_JSONL):
+    """
+    Starts recording spans to a JSON-lines file.
+    Args:
+        path: File where one JSON record per step is appended.
+    """
+    with _lock:
+        _estado['salida'] = open(path, 'a', encoding='utf-8')
+        _estado['pasos'] = defaultdict(list)
+        _estado['inicio'] = time.time()
+        _estado['activo'] = True
+    WebDriver.execute = _execute_contado
+
+
+def desactivar():
+    """
+    Stops recording, appends the summary record and prints it.
+    Returns:
+        The summary (see resumen).
+    """
+    WebDriver.execute = _execute_original
+    with _lock:
+        if not _estado['activo']:
+            return {}
+        _estado['activo'] = False
+        datos = resumen()
+        _estado['salida'].write(json.dumps({'tipo': 'resumen', 'pasos': datos}, ensure_ascii=False) + '\n')
+        _estado['salida'].close()
+        _estado['salida'] = None
+
+    print('Paso                       n     p50 ms    p95 ms  comandos  reintentos  timeouts')
+    for paso, d in datos.items():
+        print(f"{paso:<24}{d['n']:>4}{d['p50_ms']:>11.1f}{d['p95_ms']:>10.1f}"
+              f"{d['comandos']:>10}{d['reintentos']:>12}{d['timeouts']:>10}")
+    return datos
+
+
+def activa():
+    """True while spans are being recorded"""
+    return _estado['activo']
+
+
+def _percentil(valores, q):
+    """Nearest-rank percentile of a sorted list"""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(q * len(valores)) - 1)]
+
+
+def resumen():
+    """
+    Aggregates the recorded spans per step.
+    Returns:
+        Dict step -> {'n', 'p50_ms', 'p95_ms', 'total_ms', 'comandos', 'reintentos', 'timeouts'}.
+    """
+    datos = {}
+    for paso, spans in _estado['pasos'].items():
+        duraciones = sorted(s['duracion_ms'] for s in spans)
+        datos[paso] = {
+            'n': len(spans),
+            'p50_ms': _percentil(duraciones, 0.50),
+            'p95_ms': _percentil(duraciones, 0.95),
+            'total_ms': sum(duraciones),
+            'comandos': sum(s['comandos'] for s in spans),
+            'reintentos': sum(s['reintentos'] for s in spans),
+            'timeouts': sum(s['timeouts'] for s in spans),
+        }
+    return datos
+
+
+def contar(evento):
+    """
+    Counts a 'reintentos' or 'timeouts' event in the innermost open span of the thread.
+    Does nothing when the instrumentation is off.
+    """
+    if _estado['activo'] and _pila():
+        _pila()[-1][evento] += 1
+
+
+def medir(paso):
+    """
+    Decorator that records a span for every call of the function while the
+    instrumentation is on. When it is off the only cost is one dict lookup.
+    Args:
+        paso: Step name used in the records and the summary.
+    """
+    def decorador(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _estado['activo']:
+                return fn(*args, **kwargs)
+
+            span = {'paso': paso, 'comandos': 0, 'reintentos': 0, 'timeouts': 0, 'error': None}
+            pila = _pila()
+            pila.append(span)
+            inicio = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                # Los timeouts los cuenta contar() donde se producen, una sola vez y en el span mas interno
+                span['error'] = type(e).__name__
+                raise
+            finally:
+                span['duracion_ms'] = (time.perf_counter() - inicio) * 1000
+                pila.pop()
+                span['inicio'] = round(time.time() - span['duracion_ms'] / 1000, 3)
+                span['hilo'] = threading.current_thread().name
+                with _lock:
+                    if _estado['activo']:
+                        _estado['pasos'][paso].append(span)
+                        _estado['salida'].write(json.dumps(span, ensure_ascii=False) + '\n')
+        return wrapper
+    return decorador
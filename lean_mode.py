@@ -0,0 +1,119 @@
+#Modo ligero: bloquea imagenes, fuentes y scripts de analitica/terceros con el CDP (Network.setBlockedURLs)
+#manteniendo el JSON y los scripts que la SPA necesita para pintar las celdas. Las imagenes se permiten
+#solo mientras se hace la captura. Registra los bytes transferidos y el tiempo hasta que la pagina se
+#estabiliza en cada termino.
+import time
+import weakref
+from contextlib import contextmanager
+
+# Los patrones cubren toda la URL: el * final admite la query (imagen.jpg?fit=crop&w=300)
+IMAGENES = ['*.jpg*', '*.jpeg*', '*.png*', '*.webp*', '*.gif*', '*.svg*', '*.avif*', '*.ico*']
+FUENTES = ['*.woff*', '*.ttf*', '*.otf*', '*.eot*']
+TERCEROS = ['*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*facebook.net*',
+            '*connect.facebook.com*', '*hotjar.com*', '*bat.bing.com*', '*clarity.ms*', '*tiktok.com*',
+            '*criteo.com*', '*optimizely.com*', '*newrelic.com*', '*nr-data.net*', '*sentry.io*']
+BLOQUEOS_POR_DEFECTO = IMAGENES + FUENTES + TERCEROS
+
+# Espera maxima a que carguen las imagenes antes de la captura
+ESPERA_IMAGENES_S = 5
+
+# Driver -> {'patrones', 'imagenes_en_captura', 'informes'}
+_estado = weakref.WeakKeyDictionary()
+
+_RECARGAR_IMAGENES_JS = """
+const [timeoutMs, done] = arguments;
+const pendientes = Array.from(document.images).filter(img => img.src && (!img.complete || img.naturalWidth === 0));
+pendientes.forEach(img => { const src = img.src; img.src = ''; img.src = src; });
+const inicio = performance.now();
+const timer = setInterval(() => {
+    if (pendientes.every(img => img.complete) || performance.now() - inicio >= timeoutMs) {
+        clearInterval(timer);
+        done(pendientes.length);
+    }
+}, 50);
+"""
+
+_INICIAR_MEDICION_JS = """
+performance.setResourceTimingBufferSize(10000);
+performance.clearResourceTimings();
+"""
+
+_BYTES_JS = """
+const entries = performance.getEntriesByType('resource');
+return {peticiones: entries.length, bytes: entries.reduce((s, e) => s + (e.transferSize || e.encodedBodySize || 0), 0)};
+"""
+
+
+def _bloquear(driver, patrones):
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patrones})
+
+
+def activar_modo_ligero(driver, patrones=BLOQUEOS_POR_DEFECTO, imagenes_en_captura=True):
+    """
+    Blocks the requests matching the patterns for the rest of the session.
+    Args:
+        driver: Chrome WebDriver instance.
+        patrones: URL patterns with * wildcards (see BLOQUEOS_POR_DEFECTO).
+        imagenes_en_captura: Let images load while capture_product_screenshot runs.
+    """
+    driver.execute_cdp_cmd('Network.enable', {})
+    _bloquear(driver, list(patrones))
+    _estado[driver] = {'patrones': list(patrones), 'imagenes_en_captura': imagenes_en_captura, 'informes': []}
+
+
+def desactivar_modo_ligero(driver):
+    """Stops blocking requests"""
+    _bloquear(driver, [])
+    _estado.pop(driver, None)
+
+
+def modo_ligero_activo(driver):
+    return driver in _estado
+
+
+@contextmanager
+def con_imagenes(driver, timeout=ESPERA_IMAGENES_S):
+    """
+    Unblocks images inside the block, reloading the ones that were blocked and waiting for
+    them, so the screenshot shows the product photos. Does nothing outside lean mode or
+    when it was activated with imagenes_en_captura=False.
+    """
+    estado = _estado.get(driver)
+    if not estado or not estado['imagenes_en_captura']:
+        yield
+        return
+
+    _bloquear(driver, [p for p in estado['patrones'] if p not in IMAGENES])
+    try:
+        driver.set_script_timeout(timeout + 5)
+        driver.execute_async_script(_RECARGAR_IMAGENES_JS, timeout * 1000)
+        yield
+    finally:
+        _bloquear(driver, estado['patrones'])
+
+
+def iniciar_medicion(driver):
+    """Clears the resource timings so the next informe_termino only counts this term"""
+    driver.execute_script(_INICIAR_MEDICION_JS)
+    return time.perf_counter()
+
+
+def informe_termino(driver, term, inicio):
+    """
+    Records the bytes transferred and the time to a settled page since iniciar_medicion.
+    Returns:
+        Dict with termino, bytes, peticiones and estable_ms.
+    """
+    medidas = driver.execute_script(_BYTES_JS)
+    informe = {'termino': term, 'bytes': medidas['bytes'], 'peticiones': medidas['peticiones'],
+               'estable_ms': (time.perf_counter() - inicio) * 1000}
+    if driver in _estado:
+        _estado[driver]['informes'].append(informe)
+    print(f"'{term}': {informe['bytes'] / 1024:.1f} KB en {informe['peticiones']} peticiones, "
+          f"página estable en {informe['estable_ms']:.0f} ms.")
+    return informe
+
+
+def informes(driver):
+    """Per-term reports recorded while lean mode was active"""
+    return list(_estado.get(driver, {}).get('informes', []))
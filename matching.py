@@ -0,0 +1,189 @@
+#Indice para emparejar las lineas de una lista de la compra con el catalogo extraido: nombres normalizados
+#(acentos, mayusculas, espacios), indice invertido de palabras y de trigramas, y puntuacion de confianza.
+import math
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Por debajo de esta confianza una linea se da por no encontrada
+MIN_CONFIANZA = 0.6
+# Candidatos por palabras que se puntuan con trigramas antes de elegir
+CANDIDATOS = 32
+# Palabras presentes en mas de esta fraccion del catalogo ('hacendado', 'de') no generan candidatos
+# si la consulta tiene otras; si cuentan para la confianza
+MAX_FRECUENCIA_CANDIDATOS = 0.05
+# Trigramas de la consulta que se usan cuando ninguna palabra coincide (erratas)
+TRIGRAMAS_CANDIDATOS = 8
+
+
+def normalizar_nombre(texto):
+    """Lowercase, without accents, with every run of non-alphanumeric characters as one space"""
+    if texto is None or (isinstance(texto, float) and math.isnan(texto)):
+        return ''
+    sin_acentos = ''.join(c for c in unicodedata.normalize('NFD', str(texto))
+                          if unicodedata.category(c) != 'Mn')
+    return ' '.join(re.sub(r'[^a-z0-9%]+', ' ', sin_acentos.lower()).split())
+
+
+def normalizar_etiqueta(etiqueta):
+    """'/ud.', 'ud', ' UD ' -> 'ud', like the label cleaning of click_add_to_cart_by_name"""
+    return re.sub(r'[^a-z]', '', normalizar_nombre(etiqueta))
+
+
+def trigramas(texto):
+    """Character trigrams of a normalized name, with word boundaries marked"""
+    relleno = f"  {texto} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def _vacia(valor):
+    return valor is None or (isinstance(valor, float) and math.isnan(valor)) or str(valor).lower() in ('', 'nan')
+
+
+class IndiceProductos:
+    """
+    Matching index over a product table (columns Nombre_producto, etiqueta, formato, plus
+    any others such as Precio or id, which are returned with the matches).
+
+    A lookup scores every product sharing a word with the query by the idf weight of the
+    shared words in one vectorized pass. The best CANDIDATOS are re-ranked by trigram
+    similarity; ties at the cut go to the names closest in length to the query, so a short
+    name is not dropped for its longer variants. If no word matches (typos), candidates
+    come from the trigram index instead.
+    """
+
+    def __init__(self, productos):
+        self.productos = productos.reset_index(drop=True)
+        self.registros = self.productos.to_dict('records')
+        self.nombres = [normalizar_nombre(n) for n in self.productos['Nombre_producto']]
+        self.etiquetas = np.array([normalizar_etiqueta(e) for e in self.productos['etiqueta']])
+        self.formatos = [normalizar_nombre(f) for f in self.productos['formato']]
+        self.n = len(self.nombres)
+
+        self.exactos = defaultdict(list)
+        palabras = defaultdict(list)
+        tris = defaultdict(list)
+        self.trigramas = []
+        for i, nombre in enumerate(self.nombres):
+            self.exactos[nombre].append(i)
+            for palabra in set(nombre.split()):
+                palabras[palabra].append(i)
+            t = trigramas(nombre)
+            self.trigramas.append(t)
+            for tri in t:
+                tris[tri].append(i)
+        self.palabras = {p: np.array(ids, dtype=np.int32) for p, ids in palabras.items()}
+        self.idf = {p: math.log(1 + self.n / len(ids)) for p, ids in self.palabras.items()}
+        self.tris = {t: np.array(ids, dtype=np.int32) for t, ids in tris.items()}
+        self.n_trigramas = np.array([len(t) for t in self.trigramas], dtype=np.int32)
+
+    def _candidatos(self, consulta, etiqueta=None):
+        """Indices of the best products with the label by shared words (or trigrams), best first"""
+        palabras = [p for p in set(consulta.split()) if p in self.palabras]
+        raras = [p for p in palabras if len(self.palabras[p]) <= MAX_FRECUENCIA_CANDIDATOS * self.n]
+        palabras = raras or palabras
+        if palabras:
+            ids = np.concatenate([self.palabras[p] for p in palabras])
+            pesos = np.concatenate([np.full(len(self.palabras[p]), self.idf[p]) for p in palabras])
+        else:
+            # Solo los trigramas mas raros: bastan para encontrar el nombre y acotan el trabajo
+            limite = max(CANDIDATOS, MAX_FRECUENCIA_CANDIDATOS * self.n)
+            t = sorted((tri for tri in trigramas(consulta) if 0 < len(self.tris.get(tri, ())) <= limite),
+                       key=lambda tri: len(self.tris[tri]))[:TRIGRAMAS_CANDIDATOS]
+            if not t:
+                return np.array([], dtype=np.int32)
+            ids = np.concatenate([self.tris[tri] for tri in t])
+            pesos = np.ones(len(ids))
+        unicos, inversos = np.unique(ids, return_inverse=True)
+        puntos = np.bincount(inversos, weights=pesos)
+        if etiqueta:
+            con_etiqueta = self.etiquetas[unicos] == etiqueta
+            unicos, puntos = unicos[con_etiqueta], puntos[con_etiqueta]
+        # A igual puntuacion, antes los nombres con un numero de trigramas mas parecido al de la consulta:
+        # comparten las mismas palabras, asi que son los de mas similitud de trigramas
+        distancia = np.abs(self.n_trigramas[unicos] - len(trigramas(consulta)))
+        if len(unicos) > CANDIDATOS:
+            corte = -np.partition(-puntos, CANDIDATOS - 1)[CANDIDATOS - 1]
+            mejores = np.flatnonzero(puntos > corte)
+            empatados = np.flatnonzero(puntos == corte)
+            faltan = CANDIDATOS - len(mejores)
+            if len(empatados) > faltan:
+                empatados = empatados[np.argpartition(distancia[empatados], faltan - 1)[:faltan]]
+            mejores = np.concatenate([mejores, empatados])
+            unicos, puntos, distancia = unicos[mejores], puntos[mejores], distancia[mejores]
+        return unicos[np.lexsort((distancia, -puntos))]
+
+    def _confianza(self, q, total, tq, i):
+        """0..1: idf-weighted share of the query words q in the name, blended with trigram similarity"""
+        recall = sum(self.idf[p] for p in q.intersection(self.nombres[i].split())) / total
+        tn = self.trigramas[i]
+        dice = 2 * len(tq & tn) / (len(tq) + len(tn))
+        return 0.6 * recall + 0.4 * dice
+
+    def _cumple(self, i, etiqueta, etiqueta_2):
+        if etiqueta and self.etiquetas[i] != etiqueta:
+            return False
+        return not etiqueta_2 or etiqueta_2 in self.formatos[i]
+
+    def buscar(self, nombre, etiqueta=None, etiqueta_2=None, k=1, min_confianza=0.0):
+        """
+        Best catalog entries for a shopping-list line.
+        Args:
+            nombre: Product name as written in the list.
+            etiqueta: 'ud', 'pack'... Only products with this label. Ignored if empty/NaN.
+            etiqueta_2: Text that must appear in the product format (e.g. 'Botella'). Ignored if empty/NaN.
+            k: Number of matches to return.
+            min_confianza: Leave out matches below this confidence.
+        Returns:
+            List of up to k dicts with the product columns, 'indice' (row in the table) and
+            'confianza', best first.
+        """
+        consulta = normalizar_nombre(nombre)
+        etiqueta = None if _vacia(etiqueta) else normalizar_etiqueta(etiqueta)
+        etiqueta_2 = None if _vacia(etiqueta_2) else normalizar_nombre(etiqueta_2)
+
+        exactos = [i for i in self.exactos.get(consulta, []) if self._cumple(i, etiqueta, etiqueta_2)]
+        if exactos:
+            puntuados = [(1.0, i) for i in exactos]
+        else:
+            q = set(consulta.split())
+            total = sum(self.idf.get(p, math.log(1 + self.n)) for p in q) or 1.0
+            tq = trigramas(consulta)
+            puntuados = [(self._confianza(q, total, tq, i), i) for i in self._candidatos(consulta, etiqueta)
+                         if self._cumple(i, etiqueta, etiqueta_2)]
+            puntuados.sort(key=lambda x: -x[0])
+
+        resultados = []
+        for confianza, i in puntuados[:k]:
+            if confianza < min_confianza:
+                break
+            fila = dict(self.registros[int(i)])
+            fila.update({'indice': int(i), 'confianza': round(confianza, 3)})
+            resultados.append(fila)
+        return resultados
+
+    def resolver(self, lista, min_confianza=MIN_CONFIANZA):
+        """
+        Resolves every line of a shopping list in one call.
+        Args:
+            lista: DataFrame with Producto and, optionally, Etiqueta and Subtitulo (etiqueta_2),
+                   or the path of the sheet.
+            min_confianza: Lines whose best match is below this are left unmatched.
+        Returns:
+            The list with the matched Nombre_producto, formato, the other product columns
+            and 'confianza' added (NaN where nothing matched).
+        """
+        if isinstance(lista, str):
+            lista = pd.read_excel(lista)
+        lista = lista.reset_index(drop=True)
+        columnas = list(self.productos.columns)
+        filas = []
+        for _, linea in lista.iterrows():
+            encontrados = self.buscar(linea['Producto'], linea.get('Etiqueta'), linea.get('Subtitulo'),
+                                      min_confianza=min_confianza)
+            filas.append({c: encontrados[0].get(c) for c in columnas + ['confianza']} if encontrados else {})
+        emparejados = pd.DataFrame(filas, columns=columnas + ['confianza'], index=lista.index)
+        return lista.join(emparejados, rsuffix='_catalogo')
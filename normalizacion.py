@@ -0,0 +1,113 @@
+#Normalizacion de precios y formatos: convierte las columnas de texto de guardar_productos_2
+#("1,60 €", "Paquete 500 g", "Pack-6 6 x 1 L") en numeros, con operaciones vectorizadas de pandas.
+import numpy as np
+import pandas as pd
+
+# "500 g", "1,5 L", "6 x 1 L", "6 bricks x 200 ml", "12 ud"
+_PATRON_FORMATO = (r'(?:(?P<unidades>\d+)\s*(?:[^\W\d_]+\s+)?x\s*)?'
+                   r'(?P<cantidad>\d+(?:[.,]\d+)?)\s*(?P<unidad>kg|g|ml|cl|l|ud)\b')
+_PATRON_PRECIO = r'(\d+(?:[.,]\d+)?)'
+
+# Factor para pasar cada unidad a kg o litros
+_FACTOR_BASE = {'g': 0.001, 'kg': 1.0, 'ml': 0.001, 'l': 1.0, 'ud': np.nan}
+
+COLUMNAS_NORMALIZADAS = ['precio_eur', 'cantidad', 'unidad', 'cantidad_base', 'precio_por_kg_l', 'normalizado']
+
+
+def parsear_precio(precios):
+    """
+    Parses prices such as "1,60 €", "6,80" or 3.63 into euros.
+    Args:
+        precios: Series of strings or numbers.
+    Returns:
+        Float Series, NaN where the value could not be parsed.
+    """
+    texto = precios.astype(str).str.extract(_PATRON_PRECIO, expand=False)
+    return pd.to_numeric(texto.str.replace(',', '.', regex=False), errors='coerce')
+
+
+def parsear_formato(formatos):
+    """
+    Parses format texts into total quantity and unit.
+    Args:
+        formatos: Series of strings such as "Paquete 500 g" or "Pack-6 6 x 1 L".
+    Returns:
+        DataFrame with 'cantidad' (float, units multiplied for packs) and 'unidad'
+        (g, kg, ml, l or ud). NaN where the text has no recognizable size.
+    """
+    partes = formatos.astype(str).str.lower().str.extract(_PATRON_FORMATO)
+    unidades = pd.to_numeric(partes['unidades'], errors='coerce').fillna(1)
+    cantidad = pd.to_numeric(partes['cantidad'].str.replace(',', '.', regex=False), errors='coerce') * unidades
+    unidad = partes['unidad']
+
+    # Centilitros a mililitros
+    es_cl = unidad == 'cl'
+    cantidad = cantidad.where(~es_cl, cantidad * 10)
+    unidad = unidad.where(~es_cl, 'ml')
+    return pd.DataFrame({'cantidad': cantidad, 'unidad': unidad}, index=formatos.index)
+
+
+def normalizar_productos(df):
+    """
+    Adds numeric price and format columns to a guardar_productos_2 table.
+    Args:
+        df: DataFrame with Precio and formato columns.
+    Returns:
+        Copy of df with COLUMNAS_NORMALIZADAS:
+            precio_eur: price in euros.
+            cantidad, unidad: size of the product (g, kg, ml, l or ud).
+            cantidad_base: size in kg or litres (NaN for ud).
+            precio_por_kg_l: price per kg or litre.
+            normalizado: False for rows whose price or format could not be parsed.
+    """
+    out = df.copy()
+    out['precio_eur'] = parsear_precio(df['Precio'])
+    formato = parsear_formato(df['formato'])
+    out['cantidad'] = formato['cantidad']
+    out['unidad'] = formato['unidad']
+    out['cantidad_base'] = formato['cantidad'] * formato['unidad'].map(_FACTOR_BASE).astype(float)
+    out['precio_por_kg_l'] = out['precio_eur'] / out['cantidad_base']
+    out['normalizado'] = out['precio_eur'].notna() & out['cantidad'].notna()
+    return out
+
+
+def rellenar_lista_compra(lista, productos):
+    """
+    Fills the PVP, Kg and Price/kg columns of a shopping list (prueba_compra.xlsx layout)
+    from scraped product tables.
+    Args:
+        lista: DataFrame with Producto and, optionally, Etiqueta and Subtitulo columns.
+        productos: DataFrame with the guardar_productos_2 columns (one or several terms).
+    Returns:
+        Copy of lista with PVP (euros), Kg (kg or litres of one unit) and Price/kg filled for
+        the lines found. Lines not found keep their values.
+    """
+    catalogo = normalizar_productos(productos)
+    catalogo = catalogo[catalogo['normalizado']]
+    catalogo = catalogo.assign(_clave=catalogo['Nombre_producto'].str.strip().str.lower())
+
+    lineas = lista.reset_index(drop=True)
+    lineas = lineas.assign(_linea=lineas.index, _clave=lineas['Producto'].astype(str).str.strip().str.lower())
+
+    claves_izq, claves_der = ['_clave'], ['_clave']
+    if 'Etiqueta' in lineas.columns:
+        claves_izq.append('Etiqueta')
+        claves_der.append('etiqueta')
+    cruce = lineas.merge(catalogo, left_on=claves_izq, right_on=claves_der, how='inner')
+
+    # Subtitulo (etiqueta_2) tiene que aparecer en el formato del producto
+    if 'Subtitulo' in cruce.columns:
+        subtitulo = cruce['Subtitulo']
+        cumple = [pd.isna(s) or str(s) in str(f) for s, f in zip(subtitulo, cruce['formato'])]
+        cruce = cruce[cumple]
+    cruce = cruce.drop_duplicates('_linea').set_index('_linea')
+
+    out = lista.reset_index(drop=True).copy()
+    for columna in ('PVP', 'Kg', 'Price/kg'):
+        if columna in out.columns:
+            out[columna] = out[columna].astype(object)
+    out.loc[cruce.index, 'PVP'] = cruce['precio_eur']
+    out.loc[cruce.index, 'Kg'] = cruce['cantidad_base']
+    out.loc[cruce.index, 'Price/kg'] = cruce['precio_por_kg_l']
+    out.index = lista.index
+    return out
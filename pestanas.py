@@ -0,0 +1,94 @@
+#Varias pestañas en una sola sesion de Chrome: todas comparten las cookies y el codigo postal, asi que solo
+#la primera hace el saludo inicial. Se lanza la busqueda en cada pestaña y se extrae de una en una: la red y
+#el pintado de las demas avanzan mientras se lee la actual.
+from collections import deque
+
+from browser_session import sesion_lista
+from functions import RESULTS_READY_TIMEOUT, mark_results, search_and_submit, wait_for_results_ready
+from guardar_productos import iniciar_sesion, leer_resultados
+
+
+def abrir_pestanas(driver, wait, k, codigo_postal):
+    """
+    Opens k - 1 tabs next to the current one, which must already have a store session.
+    The new tabs load the page of the current one and reuse its session; if the store
+    asks again for the cookies or the postal code, iniciar_sesion is run in that tab.
+    Returns:
+        List of the k window handles, the current one first.
+    """
+    original = driver.current_window_handle
+    url = driver.current_url
+    handles = [original]
+    for _ in range(k - 1):
+        driver.switch_to.new_window('tab')
+        driver.get(url)
+        if not sesion_lista(driver, url):
+            print("La pestaña nueva no comparte la sesión; se introduce el código postal.")
+            iniciar_sesion(driver, wait, codigo_postal, url)
+        handles.append(driver.current_window_handle)
+    driver.switch_to.window(original)
+    return handles
+
+
+def cerrar_pestanas(driver, handles):
+    """Closes every tab but the first one and goes back to it"""
+    for handle in handles[1:]:
+        try:
+            driver.switch_to.window(handle)
+            driver.close()
+        except Exception:
+            pass
+    driver.switch_to.window(handles[0])
+
+
+def extraer_en_pestanas(driver, wait, terms, handles, espera_maxima=RESULTS_READY_TIMEOUT, incremental=False):
+    """
+    Extracts the terms rotating over the tabs.
+    Every tab starts with a search; then, tab by tab, the results are read and the tab
+    gets its next term right away, so while one tab is read the others are waiting for
+    the network or rendering.
+    Args:
+        driver: Selenium WebDriver instance.
+        wait: WebDriverWait instance for explicit waits.
+        terms: Search terms.
+        handles: Tabs from abrir_pestanas.
+        espera_maxima: Upper bound in seconds to wait for the results of each term.
+        incremental: Scroll the grid reading the lazy-loaded cells (see harvest_products).
+    Yields:
+        (term, DataFrame, screenshot, error) in completion order. On failure DataFrame and
+        screenshot are None and error is the exception.
+    """
+    pendientes = deque(terms)
+    en_curso = {}  # handle -> (termino, firma del grid antes de buscar)
+
+    def lanzar(handle):
+        while pendientes:
+            term = pendientes.popleft()
+            try:
+                driver.switch_to.window(handle)
+                firma = mark_results(driver)
+                search_and_submit(driver, wait, term)
+            except Exception as e:
+                yield term, None, None, e
+                continue
+            en_curso[handle] = (term, firma)
+            return
+
+    for handle in handles:
+        yield from lanzar(handle)
+
+    while en_curso:
+        for handle in handles:
+            if handle not in en_curso:
+                continue
+            term, firma = en_curso.pop(handle)
+            try:
+                driver.switch_to.window(handle)
+                wait_for_results_ready(driver, firma, timeout=espera_maxima)
+                df, png = leer_resultados(driver, wait, term, incremental=incremental)
+            except Exception as e:
+                yield term, None, None, e
+            else:
+                yield term, df, png, None
+            yield from lanzar(handle)
+
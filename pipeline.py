@@ -0,0 +1,142 @@
+#Pipeline de extraccion: el driver busca y extrae termino tras termino mientras hilos de escritura
+#guardan capturas, snapshots y Excel en segundo plano a traves de una cola acotada.
+import queue
+import threading
+import time
+
+from functions import RESULTS_READY_TIMEOUT
+from guardar_productos import extraer_termino, escribir_resultado
+from guardar_productos import MAIN_FOLDER, CODIGO_POSTAL
+from pestanas import abrir_pestanas, cerrar_pestanas, extraer_en_pestanas
+from result_cache import extraer_termino_cacheado
+from snapshot_store import abrir_store, DB_PRODUCTOS, nuevo_run_ts
+
+# Terminos extraidos que pueden esperar a ser escritos antes de frenar al driver
+MAX_PENDIENTES = 8
+N_ESCRITORES = 2
+
+
+def _escritor(cola, main_folder, store_path, codigo_postal, run_ts, excel, errores):
+    """
+    Writer thread: writes queued results until it receives None.
+    It never stops draining the queue, also when the store cannot be opened: every
+    result is then recorded in errores, so the producer is never left blocked on put.
+    """
+    conn = None
+    error_store = None
+    try:
+        # Cada hilo usa su propia conexion: las de sqlite3 no se comparten entre hilos
+        if store_path:
+            try:
+                conn = abrir_store(store_path)
+            except Exception as e:
+                error_store = e
+                print(f"No se pudo abrir el almacén '{store_path}': {e}")
+        while True:
+            item = cola.get()
+            try:
+                if item is None:
+                    break
+                term, df, png = item
+                if error_store is not None:
+                    raise Exception(f"almacén no disponible ({error_store})")
+                escribir_resultado(term, df, png, main_folder, conn, codigo_postal, run_ts, excel)
+            except Exception as e:
+                print(f"Error al escribir los resultados de '{item[0]}': {e}")
+                errores.append(item[0])
+            finally:
+                cola.task_done()
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def _extraer_secuencial(driver, wait, terms, codigo_postal, espera_maxima, captura_red, incremental, cache):
+    """Extracts the terms one after another in the current tab. Yields like extraer_en_pestanas"""
+    for term in terms:
+        try:
+            if cache is not None:
+                df, png = extraer_termino_cacheado(cache, driver, wait, term, codigo_postal, espera_maxima,
+                                                   captura_red, incremental)
+            else:
+                df, png = extraer_termino(driver, wait, term, espera_maxima, captura_red, incremental)
+        except Exception as e:
+            yield term, None, None, e
+        else:
+            yield term, df, png, None
+
+
+def ejecutar_pipeline(driver, wait, terms, main_folder=MAIN_FOLDER, store_path=DB_PRODUCTOS,
+                      codigo_postal=CODIGO_POSTAL, run_ts=None, excel=False,
+                      espera_maxima=RESULTS_READY_TIMEOUT, captura_red=False,
+                      n_escritores=N_ESCRITORES, max_pendientes=MAX_PENDIENTES, incremental=False, cache=None,
+                      pestanas=1):
+    """
+    Processes every term with the driver while writer threads persist the results.
+
+    The driver starts the next search as soon as a term is extracted. When the writers
+    fall behind, the queue fills up to max_pendientes and the driver waits, so memory
+    stays bounded. All queued results are written before returning.
+
+    Args:
+        driver: Selenium WebDriver instance with a ready store session.
+        wait: WebDriverWait instance for explicit waits.
+        terms: List of search terms.
+        main_folder: Folder for screenshots and Excel files.
+        store_path: Snapshot database. None to skip it.
+        codigo_postal: Postal code stored with the rows.
+        run_ts: Run timestamp stored with the rows. Defaults to now.
+        excel: Also write the per-term Excel files.
+        espera_maxima: Upper bound in seconds to wait for the results of each term.
+        captura_red: Extract from the captured JSON responses (see xhr_capture).
+        n_escritores: Number of writer threads.
+        max_pendientes: Maximum extracted results waiting to be written.
+        incremental: Scroll the grid reading the lazy-loaded cells (see harvest_products).
+        cache: result_cache.CacheResultados. Unchanged terms are served from it without
+               extracting them again. Not used if None.
+        pestanas: Tabs of the driver session that search at the same time (see pestanas.py).
+                  Not compatible with cache or captura_red.
+    Returns:
+        Dict with 'extraidos', 'errores_extraccion', 'errores_escritura' and
+        'espera_cola_s' (seconds the driver was blocked by backpressure).
+    """
+    if pestanas > 1 and (cache is not None or captura_red):
+        raise ValueError("Las pestañas concurrentes no admiten cache ni captura_red")
+    run_ts = run_ts or nuevo_run_ts()
+    cola = queue.Queue(maxsize=max_pendientes)
+    errores_escritura = []
+    hilos = [threading.Thread(target=_escritor, name=f"escritor-{i}", daemon=True,
+                              args=(cola, main_folder, store_path, codigo_postal, run_ts, excel, errores_escritura))
+             for i in range(n_escritores)]
+    for hilo in hilos:
+        hilo.start()
+
+    resumen = {'extraidos': [], 'errores_extraccion': [], 'errores_escritura': errores_escritura,
+               'espera_cola_s': 0.0}
+    handles = None
+    try:
+        if pestanas > 1:
+            handles = abrir_pestanas(driver, wait, pestanas, codigo_postal)
+            extracciones = extraer_en_pestanas(driver, wait, terms, handles, espera_maxima, incremental)
+        else:
+            extracciones = _extraer_secuencial(driver, wait, terms, codigo_postal, espera_maxima, captura_red,
+                                               incremental, cache)
+        for term, df, png, error in extracciones:
+            if error is not None:
+                print(f"Error al procesar el producto '{term}': {error}. Continuando con el siguiente.")
+                resumen['errores_extraccion'].append(term)
+                continue
+
+            inicio = time.perf_counter()
+            cola.put((term, df, png))
+            resumen['espera_cola_s'] += time.perf_counter() - inicio
+            resumen['extraidos'].append(term)
+    finally:
+        if handles is not None:
+            cerrar_pestanas(driver, handles)
+        # Vaciar la cola: cada escritor termina al recibir su None
+        for _ in hilos:
+            cola.put(None)
+        for hilo in hilos:
+            hilo.join()
+    return resumen
@@ -0,0 +1,263 @@
+#Grabacion y reproduccion de la tienda: se graba una sesion real (HTML de cada paso, JSON de la API y
+#recursos estaticos) y se sirve en local con latencia configurable para medir el flujo sin depender de la web.
+#Uso: python record_replay.py grabar <carpeta> [lista_compra.xlsx]
+#     python record_replay.py servir <carpeta> [latencia_ms] [jitter_ms]
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from base64 import b64decode
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from fixture_server import simular_latencia
+from guardar_productos import CODIGO_POSTAL, LISTA_PRODUCTOS, URL_MERCADONA, crear_driver, iniciar_sesion
+from guardar_productos import extraer_termino, sanitizar_termino
+
+MANIFIESTO = "manifest.json"
+
+# Tipos de contenido en los que se reescriben las URL absolutas para que apunten al servidor local
+_TIPOS_TEXTO = ('text/', 'javascript', 'json', 'xml')
+
+
+def _clave(method, url, post_data=None):
+    """Lookup key of a request: method, host+path+query and a hash of the body"""
+    partes = urlparse(url)
+    recurso = partes.netloc + (partes.path or '/') + (f"?{partes.query}" if partes.query else '')
+    cuerpo = hashlib.sha1(post_data.encode('utf-8')).hexdigest()[:12] if post_data else ''
+    return f"{method} {recurso} {cuerpo}"
+
+
+class Grabadora:
+    """
+    Collects every response of a driver created with captura_red=True into a folder:
+    bodies in cuerpos/, HTML snapshots of each step in paginas/ and the manifest.json
+    that the replay server uses to answer the same requests.
+    """
+
+    def __init__(self, driver, carpeta):
+        self.driver = driver
+        self.carpeta = carpeta
+        self.peticiones = {}
+        self.manifiesto = {'respuestas': {}, 'paginas': {}, 'terminos': [], 'url_inicio': None}
+        os.makedirs(os.path.join(carpeta, 'cuerpos'), exist_ok=True)
+        os.makedirs(os.path.join(carpeta, 'paginas'), exist_ok=True)
+
+    def recoger(self):
+        """Saves the bodies of the responses finished since the previous call"""
+        for entry in self.driver.get_log('performance'):
+            message = json.loads(entry['message'])['message']
+            params = message.get('params', {})
+            if message['method'] == 'Network.requestWillBeSent':
+                self.peticiones[params['requestId']] = {'request': params['request']}
+            elif message['method'] == 'Network.responseReceived' and params['requestId'] in self.peticiones:
+                self.peticiones[params['requestId']]['response'] = params['response']
+            elif message['method'] == 'Network.loadingFinished':
+                self._guardar(params['requestId'])
+
+    def _guardar(self, request_id):
+        peticion = self.peticiones.pop(request_id, None)
+        if not peticion or 'response' not in peticion:
+            return
+        request, response = peticion['request'], peticion['response']
+        if not request['url'].startswith('http'):
+            return
+        try:
+            body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        except Exception as e:
+            print(f"No se pudo leer la respuesta {request['url']}: {e}")
+            return
+        contenido = b64decode(body['body']) if body.get('base64Encoded') else body['body'].encode('utf-8')
+        nombre = hashlib.sha1(contenido).hexdigest()
+        with open(os.path.join(self.carpeta, 'cuerpos', nombre), 'wb') as f:
+            f.write(contenido)
+        clave = _clave(request['method'], request['url'], request.get('postData'))
+        self.manifiesto['respuestas'][clave] = {
+            'status': response['status'],
+            'mime': response.get('mimeType', 'application/octet-stream'),
+            'cuerpo': nombre,
+            'cabeceras': {k: v for k, v in response.get('headers', {}).items()
+                          if k.lower().startswith('x-') or k.lower() in ('location', 'set-cookie')},
+        }
+
+    def pagina(self, paso):
+        """Saves the rendered HTML of a step (cookies, codigo_postal, busqueda_<term>, carro)"""
+        self.recoger()
+        with open(os.path.join(self.carpeta, 'paginas', f"{paso}.html"), 'w', encoding='utf-8') as f:
+            f.write(self.driver.page_source)
+        self.manifiesto['paginas'][paso] = f"paginas/{paso}.html"
+
+    def guardar_manifiesto(self):
+        self.recoger()
+        with open(os.path.join(self.carpeta, MANIFIESTO), 'w', encoding='utf-8') as f:
+            json.dump(self.manifiesto, f, ensure_ascii=False, indent=1)
+
+
+def grabar(carpeta, terms=LISTA_PRODUCTOS, codigo_postal=CODIGO_POSTAL, url=URL_MERCADONA, lista_compra=None,
+           headless=True):
+    """
+    Records a real session: cookie banner, postal code form, the results of every term and,
+    optionally, the cart after filling a shopping list.
+    Args:
+        carpeta: Output folder.
+        terms: Search terms to record.
+        codigo_postal: Postal code of the session.
+        url: Store URL.
+        lista_compra: Shopping list sheet for cart.llenar_carro. None to skip the cart.
+        headless: Run Chrome without a window.
+    Returns:
+        The manifest.
+    """
+    driver = crear_driver(headless=headless, captura_red=True)
+    wait = WebDriverWait(driver, 10)
+    grabadora = Grabadora(driver, carpeta)
+    try:
+        driver.get(url)
+        grabadora.manifiesto['url_inicio'] = driver.current_url
+        grabadora.manifiesto['codigo_postal'] = codigo_postal
+        grabadora.pagina('cookies')
+
+        # iniciar_sesion vuelve a cargar la portada: sus respuestas se sobrescriben con las mismas
+        iniciar_sesion(driver, wait, codigo_postal, url)
+        grabadora.pagina('codigo_postal')
+
+        for term in terms:
+            try:
+                extraer_termino(driver, wait, term)
+            except Exception as e:
+                print(f"Error al grabar '{term}': {e}. Continuando con el siguiente.")
+                continue
+            grabadora.manifiesto['terminos'].append(term)
+            grabadora.pagina(f"busqueda_{sanitizar_termino(term)}")
+
+        if lista_compra is not None:
+            from cart import llenar_carro
+            llenar_carro(driver, wait, lista_compra)
+            grabadora.pagina('carro')
+    finally:
+        grabadora.guardar_manifiesto()
+        driver.quit()
+    print(f"{len(grabadora.manifiesto['respuestas'])} respuestas grabadas en '{carpeta}'.")
+    return grabadora.manifiesto
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """
+    Answers the requests of a recording. A request to http://<server>/_/<host>/<path> is
+    looked up as https://<host>/<path>; paths without the prefix belong to the host of the
+    start page. Absolute URLs in HTML, JS, CSS and JSON are rewritten to the prefixed form,
+    so the whole store becomes same-origin and no TLS or CORS is involved.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def __init__(self, *args, carpeta=None, manifiesto=None, patron_hosts=None, latencia_ms=0, jitter_ms=0,
+                 **kwargs):
+        self.carpeta = carpeta
+        self.manifiesto = manifiesto
+        self.patron_hosts = patron_hosts
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _buscar(self, method, url, post_data):
+        respuestas = self.manifiesto['respuestas']
+        entrada = respuestas.get(_clave(method, url, post_data))
+        if entrada is None and post_data:
+            # Cuerpo distinto (marcas de tiempo, ids de sesion): vale si solo hay una grabada para esa URL
+            prefijo = _clave(method, url)
+            candidatas = [v for k, v in respuestas.items() if k.startswith(prefijo)]
+            entrada = candidatas[0] if len(candidatas) == 1 else None
+        return entrada
+
+    def _reescribir(self, contenido):
+        texto = contenido.decode('utf-8', errors='surrogateescape')
+        base = f"http://{self.headers.get('Host')}/_/"
+        texto = self.patron_hosts.sub(lambda m: base + m.group(1), texto)
+        return texto.encode('utf-8', errors='surrogateescape')
+
+    def _responder(self):
+        simular_latencia(self.latencia_ms, self.jitter_ms)
+        length = int(self.headers.get('Content-Length') or 0)
+        post_data = self.rfile.read(length).decode('utf-8') if length else None
+
+        match = re.match(r'/_/([^/]+)(/.*)?$', self.path)
+        if match:
+            url = f"https://{match.group(1)}{match.group(2) or '/'}"
+        else:
+            url = f"https://{self.manifiesto['host']}{self.path}"
+
+        entrada = self._buscar(self.command, url, post_data)
+        if entrada is None:
+            body = b'Not recorded'
+            self.send_response(404)
+            self.send_header('Content-Type', 'text/plain')
+        else:
+            with open(os.path.join(self.carpeta, 'cuerpos', entrada['cuerpo']), 'rb') as f:
+                body = f.read()
+            if any(t in entrada['mime'] for t in _TIPOS_TEXTO):
+                body = self._reescribir(body)
+            self.send_response(entrada['status'])
+            self.send_header('Content-Type', entrada['mime'])
+            for name, value in entrada['cabeceras'].items():
+                if name.lower() == 'set-cookie':
+                    # Las cookies de la tienda se reescriben para el host local
+                    for cookie in value.split('\n'):
+                        self.send_header(name, re.sub(r';\s*(Domain=[^;]*|Secure|SameSite=None)', '', cookie,
+                                                      flags=re.I))
+                else:
+                    self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _responder
+
+
+def start_replay_server(carpeta, latencia_ms=0, jitter_ms=0, port=0):
+    """
+    Serves a recording made with grabar on localhost in a background thread.
+    Args:
+        carpeta: Recording folder.
+        latencia_ms: Delay added to every response.
+        jitter_ms: Random variation of the delay, +-jitter_ms.
+        port: Port to listen on. 0 picks a free port.
+    Returns:
+        (server, start URL, manifest). Call server.shutdown() when finished.
+    """
+    with open(os.path.join(carpeta, MANIFIESTO), encoding='utf-8') as f:
+        manifiesto = json.load(f)
+    inicio = urlparse(manifiesto['url_inicio'])
+    manifiesto['host'] = inicio.netloc
+    hosts = {k.split(' ')[1].split('/')[0] for k in manifiesto['respuestas']}
+    patron_hosts = re.compile(r'(?:https?:)?//(' + '|'.join(re.escape(h) for h in sorted(hosts, key=len, reverse=True))
+                              + r')\b')
+
+    handler = partial(ReplayHandler, carpeta=carpeta, manifiesto=manifiesto, patron_hosts=patron_hosts,
+                      latencia_ms=latencia_ms, jitter_ms=jitter_ms)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url_inicio = f"http://127.0.0.1:{server.server_address[1]}/_/{inicio.netloc}{inicio.path or '/'}"
+    print(f"Grabación '{carpeta}' servida en {url_inicio}")
+    return server, url_inicio, manifiesto
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ('grabar', 'servir'):
+        print("Uso: python record_replay.py grabar <carpeta> [lista_compra.xlsx]\n"
+              "     python record_replay.py servir <carpeta> [latencia_ms] [jitter_ms]")
+        sys.exit(2)
+    if sys.argv[1] == 'grabar':
+        grabar(sys.argv[2], lista_compra=sys.argv[3] if len(sys.argv) > 3 else None)
+    else:
+        server, url_inicio, _ = start_replay_server(sys.argv[2], *[float(a) for a in sys.argv[3:5]])
+        input("Pulsa Enter para parar el servidor...")
+        server.shutdown()
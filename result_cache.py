@@ -0,0 +1,143 @@
+#Cache de resultados por (termino, codigo postal, backend) con caducidad. Las entradas vigentes se sirven sin
+#tocar el navegador; las caducadas se revalidan con una huella barata de la pagina (numero de celdas y hash de
+#nombres y precios) y solo se extraen de nuevo, con captura, si la huella ha cambiado.
+import hashlib
+import io
+import sqlite3
+import time
+
+import pandas as pd
+
+from functions import RESULTS_READY_TIMEOUT, huella_resultados
+from guardar_productos import buscar_termino, leer_resultados
+
+CACHE_RESULTADOS = "resultados_cache.sqlite"
+CACHE_TTL_S = 3600
+# Tamano maximo de las tablas guardadas; al pasarlo se borran las entradas usadas hace mas tiempo
+CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    termino TEXT NOT NULL,
+    codigo_postal TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    tabla TEXT NOT NULL,
+    hash_contenido TEXT NOT NULL,
+    huella TEXT,
+    bytes INTEGER NOT NULL,
+    validado REAL NOT NULL,
+    usado REAL NOT NULL,
+    PRIMARY KEY (termino, codigo_postal, backend)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_usado ON cache (usado);
+"""
+
+
+def hash_contenido(df):
+    """Content hash of a product table"""
+    return hashlib.sha1(df.to_json(orient='split').encode('utf-8')).hexdigest()
+
+
+class CacheResultados:
+    """
+    Product tables keyed by (term, postal code, backend), stored in SQLite.
+    Counts hits (fresh entry served), revalidated (stale entry whose fingerprint did not
+    change), misses (no entry or fingerprint changed) and evicted entries.
+    """
+
+    def __init__(self, path=CACHE_RESULTADOS, ttl_s=CACHE_TTL_S, max_bytes=CACHE_MAX_BYTES):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.contadores = {'hits': 0, 'revalidados': 0, 'fallos': 0, 'sin_cambios': 0, 'desalojos': 0}
+
+    def close(self):
+        self.conn.close()
+
+    def obtener(self, termino, codigo_postal, backend):
+        """
+        Returns:
+            (DataFrame, fingerprint, fresh) of the entry, or (None, None, False) if there is none.
+        """
+        fila = self.conn.execute(
+            "SELECT tabla, huella, validado FROM cache WHERE termino = ? AND codigo_postal = ? AND backend = ?",
+            (termino, str(codigo_postal), backend)).fetchone()
+        if fila is None:
+            return None, None, False
+        tabla, huella, validado = fila
+        with self.conn:
+            self.conn.execute("UPDATE cache SET usado = ? WHERE termino = ? AND codigo_postal = ? AND backend = ?",
+                              (time.time(), termino, str(codigo_postal), backend))
+        df = pd.read_json(io.StringIO(tabla), orient='split', dtype=False)
+        return df, huella, time.time() - validado < self.ttl_s
+
+    def revalidar(self, termino, codigo_postal, backend):
+        """Marks a stale entry as fresh again after its fingerprint matched"""
+        with self.conn:
+            self.conn.execute("UPDATE cache SET validado = ? WHERE termino = ? AND codigo_postal = ? AND backend = ?",
+                              (time.time(), termino, str(codigo_postal), backend))
+
+    def guardar(self, termino, codigo_postal, backend, df, huella=None):
+        """Stores a freshly extracted table and evicts the least recently used entries over max_bytes"""
+        tabla = df.to_json(orient='split')
+        contenido = hash_contenido(df)
+        anterior = self.conn.execute(
+            "SELECT hash_contenido FROM cache WHERE termino = ? AND codigo_postal = ? AND backend = ?",
+            (termino, str(codigo_postal), backend)).fetchone()
+        if anterior and anterior[0] == contenido:
+            self.contadores['sin_cambios'] += 1
+        ahora = time.time()
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (termino, str(codigo_postal), backend, tabla, contenido, huella,
+                               len(tabla.encode('utf-8')), ahora, ahora))
+            self._desalojar()
+
+    def _desalojar(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for rowid, bytes_ in self.conn.execute("SELECT rowid, bytes FROM cache ORDER BY usado").fetchall():
+            self.conn.execute("DELETE FROM cache WHERE rowid = ?", (rowid,))
+            self.contadores['desalojos'] += 1
+            total -= bytes_
+            if total <= self.max_bytes:
+                break
+
+    def metricas(self):
+        """Counters plus the hit rate (hits and revalidated over all lookups)"""
+        consultas = self.contadores['hits'] + self.contadores['revalidados'] + self.contadores['fallos']
+        aciertos = self.contadores['hits'] + self.contadores['revalidados']
+        return dict(self.contadores, tasa_aciertos=aciertos / consultas if consultas else 0.0)
+
+
+def extraer_termino_cacheado(cache, driver, wait, term, codigo_postal, espera_maxima=RESULTS_READY_TIMEOUT,
+                             captura_red=False, incremental=False):
+    """
+    extraer_termino through the cache.
+    A fresh entry is returned without using the driver. A stale one costs the search and
+    one script call for the fingerprint; the table and screenshot are only read again if
+    the fingerprint changed.
+    Returns:
+        (DataFrame, screenshot PNG bytes or None). No screenshot when the table came from the cache.
+    """
+    backend = 'red' if captura_red else 'dom'
+    df, huella_anterior, fresca = cache.obtener(term, codigo_postal, backend)
+    if df is not None and fresca:
+        cache.contadores['hits'] += 1
+        print(f"'{term}' servido desde la cache.")
+        return df, None
+
+    buscar_termino(driver, wait, term, espera_maxima, captura_red)
+    huella = huella_resultados(driver)
+    if df is not None and huella == huella_anterior:
+        cache.contadores['revalidados'] += 1
+        cache.revalidar(term, codigo_postal, backend)
+        print(f"'{term}' sin cambios desde la última extracción; servido desde la cache.")
+        return df, None
+
+    cache.contadores['fallos'] += 1
+    df, png = leer_resultados(driver, wait, term, captura_red, incremental)
+    cache.guardar(term, codigo_postal, backend, df, huella)
+    return df, png
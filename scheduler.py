@@ -0,0 +1,246 @@
+#Planificador continuo: cola de prioridad de trabajos (termino, codigo postal) que se refrescan cada cierto
+#tiempo, limite global de peticiones (token bucket), espera exponencial con jitter ante timeouts y rafagas de
+#elementos obsoletos, y un checkpoint en disco para continuar donde se quedo tras un reinicio.
+#Uso: python scheduler.py [codigo_postal ...]
+import heapq
+import json
+import os
+import random
+import signal
+import sys
+import time
+
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from guardar_productos import CODIGO_POSTAL, LISTA_PRODUCTOS, MAIN_FOLDER, URL_MERCADONA
+from guardar_productos import crear_driver, iniciar_sesion, procesar_termino
+from snapshot_store import DB_PRODUCTOS, abrir_store
+
+CHECKPOINT = "scheduler_checkpoint.json"
+
+INTERVALO_REFRESCO_S = 3600
+# Peticiones por segundo sostenidas y rafaga maxima del token bucket
+TASA_PETICIONES = 0.5
+RAFAGA = 5
+# Espera tras n fallos seguidos: BACKOFF_BASE_S * 2^(n-1), hasta BACKOFF_MAX_S, con jitter
+BACKOFF_BASE_S = 5
+BACKOFF_MAX_S = 900
+# Maximo que se duerme de una vez, para atender las senales a tiempo
+MAX_SUENO_S = 5
+
+# Errores que indican que la web va lenta o nos esta frenando: frenan todo el planificador
+ERRORES_SATURACION = (TimeoutException, StaleElementReferenceException)
+
+
+class TokenBucket:
+    """Allows `tasa` requests per second on average, with bursts of up to `capacidad`"""
+
+    def __init__(self, tasa=TASA_PETICIONES, capacidad=RAFAGA):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.tokens = capacidad
+        self.ultimo = time.monotonic()
+
+    def _rellenar(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+
+    def tomar(self, n=1):
+        """Blocks until n tokens are available and takes them. Returns the seconds waited"""
+        esperado = 0.0
+        self._rellenar()
+        while self.tokens < n:
+            espera = (n - self.tokens) / self.tasa
+            time.sleep(espera)
+            esperado += espera
+            self._rellenar()
+        self.tokens -= n
+        return esperado
+
+
+def backoff(fallos, base=BACKOFF_BASE_S, maximo=BACKOFF_MAX_S):
+    """
+    Wait after the n-th consecutive failure (0 if none): exponential, capped at maximo, half
+    of it fixed and half random so that retries of several jobs do not line up.
+    """
+    if fallos <= 0:
+        return 0.0
+    espera = min(maximo, base * 2 ** (fallos - 1))
+    return espera / 2 + random.uniform(0, espera / 2)
+
+
+def clave_trabajo(termino, codigo_postal):
+    return f"{codigo_postal}|{termino}"
+
+
+def cargar_checkpoint(path=CHECKPOINT):
+    """Jobs saved by guardar_checkpoint, {} if there is no checkpoint"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['trabajos']
+
+
+def guardar_checkpoint(trabajos, path=CHECKPOINT):
+    """Writes the job states atomically, so a crash while writing keeps the previous checkpoint"""
+    temporal = f"{path}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump({'guardado': time.time(), 'trabajos': trabajos}, f, ensure_ascii=False, indent=1)
+    os.replace(temporal, path)
+
+
+class Planificador:
+    """
+    Runs (term, postal code) jobs forever, each one again every `intervalo_s` seconds.
+
+    Jobs are kept in a heap ordered by next run time and priority (lower first). Every
+    search takes a token from the global bucket. A job that fails is retried after an
+    exponential backoff; timeouts and stale elements also pause the whole planner, since
+    they usually mean the site is slow or throttling. After every job the state is
+    written to the checkpoint, so a restart resumes with the same schedule.
+    """
+
+    def __init__(self, trabajos, intervalo_s=INTERVALO_REFRESCO_S, tasa=TASA_PETICIONES, rafaga=RAFAGA,
+                 checkpoint=CHECKPOINT, url=URL_MERCADONA, main_folder=MAIN_FOLDER, store_path=DB_PRODUCTOS,
+                 headless=True):
+        """
+        Args:
+            trabajos: List of (term, postal code) or (term, postal code, priority).
+            intervalo_s: Default refresh interval of every job.
+            tasa, rafaga: Token bucket rate (searches per second) and burst.
+            checkpoint: JSON file with the job states.
+        """
+        self.bucket = TokenBucket(tasa, rafaga)
+        self.checkpoint = checkpoint
+        self.url = url
+        self.main_folder = main_folder
+        self.store_path = store_path
+        self.headless = headless
+        self.fallos_globales = 0
+        self.parar = False
+        self.driver = None
+        self.wait = None
+        self.codigo_postal_sesion = None
+
+        guardados = cargar_checkpoint(checkpoint)
+        self.trabajos = {}
+        ahora = time.time()
+        for trabajo in trabajos:
+            termino, codigo_postal = trabajo[0], str(trabajo[1])
+            prioridad = trabajo[2] if len(trabajo) > 2 else 0
+            clave = clave_trabajo(termino, codigo_postal)
+            estado = guardados.get(clave, {'proxima': ahora, 'fallos': 0, 'ultima_ok': None})
+            estado.update({'termino': termino, 'codigo_postal': codigo_postal, 'prioridad': prioridad,
+                           'intervalo_s': intervalo_s})
+            self.trabajos[clave] = estado
+        self.cola = [(e['proxima'], e['prioridad'], clave) for clave, e in self.trabajos.items()]
+        heapq.heapify(self.cola)
+        print(f"{len(self.trabajos)} trabajos, {len(guardados)} recuperados del checkpoint.")
+
+    def _sesion(self, codigo_postal):
+        """Browser session for the postal code, (re)created when needed"""
+        if self.driver is None:
+            self.driver = crear_driver(headless=self.headless)
+            self.wait = WebDriverWait(self.driver, 5)
+            self.codigo_postal_sesion = None
+        if self.codigo_postal_sesion != codigo_postal:
+            if self.codigo_postal_sesion is not None:
+                # Sesion limpia: vuelve a salir el aviso de cookies y el formulario del codigo postal
+                self.driver.delete_all_cookies()
+                self.driver.execute_script("localStorage.clear(); sessionStorage.clear();")
+            self.bucket.tomar()
+            iniciar_sesion(self.driver, self.wait, codigo_postal, self.url)
+            self.codigo_postal_sesion = codigo_postal
+
+    def _cerrar_driver(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+        self.driver = None
+
+    def ejecutar(self, clave, conn):
+        """Runs one job and schedules its next run"""
+        estado = self.trabajos[clave]
+        try:
+            self._sesion(estado['codigo_postal'])
+            self.bucket.tomar()
+            procesar_termino(self.driver, self.wait, estado['termino'], self.main_folder, conn=conn,
+                             codigo_postal=estado['codigo_postal'], excel=False)
+        except ERRORES_SATURACION as e:
+            self.fallos_globales += 1
+            self._fallo(estado, e)
+        except WebDriverException as e:
+            # El navegador se ha caido o no responde: se abre otro para el siguiente trabajo
+            self._cerrar_driver()
+            self._fallo(estado, e)
+        except Exception as e:
+            self._fallo(estado, e)
+        else:
+            self.fallos_globales = 0
+            estado['fallos'] = 0
+            estado['ultima_ok'] = time.time()
+            estado['proxima'] = time.time() + estado['intervalo_s']
+        heapq.heappush(self.cola, (estado['proxima'], estado['prioridad'], clave))
+        guardar_checkpoint(self.trabajos, self.checkpoint)
+
+    def _fallo(self, estado, error):
+        estado['fallos'] += 1
+        espera = backoff(estado['fallos'])
+        estado['proxima'] = time.time() + espera
+        print(f"Error en '{estado['termino']}' ({estado['codigo_postal']}): {type(error).__name__}. "
+              f"Fallo {estado['fallos']}, se reintenta en {espera:.0f} s.")
+
+    def _dormir(self, segundos):
+        fin = time.time() + segundos
+        while not self.parar and time.time() < fin:
+            time.sleep(min(MAX_SUENO_S, fin - time.time()))
+
+    def run(self, max_trabajos=None):
+        """
+        Runs jobs until stopped (SIGINT/SIGTERM) or after max_trabajos jobs.
+        Returns:
+            Number of jobs run.
+        """
+        def detener(signum, frame):
+            print("Parando el planificador tras el trabajo en curso...")
+            self.parar = True
+
+        signal.signal(signal.SIGTERM, detener)
+        signal.signal(signal.SIGINT, detener)
+
+        conn = abrir_store(self.store_path) if self.store_path else None
+        ejecutados = 0
+        try:
+            while not self.parar and self.cola and (max_trabajos is None or ejecutados < max_trabajos):
+                proxima, _, clave = self.cola[0]
+                if proxima > time.time():
+                    self._dormir(proxima - time.time())
+                    continue
+                heapq.heappop(self.cola)
+
+                # Saturacion: se frena todo el planificador, no solo el trabajo que fallo
+                pausa = backoff(self.fallos_globales)
+                if pausa:
+                    print(f"{self.fallos_globales} errores de saturación seguidos; pausa de {pausa:.0f} s.")
+                    self._dormir(pausa)
+                    if self.parar:
+                        heapq.heappush(self.cola, (proxima, self.trabajos[clave]['prioridad'], clave))
+                        break
+
+                self.ejecutar(clave, conn)
+                ejecutados += 1
+        finally:
+            guardar_checkpoint(self.trabajos, self.checkpoint)
+            self._cerrar_driver()
+            if conn is not None:
+                conn.close()
+        return ejecutados
+
+
+if __name__ == "__main__":
+    codigos = sys.argv[1:] or [CODIGO_POSTAL]
+    Planificador([(term, codigo_postal) for codigo_postal in codigos for term in LISTA_PRODUCTOS]).run()
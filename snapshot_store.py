@@ -0,0 +1,170 @@
+#Almacen de snapshots de productos: cada ejecucion se anade (append-only) a una base SQLite con
+#indices, en lugar de sobrescribir un Excel por termino. El Excel queda como vista opcional.
+import sqlite3
+from datetime import datetime, timezone
+
+import pandas as pd
+
+DB_PRODUCTOS = "productos.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS productos (
+    run_ts TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    codigo_postal TEXT NOT NULL,
+    termino TEXT NOT NULL,
+    producto_id TEXT,
+    Nombre_producto TEXT NOT NULL,
+    Precio TEXT,
+    etiqueta TEXT,
+    formato TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_productos_identidad
+    ON productos (codigo_postal, Nombre_producto, etiqueta, formato, run_ts);
+CREATE INDEX IF NOT EXISTS idx_productos_fecha ON productos (fecha, codigo_postal);
+CREATE INDEX IF NOT EXISTS idx_productos_run ON productos (run_ts, termino);
+"""
+
+_COLUMNAS = ['run_ts', 'fecha', 'codigo_postal', 'termino', 'producto_id',
+             'Nombre_producto', 'Precio', 'etiqueta', 'formato']
+
+
+def abrir_store(path=DB_PRODUCTOS):
+    """
+    Opens (and creates if needed) the snapshot database.
+    Args:
+        path: SQLite file.
+    Returns:
+        sqlite3.Connection. Several processes can write to the same file.
+    """
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def nuevo_run_ts():
+    """Timestamp that identifies a run (UTC, ISO 8601, sortable as text)"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _filas(df, termino, codigo_postal, run_ts):
+    fecha = run_ts[:10]
+    ids = df['id'] if 'id' in df.columns else [None] * len(df)
+    return [
+        (run_ts, fecha, codigo_postal, termino, None if pd.isna(producto_id) else str(producto_id),
+         nombre, precio, etiqueta, formato)
+        for producto_id, nombre, precio, etiqueta, formato in zip(
+            ids, df['Nombre_producto'], df['Precio'], df['etiqueta'], df['formato'])
+    ]
+
+
+def guardar_snapshots(conn, tablas, codigo_postal, run_ts=None):
+    """
+    Appends the tables of several terms in a single transaction.
+    Args:
+        conn: Connection from abrir_store.
+        tablas: Dict term -> DataFrame returned by guardar_productos_2.
+        codigo_postal: Postal code of the session.
+        run_ts: Run timestamp shared by every row. Defaults to now.
+    Returns:
+        Number of rows written.
+    """
+    run_ts = run_ts or nuevo_run_ts()
+    filas = [fila for termino, df in tablas.items() if len(df)
+             for fila in _filas(df, termino, codigo_postal, run_ts)]
+    with conn:
+        conn.executemany(f"INSERT INTO productos ({', '.join(_COLUMNAS)}) "
+                         f"VALUES ({', '.join('?' * len(_COLUMNAS))})", filas)
+    return len(filas)
+
+
+def guardar_snapshot(conn, df, termino, codigo_postal, run_ts=None):
+    """Appends the table of one term. See guardar_snapshots"""
+    return guardar_snapshots(conn, {termino: df}, codigo_postal, run_ts)
+
+
+def reemplazar_snapshot(conn, df, termino, codigo_postal, run_ts):
+    """
+    Writes the table of one term in place of the rows already stored for the same run, term
+    and postal code, in a single transaction, so writing it again after a crash does not
+    duplicate it. See guardar_snapshots.
+    """
+    # El DELETE abre la transaccion que confirma guardar_snapshots: o se aplican los dos o ninguno
+    try:
+        conn.execute("DELETE FROM productos WHERE run_ts = ? AND termino = ? AND codigo_postal = ?",
+                     (run_ts, termino, codigo_postal))
+        return guardar_snapshots(conn, {termino: df}, codigo_postal, run_ts)
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def ultimo_precio(conn, codigo_postal=None):
+    """
+    Latest row of every product (name + etiqueta + formato) per postal code.
+    Args:
+        conn: Connection from abrir_store.
+        codigo_postal: Only this postal code. All of them if None.
+    Returns:
+        DataFrame with the stored columns.
+    """
+    filtro = "WHERE codigo_postal = ?" if codigo_postal else ""
+    query = f"""
+        SELECT {', '.join(_COLUMNAS)} FROM (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY codigo_postal, Nombre_producto, etiqueta, formato
+                ORDER BY run_ts DESC) AS rn
+            FROM productos {filtro})
+        WHERE rn = 1
+        ORDER BY codigo_postal, Nombre_producto
+    """
+    return pd.read_sql_query(query, conn, params=[codigo_postal] if codigo_postal else [])
+
+
+def historial_producto(conn, nombre, etiqueta=None, formato=None, codigo_postal=None):
+    """
+    Price history of one product, oldest first, one row per run.
+    Args:
+        conn: Connection from abrir_store.
+        nombre: Nombre_producto.
+        etiqueta, formato: Narrow it to one variant of the product.
+        codigo_postal: Only this postal code.
+    """
+    condiciones = ["Nombre_producto = ?"]
+    params = [nombre]
+    for columna, valor in (('etiqueta', etiqueta), ('formato', formato), ('codigo_postal', codigo_postal)):
+        if valor is not None:
+            condiciones.append(f"{columna} = ?")
+            params.append(valor)
+    query = f"""
+        SELECT DISTINCT run_ts, codigo_postal, Nombre_producto, etiqueta, formato, Precio
+        FROM productos WHERE {' AND '.join(condiciones)}
+        ORDER BY run_ts, codigo_postal
+    """
+    return pd.read_sql_query(query, conn, params=params)
+
+
+def exportar_excel(conn, path, termino, codigo_postal=None, run_ts=None):
+    """
+    Writes the rows of one term in the same format as the old per-term Excel file.
+    Args:
+        conn: Connection from abrir_store.
+        path: Excel file to write.
+        termino: Search term.
+        codigo_postal: Only this postal code.
+        run_ts: Run to export. Defaults to the latest run of the term.
+    """
+    filtro_cp = "AND codigo_postal = ?" if codigo_postal else ""
+    params = [termino] + ([codigo_postal] if codigo_postal else [])
+    if run_ts is None:
+        run_ts = conn.execute(f"SELECT MAX(run_ts) FROM productos WHERE termino = ? {filtro_cp}",
+                              params).fetchone()[0]
+    df = pd.read_sql_query(
+        f"SELECT Nombre_producto, Precio, etiqueta, formato FROM productos "
+        f"WHERE termino = ? {filtro_cp} AND run_ts = ? ORDER BY rowid",
+        conn, params=params + [run_ts])
+    df.to_excel(path, index=False)
+    print(f"Excel file saved: {path}")
+    return df
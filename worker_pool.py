@@ -0,0 +1,178 @@
+#Pool de navegadores: N procesos con su propio Chrome headless y su propia sesion
+#(cookies + codigo postal) que van pidiendo terminos de una cola compartida.
+import multiprocessing as mp
+import queue
+import time
+from collections import deque
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, WebDriverException
+
+from guardar_productos import crear_driver, iniciar_sesion, procesar_termino
+from guardar_productos import URL_MERCADONA, CODIGO_POSTAL, MAIN_FOLDER
+from functions import RESULTS_READY_TIMEOUT
+from snapshot_store import abrir_store, DB_PRODUCTOS, nuevo_run_ts
+
+# Veces que un termino se vuelve a encolar porque su worker murio
+MAX_REINTENTOS_TERMINO = 3
+# Arranques seguidos sin llegar a abrir sesion antes de dar un worker por perdido
+MAX_ARRANQUES_FALLIDOS = 3
+
+
+def _worker(worker_id, entrada, eventos, codigo_postal, url, main_folder, headless, espera_maxima,
+            captura_red, store_path, run_ts, excel):
+    """
+    Worker process: opens its own browser session and snapshot store connection, then
+    asks for terms until it receives None. A WebDriverException other than a timeout or
+    a stale element ends the process so the pool restarts it.
+    """
+    driver = crear_driver(headless=headless, captura_red=captura_red)
+    wait = WebDriverWait(driver, 5)
+    conn = None
+    try:
+        # Cada proceso usa su propia conexion; el almacen admite varios escritores
+        conn = abrir_store(store_path) if store_path else None
+        iniciar_sesion(driver, wait, codigo_postal, url)
+        eventos.put(('ready', worker_id, None))
+
+        while True:
+            term = entrada.get()
+            if term is None:
+                break
+            try:
+                procesar_termino(driver, wait, term, main_folder, espera_maxima, captura_red, conn, codigo_postal,
+                                 run_ts, excel)
+                eventos.put(('done', worker_id, term))
+            except (TimeoutException, StaleElementReferenceException) as e:
+                # La pagina no respondio a tiempo, pero el navegador sigue vivo: el termino falla
+                print(f"Error al procesar el producto '{term}': {e}. Continuando con el siguiente.")
+                eventos.put(('failed', worker_id, term))
+            except WebDriverException:
+                # El navegador se ha caido: el pool reencola el termino
+                raise
+            except Exception as e:
+                print(f"Error al procesar el producto '{term}': {e}. Continuando con el siguiente.")
+                eventos.put(('failed', worker_id, term))
+    finally:
+        if conn is not None:
+            conn.close()
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+
+def run_pool(terms, n_workers, codigo_postal=CODIGO_POSTAL, url=URL_MERCADONA,
+             main_folder=MAIN_FOLDER, headless=True, espera_maxima=RESULTS_READY_TIMEOUT,
+             captura_red=False, store_path=DB_PRODUCTOS, run_ts=None, excel=True):
+    """
+    Processes every term with a pool of n_workers browsers.
+
+    The terms live in a single queue owned by this process. A worker asks for the
+    next one each time it is ready, so the pool always knows which term each worker
+    holds and can give it to a fresh worker if the browser crashes.
+
+    Args:
+        terms: List of search terms.
+        n_workers: Number of Chrome processes.
+        codigo_postal: Postal code every worker enters in its session.
+        url: Store URL.
+        main_folder: Output folder, same layout as guardar_productos.py.
+        headless: Run the browsers in headless mode.
+        espera_maxima: Upper bound in seconds to wait for the results of each term.
+        captura_red: Build the tables from the captured JSON responses (see xhr_capture).
+        store_path: Snapshot database every worker appends its terms to. None to skip it.
+        run_ts: Run timestamp stored with the rows of every worker. Defaults to now.
+        excel: Also write the per-term Excel files.
+    Returns:
+        Dict with the 'done', 'failed' and 'lost' term lists.
+    """
+    run_ts = run_ts or nuevo_run_ts()
+    ctx = mp.get_context('spawn')
+    eventos = ctx.Queue()
+    pendientes = deque(terms)
+    restantes = len(terms)
+
+    workers = {}  # worker_id -> (proceso, cola de entrada)
+    en_curso = {}  # worker_id -> termino que esta procesando
+    arranques_fallidos = {}
+    reintentos = {}
+    resultado = {'done': [], 'failed': [], 'lost': []}
+
+    def arrancar(worker_id):
+        entrada = ctx.Queue()
+        p = ctx.Process(target=_worker, name=f"worker-{worker_id}",
+                        args=(worker_id, entrada, eventos, codigo_postal, url, main_folder, headless,
+                              espera_maxima, captura_red, store_path, run_ts, excel))
+        p.start()
+        workers[worker_id] = (p, entrada)
+
+    def asignar(worker_id):
+        if pendientes:
+            term = pendientes.popleft()
+            en_curso[worker_id] = term
+            workers[worker_id][1].put(term)
+
+    for worker_id in range(n_workers):
+        arrancar(worker_id)
+
+    while restantes > 0 and workers:
+        # Vaciar todos los eventos antes de mirar que workers siguen vivos
+        recibidos = []
+        try:
+            recibidos.append(eventos.get(timeout=1))
+            while True:
+                recibidos.append(eventos.get_nowait())
+        except queue.Empty:
+            pass
+
+        for evento, worker_id, term in recibidos:
+            if evento == 'ready':
+                arranques_fallidos[worker_id] = 0
+                asignar(worker_id)
+            elif en_curso.get(worker_id) == term:
+                del en_curso[worker_id]
+                resultado[evento].append(term)
+                restantes -= 1
+                asignar(worker_id)
+
+        # Reiniciar los workers caidos sin perder su termino
+        for worker_id, (p, _) in list(workers.items()):
+            if p.is_alive():
+                continue
+            del workers[worker_id]
+            print(f"Worker {worker_id} terminado con código {p.exitcode}. Reiniciando...")
+
+            term = en_curso.pop(worker_id, None)
+            if term is None:
+                arranques_fallidos[worker_id] = arranques_fallidos.get(worker_id, 0) + 1
+            else:
+                reintentos[term] = reintentos.get(term, 0) + 1
+                if reintentos[term] <= MAX_REINTENTOS_TERMINO:
+                    pendientes.appendleft(term)
+                else:
+                    print(f"Término '{term}' descartado tras {MAX_REINTENTOS_TERMINO} reintentos.")
+                    resultado['lost'].append(term)
+                    restantes -= 1
+
+            if restantes > 0 and arranques_fallidos.get(worker_id, 0) < MAX_ARRANQUES_FALLIDOS:
+                arrancar(worker_id)
+
+    # Si no queda ningun worker capaz de arrancar, lo pendiente se da por perdido
+    resultado['lost'].extend(pendientes)
+
+    for p, entrada in workers.values():
+        entrada.put(None)
+    for p, _ in workers.values():
+        p.join(timeout=30)
+        if p.is_alive():
+            p.terminate()
+    return resultado
+
+
+if __name__ == "__main__":
+    from guardar_productos import LISTA_PRODUCTOS
+
+    inicio = time.perf_counter()
+    resultado = run_pool(LISTA_PRODUCTOS, n_workers=min(4, mp.cpu_count()))
+    print(f"{len(resultado['done'])} términos en {time.perf_counter() - inicio:.1f} s")
@@ -0,0 +1,110 @@
+#Captura de las respuestas JSON que la web carga tras una busqueda (logs de rendimiento de Chrome,
+#eventos Network del CDP) para construir la tabla de productos sin leer el texto de las celdas.
+import json
+import re
+
+import pandas as pd
+
+from functions import guardar_productos_2
+from http_backend import COLUMNAS_PRODUCTO, producto_desde_json
+from instrumentation import medir
+
+# Respuestas de la API que traen productos: busqueda (Algolia) y listados de categoria
+PATRON_PRODUCTOS = re.compile(r'/1/indexes/[^/]+/query|/api/categories/\d+')
+
+COLUMNAS_ESTRUCTURADAS = ['id', 'precio_unidad', 'precio_referencia', 'formato_referencia',
+                          'unit_size', 'size_format', 'is_pack', 'total_units']
+
+
+def activar_captura_red(options):
+    """Enables Chrome performance logging (CDP Network events) on the driver Options"""
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    return options
+
+
+def descartar_log_red(driver):
+    """Empties the performance log so the next capture only sees the following search"""
+    driver.get_log('performance')
+
+
+def respuestas_json(driver, patron=PATRON_PRODUCTOS):
+    """
+    Reads the performance log and returns the JSON bodies of the responses whose URL matches.
+    Args:
+        driver: WebDriver created with activar_captura_red.
+        patron: Compiled regex for the response URL.
+    Returns:
+        List of (url, parsed body), in the order they were received.
+    """
+    respuestas = []
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message['method'] != 'Network.responseReceived':
+            continue
+        response = message['params']['response']
+        if 'json' not in response.get('mimeType', '') or not patron.search(response['url']):
+            continue
+        try:
+            body = driver.execute_cdp_cmd('Network.getResponseBody',
+                                          {'requestId': message['params']['requestId']})
+            respuestas.append((response['url'], json.loads(body['body'])))
+        except Exception as e:
+            print(f"No se pudo leer la respuesta {response['url']}: {e}")
+    return respuestas
+
+
+def productos_de_respuesta(body):
+    """Products contained in a search or category response"""
+    if 'hits' in body:
+        return body['hits']
+    return [p for sub in body.get('categories', []) for p in sub.get('products', [])]
+
+
+def producto_estructurado(producto):
+    """guardar_productos_2 record plus the id, prices and sizes as typed fields"""
+    pi = producto['price_instructions']
+    registro = producto_desde_json(producto)
+    registro.update({
+        'id': producto.get('id'),
+        'precio_unidad': float(pi['unit_price']),
+        'precio_referencia': float(pi['reference_price']) if pi.get('reference_price') else None,
+        'formato_referencia': pi.get('reference_format'),
+        'unit_size': pi.get('unit_size'),
+        'size_format': pi.get('size_format'),
+        'is_pack': bool(pi.get('is_pack')),
+        'total_units': pi.get('total_units'),
+    })
+    return registro
+
+
+@medir('guardar_productos_red')
+def guardar_productos_red(driver, wait, producto, max_attempts=3):
+    """
+    Builds the product table of the last search from the captured JSON responses.
+    Call descartar_log_red before search_and_submit. When no matching response was
+    captured it falls back to the DOM extraction of guardar_productos_2.
+    Args:
+        driver: WebDriver created with activar_captura_red.
+        wait: WebDriverWait instance for explicit waits.
+        producto: The search term the results belong to.
+        max_attempts: Attempts to locate the product cells in the fallback.
+    Returns:
+        DataFrame with the guardar_productos_2 columns followed by COLUMNAS_ESTRUCTURADAS.
+    """
+    try:
+        respuestas = respuestas_json(driver)
+    except Exception as e:
+        print(f"No se pudo leer el log de red: {e}")
+        respuestas = []
+
+    # Si hay varias busquedas (sugerencias, autocompletado) se usa la del termino buscado
+    busquedas = [body for _, body in respuestas if body.get('query') == producto]
+    candidatas = busquedas or [body for _, body in respuestas]
+    if not candidatas:
+        print(f"No se capturó ninguna respuesta JSON para '{producto}'. Usando el DOM.")
+        return guardar_productos_2(driver, wait, producto, max_attempts)
+
+    productos = productos_de_respuesta(candidatas[-1])
+    print(f"{len(productos)} productos capturados de la red para '{producto}'.")
+    return pd.DataFrame([producto_estructurado(p) for p in productos],
+                        columns=COLUMNAS_PRODUCTO + COLUMNAS_ESTRUCTURADAS)